@@ -1,28 +1,164 @@
 import click
 
-from mon_health.command import execute_query, setup_commands
-from mon_health.db import tables
+from mon_health.batch import WriteBatcher, input_is_pending
+from mon_health.command import Session, execute_query, set_default_session
+from mon_health.maintenance import maybe_maintain
+from mon_health.metrics import EXPORT_INTERVAL, MetricsExporter
+from mon_health.profile import DEFAULT_PROFILE, get_profile_path, parse_profiles
+from mon_health.replay import Recorder
+from mon_health.writer import AsyncWriter
 
 
-def setup():
-    setup_commands(tables)
+def setup(path, async_writes=False, batch_size=100, **kwargs):
+    session = Session.open(path, **kwargs)
+    if async_writes:
+        session.writer = AsyncWriter(session.database, batch_size)
+    set_default_session(session)
+    auto_maintain(session)
+    return session
+
+
+def auto_maintain(session):
+    if session.profiles:
+        return
+    rows = maybe_maintain(session)
+    if rows is not None:
+        elapsed = sum(float(row["ms"]) for row in rows)
+        print(f"Database maintained in {elapsed:.1f} ms.")
 
 
 @click.command()
-def main():
-    print("mon-health 1.0.0-alpha.6. Type 'help' for help.")
-    setup()
+@click.option(
+    "--flush-interval",
+    default=0.05,
+    show_default=True,
+    help="Seconds to wait for more input before committing pending writes.",
+)
+@click.option(
+    "--batch-size",
+    default=100,
+    show_default=True,
+    help="Maximum number of writes committed in one transaction.",
+)
+@click.option(
+    "--async-writes",
+    is_flag=True,
+    help="Acknowledge inserts at once and store them in a background thread.",
+)
+@click.option(
+    "--compact-dates",
+    is_flag=True,
+    help="Store dates and times of a new database as integers.",
+)
+@click.option(
+    "--memory",
+    is_flag=True,
+    help="Work on an in-memory copy that is periodically saved to disk.",
+)
+@click.option(
+    "--profile",
+    default=DEFAULT_PROFILE,
+    show_default=True,
+    help="Name of the profile whose database is used.",
+)
+@click.option(
+    "--profiles",
+    help="Comma separated profiles to query together, read-only.",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    help="Seconds after which a command is stopped, overrides 'set timeout'.",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False),
+    help="Prometheus text file the metrics are periodically written to.",
+)
+@click.option(
+    "--metrics-interval",
+    default=EXPORT_INTERVAL,
+    show_default=True,
+    help="Seconds between writes of the metrics file.",
+)
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False),
+    help="File every command is recorded to, for mon_health.replay.",
+)
+@click.option(
+    "--command",
+    "-c",
+    "commands",
+    multiple=True,
+    help="Run this query and exit instead of starting the shell, can be repeated.",
+)
+def main(
+    flush_interval,
+    batch_size,
+    async_writes,
+    compact_dates,
+    memory,
+    profile,
+    profiles,
+    timeout,
+    metrics_file,
+    metrics_interval,
+    record,
+    commands,
+):
+    if async_writes and memory:
+        raise click.UsageError("--async-writes can't be used with --memory.")
+    try:
+        profiles = parse_profiles(profiles) if profiles else None
+        path = next(iter(profiles.values())) if profiles else get_profile_path(profile)
+    except Exception as e:
+        raise click.UsageError(str(e))
+    if not commands:
+        print("mon-health 1.0.0-alpha.6. Type 'help' for help.")
+    session = setup(
+        path,
+        async_writes,
+        batch_size,
+        compact_dates=compact_dates,
+        memory=memory,
+        profiles=profiles,
+    )
+    if timeout:
+        session.timeout = timeout
+    if record:
+        session.recorder = Recorder(record)
+    if metrics_file:
+        session.exporter = MetricsExporter(
+            session.metrics, metrics_file, metrics_interval
+        )
+    batcher = WriteBatcher(batch_size)
+    # the writer thread already groups inserts into transactions
+    execute = execute_query if async_writes else batcher.execute
+    if commands:
+        for query in commands:
+            execute(query)
+        batcher.flush()
+        auto_maintain(session)
+        session.close()
+        return
     while True:
         try:
+            if batcher.pending and not input_is_pending(flush_interval):
+                batcher.flush()
             queries = [query.strip() for query in input(">>> ").split(";")]
             for query in queries:
                 if query:
-                    execute_query(query)
+                    execute(query)
         except KeyboardInterrupt:
             print()
+            batcher.flush()
+            execute_query("sync")
             continue
         except EOFError:
-            execute_query("exit")
+            execute("exit")
+            auto_maintain(session)
+            session.close()
             break
 
 
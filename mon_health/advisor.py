@@ -0,0 +1,178 @@
+import time
+from datetime import datetime, timedelta
+
+from peewee import Expression, Field
+
+from mon_health.concurrency import execute_write
+from mon_health.maintenance import uncounted
+
+INDEX_PREFIX = "advisor_food_"
+MAX_CANDIDATES = 5
+UNUSED_AFTER = timedelta(days=30)
+EQUALITY_OPS = ["=", "IN"]
+
+
+class Shape:
+    def __init__(self, filters, sorts):
+        # filters are (column, op) pairs of the top level conjunction, the
+        # only ones an index can serve directly
+        self.filters = tuple(sorted(filters))
+        self.sorts = tuple(sorts)
+
+    @property
+    def key(self):
+        filters = ",".join(f"{column}{op}" for column, op in self.filters)
+        return f"filter:{filters};sort:{','.join(self.sorts)}"
+
+    @classmethod
+    def from_key(cls, key):
+        filters, sorts = [part.split(":")[1] for part in key.split(";")]
+        pairs = []
+        for item in filters.split(",") if filters else []:
+            for op in ["BETWEEN"] + EQUALITY_OPS:
+                if item.endswith(op):
+                    pairs.append((item[: -len(op)], op))
+                    break
+        return cls(pairs, sorts.split(",") if sorts else [])
+
+    def get_index_columns(self, all_columns):
+        equalities = [column for column, op in self.filters if op in EQUALITY_OPS]
+        ranges = [column for column, op in self.filters if op not in EQUALITY_OPS]
+        columns = equalities + ranges[:1]
+        if not ranges:
+            columns += [column for column in self.sorts if column not in columns]
+        key_length = len(columns)
+        # the remaining columns make the index covering, id is the rowid
+        columns += [column for column in all_columns if column not in columns]
+        return columns, key_length
+
+
+def get_conjuncts(expr):
+    if isinstance(expr, Expression) and expr.op == "AND":
+        return get_conjuncts(expr.lhs) + get_conjuncts(expr.rhs)
+    return [expr]
+
+
+def get_shape(parser):
+    filters = []
+    for expr in get_conjuncts(parser.where_clause):
+        if isinstance(expr, Expression) and isinstance(expr.lhs, Field):
+            filters.append((expr.lhs.column_name, expr.op))
+    sorts = [node.node.column_name for node in parser.sort_clause] or ["date", "time"]
+    return Shape(filters, sorts)
+
+
+def record_query(session, parser, args, seconds):
+    key = get_shape(parser).key
+    stats = session.query_shapes.setdefault(key, {"runs": 0, "seconds": 0.0})
+    stats["runs"] += 1
+    stats["seconds"] += seconds
+    stats["sample"] = args
+
+
+def save_query_shapes(session):
+    QueryShape = session.tables.get("query_shape")
+    if QueryShape is None or not session.query_shapes:
+        return
+
+    def save():
+        for key, stats in session.query_shapes.items():
+            QueryShape.insert(
+                shape=key,
+                runs=stats["runs"],
+                seconds=stats["seconds"],
+                sample=stats["sample"],
+                last_run=datetime.now(),
+            ).on_conflict(
+                conflict_target=[QueryShape.shape],
+                update={
+                    QueryShape.runs: QueryShape.runs + stats["runs"],
+                    QueryShape.seconds: QueryShape.seconds + stats["seconds"],
+                    QueryShape.sample: stats["sample"],
+                    QueryShape.last_run: datetime.now(),
+                },
+            ).execute()
+
+    with uncounted(session):
+        execute_write(session.database, save)
+    session.query_shapes = {}
+
+
+def get_heaviest_shapes(session):
+    save_query_shapes(session)
+    QueryShape = session.tables.get("query_shape")
+    if QueryShape is None:
+        return []
+    return list(
+        QueryShape.select()
+        .where(QueryShape.last_run > datetime.now() - UNUSED_AFTER)
+        .order_by(QueryShape.seconds.desc())
+        .limit(MAX_CANDIDATES)
+    )
+
+
+def get_index_name(columns):
+    return INDEX_PREFIX + "_".join(columns)
+
+
+def is_covered(columns, key_length, indexes):
+    key = columns[:key_length]
+    return any(index.columns[: len(key)] == key for index in indexes)
+
+
+def get_advice(session):
+    Food = session.Food
+    all_columns = [field.column_name for field in Food._meta.sorted_fields][1:]
+    indexes = session.database.get_indexes(Food._meta.table_name)
+    advice = []
+    for shape in get_heaviest_shapes(session):
+        columns, key_length = Shape.from_key(shape.shape).get_index_columns(all_columns)
+        if key_length == 0:
+            index = None
+        elif is_covered(columns, key_length, indexes):
+            index = next(
+                index.name
+                for index in indexes
+                if index.columns[:key_length] == columns[:key_length]
+            )
+        else:
+            index = get_index_name(columns)
+        advice.append((shape, columns, index))
+    return advice
+
+
+def explain(session, query):
+    sql, params = query.sql()
+    cursor = session.database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+    return " ".join(row[-1] for row in cursor.fetchall())
+
+
+def apply_advice(session, build_query):
+    database = session.database
+    table = session.Food._meta.table_name
+    outputs = []
+    wanted = set()
+    for shape, columns, index in get_advice(session):
+        if index is None or not index.startswith(INDEX_PREFIX):
+            continue
+        wanted.add(index)
+        if index in [existing.name for existing in database.get_indexes(table)]:
+            continue
+
+        started = time.perf_counter()
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        database.execute_sql(f'CREATE INDEX "{index}" ON "{table}" ({column_list})')
+        database.execute_sql(f'ANALYZE "{index}"')
+        if index in explain(session, build_query(shape.sample)):
+            elapsed = (time.perf_counter() - started) * 1000
+            outputs.append(f"Created {index} in {elapsed:.1f} ms.")
+        else:
+            database.execute_sql(f'DROP INDEX "{index}"')
+            wanted.discard(index)
+            outputs.append(f"Dropped {index}, the planner doesn't use it.")
+
+    for existing in database.get_indexes(table):
+        if existing.name.startswith(INDEX_PREFIX) and existing.name not in wanted:
+            database.execute_sql(f'DROP INDEX "{existing.name}"')
+            outputs.append(f"Dropped unused {existing.name}.")
+    return outputs
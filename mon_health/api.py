@@ -0,0 +1,91 @@
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+
+from mon_health.command import (
+    FindCommand,
+    Session,
+    SessionNotFound,
+    current_session,
+    set_default_session,
+)
+from mon_health.profile import DEFAULT_PROFILE, get_profile_path
+
+ROW_TYPES = ["dict", "tuple", "record"]
+
+
+class InvalidRowType(Exception):
+    pass
+
+
+def open_session(path=None, profile=DEFAULT_PROFILE, **kwargs):
+    return Session.open(path or get_profile_path(profile), **kwargs)
+
+
+def get_session(session=None):
+    if session is not None:
+        return session
+    try:
+        return current_session()
+    except SessionNotFound:
+        set_default_session(open_session())
+        return current_session()
+
+
+@lru_cache(maxsize=32)
+def get_record_type(columns):
+    return namedtuple("Record", columns)
+
+
+def get_row_converter(row_type, columns):
+    if row_type not in ROW_TYPES:
+        raise InvalidRowType(f"Row type should be one of {', '.join(ROW_TYPES)}.")
+    # queries over archives and profiles select every column, so rows are
+    # always projected on the requested ones
+    getter = itemgetter(*columns)
+    if len(columns) == 1:
+
+        def get_values(row):
+            return (getter(row),)
+
+    else:
+        get_values = getter
+
+    if row_type == "dict":
+        return lambda row: dict(zip(columns, get_values(row)))
+    if row_type == "tuple":
+        return get_values
+    Record = get_record_type(tuple(columns))
+    return lambda row: Record._make(get_values(row))
+
+
+def select(query="", session=None):
+    session = get_session(session)
+    with session.activate():
+        return FindCommand.parse_args(query)
+
+
+def iterate_batches(rows, batch_size):
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def find(query="", session=None, row_type="dict", batch_size=None):
+    select_query, columns = select(query, session)
+    convert = get_row_converter(row_type, columns)
+    # iterator() doesn't keep the rows it already returned
+    rows = map(convert, select_query.iterator())
+    if batch_size:
+        return iterate_batches(rows, batch_size)
+    return rows
+
+
+def find_columns(query="", session=None):
+    select_query, columns = select(query, session)
+    rows = [get_row_converter("tuple", columns)(row) for row in select_query]
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return {column: list(value) for column, value in zip(columns, values)}
@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PAGES_PER_STEP = 64
+STEP_SLEEP = 0.05
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+class BackupError(Exception):
+    pass
+
+
+@contextmanager
+def temporary_file(directory):
+    fd, name = tempfile.mkstemp(dir=directory, prefix=".backup-")
+    os.close(fd)
+    try:
+        yield Path(name)
+    finally:
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def copy_database(conn, path, pages=PAGES_PER_STEP):
+    # copying a few pages per step lets writers in between the steps
+    target = sqlite3.connect(str(path))
+    try:
+        conn.backup(target, pages=pages, sleep=STEP_SLEEP)
+    finally:
+        target.close()
+
+
+def fsync_file(path):
+    with open(path, "rb") as file:
+        os.fsync(file.fileno())
+
+
+def backup_file(conn, dest, compress=False, pages=PAGES_PER_STEP):
+    with temporary_file(dest.parent) as snapshot:
+        copy_database(conn, snapshot, pages)
+        if compress:
+            with temporary_file(dest.parent) as compressed:
+                with open(snapshot, "rb") as src, gzip.open(compressed, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                fsync_file(compressed)
+                os.replace(compressed, dest)
+        else:
+            fsync_file(snapshot)
+            os.replace(snapshot, dest)
+    return dest.stat().st_size
+
+
+def get_page_size(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def get_page_path(dest, digest, compressed):
+    suffix = ".gz" if compressed else ""
+    return dest / "pages" / digest[:2] / f"{digest}{suffix}"
+
+
+def write_page(path, page, compressed):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    opener = gzip.open if compressed else open
+    with opener(path.with_name(path.name + ".tmp"), "wb") as file:
+        file.write(page)
+    os.replace(path.with_name(path.name + ".tmp"), path)
+
+
+def backup_incremental(conn, dest, compress=False, pages=PAGES_PER_STEP):
+    # pages are stored by their hash, so unchanged pages are never stored twice
+    dest.mkdir(parents=True, exist_ok=True)
+    with temporary_file(dest) as snapshot:
+        copy_database(conn, snapshot, pages)
+        page_size = get_page_size(snapshot)
+        digests = []
+        new_pages = 0
+        with open(snapshot, "rb") as file:
+            for page in iter(lambda: file.read(page_size), b""):
+                digest = hashlib.sha256(page).hexdigest()
+                page_path = get_page_path(dest, digest, compress)
+                if not page_path.exists():
+                    write_page(page_path, page, compress)
+                    new_pages += 1
+                digests.append(digest)
+
+    created = datetime.now()
+    manifest = {
+        "created": created.isoformat(),
+        "page_size": page_size,
+        "compressed": compress,
+        "pages": digests,
+    }
+    manifest_path = dest / (created.strftime("%Y%m%dT%H%M%S%f") + MANIFEST_SUFFIX)
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file)
+    return manifest_path, len(digests), new_pages
+
+
+def get_manifests(dest):
+    return sorted(dest.glob("*" + MANIFEST_SUFFIX))
+
+
+def restore_incremental(manifest_path, target):
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    dest = Path(manifest_path).parent
+    opener = gzip.open if manifest["compressed"] else open
+    with open(target, "wb") as out:
+        for number, digest in enumerate(manifest["pages"], 1):
+            page_path = get_page_path(dest, digest, manifest["compressed"])
+            try:
+                with opener(page_path, "rb") as file:
+                    page = file.read()
+            except FileNotFoundError:
+                raise BackupError(f"Page {number} is missing.")
+            if hashlib.sha256(page).hexdigest() != digest:
+                raise BackupError(f"Page {number} is corrupted.")
+            out.write(page)
+
+
+def check_integrity(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"Backup isn't a database: {e}.")
+    finally:
+        conn.close()
+    result = "; ".join(row[0] for row in rows)
+    if result != "ok":
+        raise BackupError(f"Backup is corrupted: {result}.")
+
+
+def verify_backup(path):
+    path = Path(path).expanduser()
+    if path.is_dir():
+        manifests = get_manifests(path)
+        if not manifests:
+            raise BackupError(f"No backup found in {path}.")
+        path = manifests[-1]
+
+    with temporary_file(path.parent) as restored:
+        if path.name.endswith(MANIFEST_SUFFIX):
+            restore_incremental(path, restored)
+        elif path.suffix == ".gz":
+            try:
+                with gzip.open(path, "rb") as src, open(restored, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+            except (OSError, EOFError) as e:
+                raise BackupError(f"Backup can't be decompressed: {e}.")
+        else:
+            shutil.copyfile(path, restored)
+        check_integrity(restored)
+    return path
+
+
+def backup_database(database, dest, compress=False, incremental=False):
+    dest = Path(dest).expanduser()
+    conn = database.connection()
+    if incremental:
+        return backup_incremental(conn, dest, compress)
+    if not dest.parent.exists():
+        raise BackupError(f"Directory {dest.parent} doesn't exist.")
+    if compress and dest.suffix != ".gz":
+        dest = dest.with_name(dest.name + ".gz")
+    backup_file(conn, dest, compress)
+    return dest
@@ -0,0 +1,88 @@
+import io
+import select
+import sys
+
+from mon_health.cancellation import cancellable, check_interrupted, get_limits
+from mon_health.command import (
+    check_command,
+    current_session,
+    execute_command,
+    get_database,
+    parse_input,
+    report_error,
+)
+from mon_health.concurrency import execute_write
+from mon_health.metrics import get_command_label
+
+
+def input_is_pending(timeout):
+    try:
+        ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    except (OSError, ValueError, io.UnsupportedOperation):
+        return False
+    return bool(ready)
+
+
+class WriteBatcher:
+    def __init__(self, batch_size=100):
+        self.batch_size = batch_size
+        self.pending = []
+
+    def execute(self, input):
+        try:
+            command, args = parse_input(input)
+        except Exception as e:
+            self.flush()
+            report_error(e)
+            print(e.args[0])
+            return
+
+        if command.writes and not command.own_transaction:
+            self.pending.append((command, args, input))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+        else:
+            # reads must see every write typed before them
+            self.flush()
+            execute_command(command, args, input)
+
+    @staticmethod
+    def run_write(command, args, input=None):
+        session = current_session()
+        label = get_command_label(command)
+        with session.metrics.measure(label), session.tracing(command, args, input):
+            try:
+                check_command(command)
+                return list(command.execute(args))
+            except Exception as e:
+                report_error(e)
+                return [e.args[0]]
+
+    def run_writes(self, pending, limit):
+        results = []
+        for write in pending:
+            results.append(self.run_write(*write))
+            # an interrupted write makes SQLite roll the whole transaction
+            # back, so the writes left mustn't run and commit on their own
+            check_interrupted(get_limits(), limit)
+        return results
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, []
+        database = get_database()
+        try:
+            with cancellable(database, current_session().timeout) as limit:
+                results = execute_write(
+                    database, lambda: self.run_writes(pending, limit)
+                )
+        except Exception as e:
+            for command, *_ in pending:
+                report_error(e, get_command_label(command))
+            results = [[e.args[0]]] * len(pending)
+
+        for outputs in results:
+            for output in outputs:
+                print(output)
@@ -0,0 +1,102 @@
+import signal
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from peewee import OperationalError
+
+PROGRESS_STEPS = 1000
+
+
+class QueryCancelled(Exception):
+    pass
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class Limit:
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.deadline = None if not timeout else time.monotonic() + timeout
+        self.cancelled = False
+        self.interrupted = False
+
+    def is_expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+
+state = threading.local()
+
+
+def get_limits():
+    if not hasattr(state, "limits"):
+        state.limits = []
+    return state.limits
+
+
+def is_interrupted():
+    for limit in get_limits():
+        if limit.cancelled or limit.is_expired():
+            limit.interrupted = True
+            return True
+    return False
+
+
+def check_interrupted(limits, limit):
+    if any(other.cancelled for other in limits):
+        raise QueryCancelled("Query cancelled.")
+    if limit.interrupted:
+        raise QueryTimeout(f"Query stopped after {limit.timeout:g} seconds.")
+
+
+def cancel(signum, frame):
+    for limit in get_limits():
+        limit.cancelled = True
+    # when SQLite is running, this is raised in the progress handler, which
+    # makes SQLite abort the statement
+    raise KeyboardInterrupt
+
+
+@contextmanager
+def handling_interrupts(database):
+    conn = database.connection()
+    conn.set_progress_handler(is_interrupted, PROGRESS_STEPS)
+    previous = None
+    if threading.current_thread() is threading.main_thread():
+        previous = signal.signal(signal.SIGINT, cancel)
+    try:
+        yield
+    finally:
+        if previous is not None:
+            signal.signal(signal.SIGINT, previous)
+        conn.set_progress_handler(None, 0)
+
+
+@contextmanager
+def cancellable(database, timeout=None):
+    limits = get_limits()
+    limit = Limit(timeout)
+    limits.append(limit)
+    try:
+        if len(limits) == 1:
+            with handling_interrupts(database):
+                yield limit
+        else:
+            yield limit
+    except (OperationalError, sqlite3.OperationalError) as e:
+        # SQLite rolls back a transaction whose write was interrupted, so
+        # ending the transaction afterwards finds none
+        if "interrupted" not in str(e) and "no transaction is active" not in str(e):
+            raise
+        check_interrupted(limits, limit)
+        # an outer limit expired, it reports the error
+        raise
+    else:
+        # commands report errors as output, so an interrupted statement can
+        # end without raising
+        check_interrupted(limits, limit)
+    finally:
+        limits.pop()
@@ -1,8 +1,78 @@
 import re
+import shlex
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
 
-from peewee import IntegrityError
+from peewee import DatabaseError, IntegrityError
 
+from mon_health.advisor import apply_advice, get_advice, record_query, save_query_shapes
+from mon_health.backup import backup_database, verify_backup
+from mon_health.cancellation import cancellable
+from mon_health.concurrency import execute_write
+from mon_health.db import (
+    create_tables,
+    get_setting,
+    has_compact_dates,
+    make_database,
+    make_tables,
+    migrate_dates,
+    set_setting,
+)
 from mon_health.food_parser import FoodParser
+from mon_health.history import get_history_rows, select_history
+from mon_health.maintenance import record_changes, run_maintenance
+from mon_health.meals import (
+    count_daily,
+    parse_meals_args,
+    refresh_meals,
+    reset_meals,
+    select_cached_meals,
+    select_entries,
+    sessionize,
+)
+from mon_health.memprofile import get_report, profile
+from mon_health.metrics import Metrics, get_command_label
+from mon_health.nutrients import (
+    NUTRIENTS,
+    InvalidNutrients,
+    format_totals,
+    import_aliases,
+    import_nutrients,
+    merge_totals,
+    parse_nutrition_args,
+    select_nutrition,
+    update_lookups,
+)
+from mon_health.pairs import (
+    count_pairs,
+    get_top_pairs,
+    parse_pairs_args,
+    select_pair_rows,
+)
+from mon_health.partition import (
+    InvalidYear,
+    check_delete,
+    check_update,
+    freeze_year,
+    get_session_archives,
+    get_sources,
+    get_years,
+    get_years_between,
+    migrate_archives,
+    parse_filter,
+    select_partitions,
+)
+from mon_health.profile import select_profiles
+from mon_health.slowlog import (
+    SLOW_THRESHOLD,
+    Trace,
+    get_log_path,
+    get_worst_offenders,
+    log_if_slow,
+)
+from mon_health.sync import create_triggers, is_tracked, sync_database
 from mon_health.utils import format_rows
 
 
@@ -22,12 +92,35 @@ class IdFieldNotFound(Exception):
     pass
 
 
+class SessionNotFound(Exception):
+    pass
+
+
+class ReadOnlySession(Exception):
+    pass
+
+
+class InvalidBudget(Exception):
+    pass
+
+
+class InvalidBackup(Exception):
+    pass
+
+
+class InvalidSetting(Exception):
+    pass
+
+
 class Command:
     # def __init__(self, description):
     #     self.description = description
     #     self.db = DB
 
     description = "You should override this var."
+    writes = False
+    own_transaction = False
+    asynchronous = False
 
     def exec(self, *args):
         # make it an abstract class? "import abc"
@@ -59,11 +152,18 @@ class HelpCommand(Command):
 
 class InsertCommand(Command):
     description = "Inserts entry into database."
+    writes = True
+    asynchronous = True
+
+    @staticmethod
+    def get_names(args):
+        return sorted(re.split(r"\s*,\s*", args.strip()))
 
     @staticmethod
     def parse_args(args):
+        Food = current_session().Food
         return Food.insert_many(
-            [{"name": name} for name in sorted(re.split(r"\s*,\s*", args.strip()))]
+            [{"name": name} for name in InsertCommand.get_names(args)]
         )
 
     @staticmethod
@@ -71,15 +171,29 @@ class InsertCommand(Command):
         try:
             query = InsertCommand.parse_args(args)
         except Exception as e:
+            report_error(e)
             return [e.args[0]]
 
+        session = current_session()
+        rows_inserted = len(InsertCommand.get_names(args))
+        if session.writer is not None:
+            session.writer.submit(query)
+            session.count_rows("modified", rows_inserted)
+            return []
+
         try:
-            query.execute()
+            execute_write(get_database(), query.execute)
+            session.count_rows("modified", rows_inserted)
             return []
-        except IntegrityError:
-            return ["Invalid insert query."]
         except Exception as e:
-            return [e.args[0]]
+            report_error(e)
+            return [InsertCommand.format_error(e)]
+
+    @staticmethod
+    def format_error(error):
+        if isinstance(error, IntegrityError):
+            return "Invalid insert query."
+        return error.args[0]
 
 
 class FindCommand(Command):
@@ -87,8 +201,22 @@ class FindCommand(Command):
 
     @staticmethod
     def parse_args(args):
-        parser = FoodParser(Food)
+        parser = FoodParser(current_session().Food)
         parser.parse(args)
+        return FindCommand.build_query(parser, args)
+
+    @staticmethod
+    def build_query(parser, args):
+        session = current_session()
+        Food = session.Food
+        columns = parser.columns or ["id", "name", "time", "date"]
+        if session.profiles:
+            return select_profiles(session, parser, args), ["profile"] + columns
+        if get_session_archives(session):
+            query = select_partitions(session, parser, args)
+            if query is not None:
+                return query, columns
+
         query = (
             Food.select(*parser.returning_clause)
             .where(parser.where_clause)
@@ -96,22 +224,167 @@ class FindCommand(Command):
             .limit(parser.limit_clause)
             .dicts()
         )
-        return query, parser.columns or ["id", "name", "time", "date"]
+        return query, columns
+
+    @staticmethod
+    def execute(args):
+        try:
+            session = current_session()
+            started = time.perf_counter()
+            with session.trace.phase("parse"):
+                parser = FoodParser(session.Food)
+                parser.parse(args)
+                query, columns = FindCommand.build_query(parser, args)
+            session.trace.add_query(query)
+            with session.trace.phase("query"):
+                rows = list(query)
+            with session.trace.phase("format"):
+                output = list(format_rows(rows, columns))
+            record_query(session, parser, args, time.perf_counter() - started)
+            # the header and separator lines aren't rows
+            session.count_rows("returned", len(output) - 2)
+            return output
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+
+class HistoryCommand(Command):
+    description = (
+        "Prints last serving, count, mean and median gaps and longest daily "
+        "streak of every food found."
+    )
+
+    @staticmethod
+    def parse_args(args):
+        session = current_session()
+        Food = session.Food
+        parser = FoodParser(Food)
+        parser.parse(args)
+        years = get_years(parser.where_clause, Food)
+        sources = get_sources(session, years, lambda Food: parse_filter(Food, args))
+        filters = [(Food, parser.where_clause)]
+        filters += [(Archive, parse_filter(Archive, args)) for Archive in sources[1:]]
+        return select_history(filters, parser.limit_clause)
+
+    @staticmethod
+    def execute(args):
+        try:
+            session = current_session()
+            if session.profiles:
+                raise ReadOnlySession("Several profiles can only be queried.")
+            with session.trace.phase("parse"):
+                query = HistoryCommand.parse_args(args)
+            session.trace.add_query(query)
+            with session.trace.phase("query"):
+                rows = get_history_rows(query)
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        session.count_rows("returned", len(rows))
+        if not rows:
+            return ["No food was found."]
+        columns = [
+            "name",
+            "last_date",
+            "last_time",
+            "count",
+            "mean_gap",
+            "median_gap",
+            "streak",
+        ]
+        return format_rows(rows, columns)
+
+
+class MealsCommand(Command):
+    description = (
+        "Groups entries into meals separated by a 'gap', 'daily' counts them per "
+        "day, 'cache' stores them in the meal table."
+    )
+
+    @staticmethod
+    def execute(args):
+        try:
+            session = current_session()
+            if session.profiles:
+                raise ReadOnlySession("Several profiles can only be queried.")
+            with session.trace.phase("parse"):
+                options = parse_meals_args(args)
+            if options["cache"]:
+                with session.trace.phase("refresh"):
+                    # the newest meal can start in any year, so every archive
+                    # is read
+                    sources = get_sources(session)
+                    refresh_meals(session.tables, options["gap"], sources)
+                query = select_cached_meals(
+                    session.tables["meal"], options["from"], options["to"]
+                )
+                meals = query.iterator()
+            else:
+                years = get_years_between(options["from"], options["to"])
+                query = select_entries(
+                    get_sources(session, years), options["from"], end_date=options["to"]
+                )
+                meals = sessionize(query.iterator(), options["gap"])
+            if options["daily"]:
+                meals = count_daily(meals)
+            session.trace.add_query(query)
+            with session.trace.phase("query"):
+                rows = list(islice(meals, options["limit"]))
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        session.count_rows("returned", len(rows))
+        if not rows:
+            return ["No meals were found."]
+        if options["daily"]:
+            return format_rows(rows, ["date", "meals", "items"])
+        return format_rows(
+            rows, ["start_date", "start_time", "end_time", "count", "items"]
+        )
+
+
+class PairsCommand(Command):
+    description = (
+        "Counts foods eaten within a 'window' of each other, between 'from' and "
+        "'to' dates."
+    )
 
     @staticmethod
     def execute(args):
         try:
-            query, columns = FindCommand.parse_args(args)
-            return format_rows(query, columns)
+            session = current_session()
+            if session.profiles:
+                raise ReadOnlySession("Several profiles can only be queried.")
+            with session.trace.phase("parse"):
+                options = parse_pairs_args(args)
+                years = get_years_between(options["from"], options["to"])
+                query = select_pair_rows(
+                    get_sources(session, years), options["from"], options["to"]
+                )
+            session.trace.add_query(query)
+            with session.trace.phase("query"):
+                windows, items, pairs = count_pairs(query.iterator(), options["window"])
         except Exception as e:
+            report_error(e)
             return [e.args[0]]
 
+        rows = get_top_pairs(windows, items, pairs, options["limit"])
+        session.count_rows("returned", len(rows))
+        if not rows:
+            return ["No foods were eaten together."]
+        return format_rows(rows, ["first", "second", "count", "support", "lift"])
+
 
 class UpdateCommand(Command):
     description = "Updates entry into database."
+    writes = True
 
     @staticmethod
     def parse_args(args):
+        Food = current_session().Food
         parser = FoodParser(Food)
         parser.parse(args)
         params = {}
@@ -127,51 +400,82 @@ class UpdateCommand(Command):
         if parser.time:
             params["time"] = parser.time
 
+        check_update(current_session(), parser)
         return Food.replace(**params)
 
     @staticmethod
     def execute(args):
         try:
-            query = UpdateCommand.parse_args(args)
-        except IdFieldNotFound:
+            with current_session().trace.phase("parse"):
+                query = UpdateCommand.parse_args(args)
+        except IdFieldNotFound as e:
+            report_error(e)
             return ["Id field should be given."]
-        except NameFieldNotFound:
+        except NameFieldNotFound as e:
+            report_error(e)
             return ["Name field should be given."]
         except Exception as e:
+            report_error(e)
             return [e.args[0]]
 
         try:
-            query.execute()
+            session = current_session()
+            session.trace.add_query(query)
+            with session.trace.phase("query"):
+                execute_write(get_database(), query.execute)
+            session.count_rows("modified", 1)
             return ["1 row modified."]
-        except IntegrityError:
+        except IntegrityError as e:
+            report_error(e)
             return ["Invalid update query."]
         except Exception as e:
+            report_error(e)
             return [e.args[0]]
 
 
 class DeleteCommand(Command):
     description = "Delete entry from database."
+    writes = True
 
     @staticmethod
     def parse_args(args):
-        parser = FoodParser(Food)
+        parser = FoodParser(current_session().Food)
         parser.parse(args)
-        return Food.delete().where(parser.where_clause)
+        return DeleteCommand.build_query(parser, args)
+
+    @staticmethod
+    def build_query(parser, args):
+        session = current_session()
+        check_delete(session, parser, args)
+        return session.Food.delete().where(parser.where_clause)
 
     @staticmethod
     def execute(args):
         try:
-            query = DeleteCommand.parse_args(args)
-        except IdFieldNotFound:
+            with current_session().trace.phase("parse"):
+                parser = FoodParser(current_session().Food)
+                parser.parse(args)
+                query = DeleteCommand.build_query(parser, args)
+        except IdFieldNotFound as e:
+            report_error(e)
             return ["Id field should be given."]
         except Exception as e:
+            report_error(e)
             return [e.args[0]]
 
         try:
-            rows_modified = query.execute()
-        except IntegrityError:
+            session = current_session()
+            session.trace.add_query(query)
+            started = time.perf_counter()
+            with session.trace.phase("query"):
+                rows_modified = execute_write(get_database(), query.execute)
+            record_query(session, parser, args, time.perf_counter() - started)
+            session.count_rows("modified", rows_modified)
+        except IntegrityError as e:
+            report_error(e)
             return ["Invalid delete query."]
         except Exception as e:
+            report_error(e)
             return [e.args[0]]
 
         if rows_modified == 1:
@@ -179,6 +483,361 @@ class DeleteCommand(Command):
         return [f"{rows_modified} rows modified."]
 
 
+class SyncCommand(Command):
+    description = (
+        "Waits until queued writes are stored, then exchanges changes with the "
+        "database file given, if any."
+    )
+
+    @staticmethod
+    def execute(args):
+        session = current_session()
+        outputs = []
+        if session.writer is not None:
+            outputs.extend(InsertCommand.format_error(e) for e in session.writer.sync())
+        if not args:
+            return outputs
+
+        if session.profiles:
+            raise ReadOnlySession("Several profiles can only be queried.")
+        received, sent = sync_database(session, args.strip().strip("'\""))
+        outputs.append(f"{received} changes received, {sent} changes sent.")
+        return outputs
+
+
+class MigrateCommand(Command):
+    description = "Stores dates and times as 'compact' integers or as 'text'."
+    writes = True
+
+    @staticmethod
+    def execute(args):
+        formats = {"compact": True, "text": False}
+        if args.lower() not in formats:
+            return ["Format should be 'compact' or 'text'."]
+
+        session = current_session()
+        compact_dates = formats[args.lower()]
+        migrated = has_compact_dates(session.database) != compact_dates
+        rows_migrated = migrate_dates(session.database, compact_dates)
+        rows_migrated += migrate_archives(session, compact_dates)
+        session.load_tables()
+        if is_tracked(session.tables):
+            # the triggers were dropped along with the old table
+            create_triggers(session.database)
+        if migrated:
+            reset_meals(session.tables)
+        if rows_migrated == 1:
+            return [f"{rows_migrated} row migrated."]
+        return [f"{rows_migrated} rows migrated."]
+
+
+class FreezeCommand(Command):
+    description = "Moves a past year into its own read-only compacted file."
+    writes = True
+    own_transaction = True
+
+    @staticmethod
+    def parse_args(args):
+        if not re.fullmatch(r"\d{4}", args):
+            raise InvalidYear("Year should have 4 digits.")
+        return int(args)
+
+    @staticmethod
+    def execute(args):
+        try:
+            year = FreezeCommand.parse_args(args)
+            rows_moved = freeze_year(current_session(), year)
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        if rows_moved == 1:
+            return [f"{rows_moved} row frozen."]
+        return [f"{rows_moved} rows frozen."]
+
+
+class AdviseCommand(Command):
+    description = "Suggests indexes for frequent queries, 'apply' creates them."
+    writes = True
+    # the listing only reads, so it mustn't wait for the next batch of writes
+    own_transaction = True
+
+    @staticmethod
+    def execute(args):
+        session = current_session()
+        if args.lower() == "apply":
+            return apply_advice(session, lambda args: FindCommand.parse_args(args)[0])
+        if args:
+            return ["Argument should be empty or 'apply'."]
+
+        rows = []
+        indexes = [index.name for index in session.database.get_indexes("food")]
+        for shape, columns, index in get_advice(session):
+            if index is not None and index not in indexes:
+                index += " (missing)"
+            rows.append(
+                {
+                    "shape": shape.shape,
+                    "runs": shape.runs,
+                    "avg_ms": f"{shape.seconds / shape.runs * 1000:.2f}",
+                    "index": index or "-",
+                }
+            )
+        if not rows:
+            return ["No queries were recorded yet."]
+        return format_rows(rows, ["shape", "runs", "avg_ms", "index"])
+
+
+class MaintainCommand(Command):
+    description = "Checks, analyzes and vacuums the database, within N seconds."
+    writes = True
+    own_transaction = True
+
+    @staticmethod
+    def parse_args(args):
+        if not args:
+            return None
+        try:
+            budget = float(args)
+            assert budget > 0
+            return budget
+        except (ValueError, AssertionError):
+            raise InvalidBudget("Time budget should be a positive number.")
+
+    @staticmethod
+    def execute(args):
+        try:
+            budget = MaintainCommand.parse_args(args)
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        rows = run_maintenance(current_session(), budget)
+        return format_rows(rows, ["step", "result", "ms"])
+
+
+class BackupCommand(Command):
+    description = (
+        "Copies the open database to a file, 'gzip' compresses it, 'incremental' "
+        "stores changed pages in a directory. 'verify' checks a backup."
+    )
+    options = {"gzip", "incremental"}
+
+    @staticmethod
+    def parse_args(args):
+        words = shlex.split(args)
+        if words[:1] == ["verify"] and len(words) == 2:
+            return "verify", words[1], set()
+        if not words or not set(words[1:]).issubset(BackupCommand.options):
+            raise InvalidBackup(
+                "Usage: backup <path> [gzip] [incremental] or backup verify <path>."
+            )
+        return "backup", words[0], set(words[1:])
+
+    @staticmethod
+    def execute(args):
+        try:
+            action, path, options = BackupCommand.parse_args(args)
+            if action == "verify":
+                return [f"Backup {verify_backup(path)} is ok."]
+
+            result = backup_database(
+                current_session().database,
+                path,
+                compress="gzip" in options,
+                incremental="incremental" in options,
+            )
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        if "incremental" in options:
+            manifest_path, pages, new_pages = result
+            return [f"{pages} pages backed up to {manifest_path}, {new_pages} new."]
+        return [f"Backed up to {result}."]
+
+
+class SetCommand(Command):
+    description = (
+        "Sets 'timeout' of every command and 'slowlog' threshold in seconds, "
+        "'off' disables them."
+    )
+    writes = True
+    own_transaction = True
+
+    @staticmethod
+    def parse_seconds(name, value):
+        if value.lower() == "off":
+            return None
+        try:
+            seconds = float(value)
+            assert seconds > 0
+            return seconds
+        except (ValueError, AssertionError):
+            raise InvalidSetting(
+                f"{name.capitalize()} should be a positive number or 'off'."
+            )
+
+    @staticmethod
+    def execute(args):
+        session = current_session()
+        if not args:
+            return [
+                f"{name} {getattr(session, attribute) or 'off'}"
+                for name, attribute in SECONDS_SETTINGS.items()
+            ]
+
+        try:
+            name, value = args.lower().split(None, 1)
+            assert name in SECONDS_SETTINGS
+        except (ValueError, AssertionError):
+            return ["Usage: set timeout|slowlog <seconds>|off."]
+        try:
+            seconds = SetCommand.parse_seconds(name, value)
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+        setattr(session, SECONDS_SETTINGS[name], seconds)
+        set_setting(session.tables, name, seconds or "off")
+        return []
+
+
+class MetricsCommand(Command):
+    description = "Prints command counts, errors, rows and latencies."
+
+    @staticmethod
+    def execute(args):
+        rows = current_session().metrics.get_summary()
+        if not rows:
+            return ["No commands were run yet."]
+        columns = ["command", "count", "errors", "rows", "p50_ms", "p95_ms", "max_ms"]
+        return format_rows(rows, columns)
+
+
+class SlowlogCommand(Command):
+    description = "Summarizes the slowest commands of the slow query log."
+
+    @staticmethod
+    def execute(args):
+        session = current_session()
+        path = session.slow_log or get_log_path()
+        offenders = get_worst_offenders(path)
+        if not offenders:
+            return ["No slow commands were logged yet."]
+
+        rows = []
+        for offender in offenders:
+            entry = offender["entry"]
+            plans = [" ".join(query["plan"]) for query in entry["queries"]]
+            rows.append(
+                {
+                    "command": entry["expanded"],
+                    "runs": offender["runs"],
+                    "max_s": f"{offender['max']:.3f}",
+                    "avg_s": f"{offender['seconds'] / offender['runs']:.3f}",
+                    "plan": "; ".join(plans),
+                }
+            )
+        return format_rows(rows, ["command", "runs", "max_s", "avg_s", "plan"])
+
+
+class MemprofileCommand(Command):
+    description = "Runs a command while tracing memory allocations."
+
+    @staticmethod
+    def execute(args):
+        session = current_session()
+        try:
+            command, command_args = parse_input(args)
+            check_command(command)
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        # rows counted by the command go to this command's trace
+        rows_before = sum(session.trace.rows.values())
+        outputs, peak, stats = profile(lambda: list(command.execute(command_args)))
+        rows = sum(session.trace.rows.values()) - rows_before
+        summary, sites = get_report(peak, stats, rows)
+        return (
+            outputs + [summary] + list(format_rows(sites, ["module", "held", "blocks"]))
+        )
+
+
+class ImportNutrientsCommand(Command):
+    description = (
+        "Loads nutrients per serving of items from a CSV file, 'aliases' loads "
+        "the items foods are named after."
+    )
+    writes = True
+    own_transaction = True
+
+    @staticmethod
+    def parse_args(args):
+        words = shlex.split(args)
+        if len(words) == 2 and words[0].lower() == "aliases":
+            return "aliases", words[1]
+        if len(words) == 1:
+            return "items", words[0]
+        raise InvalidNutrients("Usage: import-nutrients [aliases] <path>.")
+
+    @staticmethod
+    def execute(args):
+        try:
+            kind, path = ImportNutrientsCommand.parse_args(args)
+            tables = current_session().tables
+            if kind == "aliases":
+                rows_imported = import_aliases(tables, path)
+            else:
+                rows_imported = import_nutrients(tables, path)
+        except OSError as e:
+            report_error(e)
+            return [f"File '{path}' can't be read: {e.strerror}."]
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        noun = "alias" if kind == "aliases" else "item"
+        if rows_imported == 1:
+            return [f"{rows_imported} {noun} imported."]
+        return [f"{rows_imported} {kind} imported."]
+
+
+class NutritionCommand(Command):
+    description = (
+        "Sums nutrients of the entries per day, between 'from' and 'to' dates."
+    )
+
+    @staticmethod
+    def execute(args):
+        try:
+            session = current_session()
+            if session.profiles:
+                raise ReadOnlySession("Several profiles can only be queried.")
+            with session.trace.phase("parse"):
+                options = parse_nutrition_args(args)
+                years = get_years_between(options["from"], options["to"])
+                sources = get_sources(session, years)
+            with session.trace.phase("lookup"):
+                update_lookups(session.tables, sources)
+            queries = [
+                select_nutrition(session.tables, options["from"], options["to"], Food)
+                for Food in sources
+            ]
+            for query in queries:
+                session.trace.add_query(query)
+            with session.trace.phase("query"):
+                rows = [format_totals(row) for row in merge_totals(queries)]
+        except Exception as e:
+            report_error(e)
+            return [e.args[0]]
+
+        session.count_rows("returned", len(rows))
+        if not rows:
+            return ["No entries were found."]
+        return format_rows(rows, ["date", "entries", "unknown"] + NUTRIENTS)
+
+
 class ExitCommand(Command):
     description = "Exits shell."
 
@@ -187,60 +846,199 @@ class ExitCommand(Command):
         return []
 
 
-def setup_commands(tables, command_table=None, alias_table=None):
-    global Food, COMMAND_TABLE, ALIAS_TABLE
-
-    Food = tables["food"]
-
-    if command_table is None:
-        COMMAND_TABLE = {
-            "help": HelpCommand,
-            "insert": InsertCommand,
-            "find": FindCommand,
-            "update": UpdateCommand,
-            "delete": DeleteCommand,
-            "exit": ExitCommand,
-        }
-    else:
-        COMMAND_TABLE = command_table
-    if alias_table is None:
-        ALIAS_TABLE = {
-            "h": "help",
-            "i": "insert",
-            "f": "find",
-            "u": "update",
-            "d": "delete",
-            "today": "find date today",
-            "last": "find date today limit",
-            "id": "find id",
-            "name": "find name",
-            "date": "find date",
-            "time": "find time",
-        }
-    else:
-        ALIAS_TABLE = alias_table
+SECONDS_SETTINGS = {"timeout": "timeout", "slowlog": "slow_threshold"}
+DEFAULT_COMMAND_TABLE = {
+    "help": HelpCommand,
+    "insert": InsertCommand,
+    "find": FindCommand,
+    "history": HistoryCommand,
+    "meals": MealsCommand,
+    "pairs": PairsCommand,
+    "update": UpdateCommand,
+    "delete": DeleteCommand,
+    "sync": SyncCommand,
+    "migrate": MigrateCommand,
+    "freeze": FreezeCommand,
+    "advise": AdviseCommand,
+    "maintain": MaintainCommand,
+    "backup": BackupCommand,
+    "set": SetCommand,
+    "metrics": MetricsCommand,
+    "slowlog": SlowlogCommand,
+    "import-nutrients": ImportNutrientsCommand,
+    "nutrition": NutritionCommand,
+    "\\memprofile": MemprofileCommand,
+    "exit": ExitCommand,
+}
+DEFAULT_ALIAS_TABLE = {
+    "h": "help",
+    "i": "insert",
+    "f": "find",
+    "u": "update",
+    "d": "delete",
+    "today": "find date today",
+    "last": "find date today limit",
+    "id": "find id",
+    "name": "find name",
+    "date": "find date",
+    "time": "find time",
+}
+
+CURRENT_SESSION = ContextVar("CURRENT_SESSION", default=None)
+DEFAULT_SESSION = None
+
+
+class Session:
+    def __init__(
+        self, tables, command_table=None, alias_table=None, writer=None, profiles=None
+    ):
+        self.tables = tables
+        self.Food = tables["food"]
+        if command_table is None:
+            command_table = dict(DEFAULT_COMMAND_TABLE)
+        self.command_table = command_table
+        if alias_table is None:
+            alias_table = dict(DEFAULT_ALIAS_TABLE)
+        self.alias_table = alias_table
+        self.writer = writer
+        self.archives = None
+        # when several profiles are queried at once, the session is opened on
+        # the first one and is read-only
+        self.profiles = profiles
+        self.query_shapes = {}
+        self.recorded_changes = 0
+        self.timeout = None
+        self.slow_threshold = SLOW_THRESHOLD
+        if "setting" in tables:
+            self.timeout = get_seconds_setting(tables, "timeout", None)
+            self.slow_threshold = get_seconds_setting(tables, "slowlog", SLOW_THRESHOLD)
+        self.metrics = Metrics()
+        self.exporter = None
+        self.trace = Trace()
+        self.slow_log = None
+        self.recorder = None
+
+    @classmethod
+    def open(cls, path, compact_dates=False, memory=False, **kwargs):
+        database = make_database(path, memory)
+        if "food" in database.get_tables():
+            compact_dates = has_compact_dates(database)
+        tables = make_tables(database, compact_dates)
+        create_tables(database, tables)
+        return cls(tables, **kwargs)
+
+    def load_tables(self):
+        database = self.database
+        self.tables = make_tables(database, has_compact_dates(database))
+        self.Food = self.tables["food"]
+
+    @property
+    def database(self):
+        return self.Food._meta.database
+
+    @contextmanager
+    def activate(self):
+        token = CURRENT_SESSION.set(self)
+        try:
+            yield self
+        finally:
+            CURRENT_SESSION.reset(token)
+
+    def execute(self, input):
+        with self.activate():
+            return run_query(input)
+
+    def count_rows(self, kind, count):
+        self.metrics.count_rows(kind, count)
+        self.trace.count_rows(kind, count)
+
+    @contextmanager
+    def tracing(self, command, args, input=None):
+        label = get_command_label(command)
+        self.trace = Trace(input, f"{label} {args}".strip())
+        started = time.perf_counter()
+        try:
+            yield self.trace
+        finally:
+            elapsed = time.perf_counter() - started
+            trace, self.trace = self.trace, Trace()
+            try:
+                log_if_slow(self, trace, elapsed)
+                if self.recorder is not None and input is not None:
+                    self.recorder.record(input, label, elapsed)
+            except (OSError, DatabaseError) as e:
+                # a full disk or a plan that can't be explained mustn't fail a
+                # command that succeeded, so the error is only counted
+                report_error(e, label)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.exporter is not None:
+            self.exporter.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        save_query_shapes(self)
+        record_changes(self)
+        self.database.close()
+
+
+def report_error(error, label=None):
+    session = CURRENT_SESSION.get() or DEFAULT_SESSION
+    if session is not None:
+        session.metrics.count_error(error, label)
+
+
+def get_seconds_setting(tables, key, default):
+    value = get_setting(tables, key)
+    if value is None:
+        return default
+    return None if value == "off" else float(value)
+
+
+def current_session():
+    session = CURRENT_SESSION.get() or DEFAULT_SESSION
+    if session is None:
+        raise SessionNotFound("No session is active.")
+    return session
+
+
+def set_default_session(session):
+    global DEFAULT_SESSION
+
+    DEFAULT_SESSION = session
+
+
+def setup_commands(tables, command_table=None, alias_table=None, writer=None):
+    session = Session(tables, command_table, alias_table, writer)
+    set_default_session(session)
+    return session
+
+
+def get_database():
+    return current_session().database
 
 
 def get_command(name):
     try:
-        return COMMAND_TABLE[name]
+        return current_session().command_table[name]
     except KeyError:
         raise CommandNotFound(f"Command '{name}' does not exist.")
 
 
 def get_commands():
-    return COMMAND_TABLE.items()
+    return current_session().command_table.items()
 
 
 def get_alias(name):
     try:
-        return ALIAS_TABLE[name]
+        return current_session().alias_table[name]
     except KeyError:
         raise AliasNotFound(f"Alias '{name}' does not exist.")
 
 
 def get_aliases():
-    return ALIAS_TABLE.items()
+    return current_session().alias_table.items()
 
 
 def parse_query(query):
@@ -262,10 +1060,45 @@ def parse_input(input):
     return command, args
 
 
-def execute_query(input):
+def check_command(command):
+    if command.writes and current_session().profiles:
+        raise ReadOnlySession("Several profiles can only be queried.")
+
+
+def run_command(command, args, input=None):
+    outputs = []
+    label = get_command_label(command)
+    try:
+        session = current_session()
+        with session.metrics.measure(label), session.tracing(command, args, input):
+            check_command(command)
+            if session.writer is not None and not command.asynchronous:
+                # queued inserts must be visible to every other command
+                outputs.extend(SyncCommand.execute(""))
+            with cancellable(session.database, session.timeout):
+                command_outputs = list(command.execute(args))
+            outputs.extend(command_outputs)
+    except Exception as e:
+        report_error(e, label)
+        outputs.append(e.args[0])
+    return outputs
+
+
+def run_query(input):
     try:
         command, args = parse_input(input)
-        for output in command.execute(args):
-            print(output)
     except Exception as e:
-        print(e.args[0])
+        report_error(e)
+        return [e.args[0]]
+
+    return run_command(command, args, input)
+
+
+def execute_command(command, args, input=None):
+    for output in run_command(command, args, input):
+        print(output)
+
+
+def execute_query(input):
+    for output in run_query(input):
+        print(output)
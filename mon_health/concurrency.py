@@ -0,0 +1,53 @@
+import random
+import time
+
+from peewee import OperationalError
+
+BUSY_TIMEOUT = 5
+PRAGMAS = {"journal_mode": "wal", "synchronous": "normal"}
+RETRIES = 8
+BASE_DELAY = 0.01
+MAX_DELAY = 1.0
+
+
+class DatabaseBusy(Exception):
+    pass
+
+
+def is_busy_error(error):
+    # SQLITE_LOCKED ("database table is locked") comes from the same
+    # connection, so waiting for other processes can't clear it
+    return (
+        isinstance(error, OperationalError)
+        and "database is locked" in str(error).lower()
+    )
+
+
+def get_backoff_delay(attempt):
+    # full jitter keeps competing processes from retrying in lockstep
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2**attempt))
+
+
+def retry_on_busy(func, retries=RETRIES):
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except OperationalError as e:
+            if not is_busy_error(e):
+                raise
+        if attempt < retries:
+            time.sleep(get_backoff_delay(attempt))
+
+    raise DatabaseBusy(f"Database is still locked after {retries} retries.")
+
+
+def execute_write(database, func, retries=RETRIES):
+    if database.in_transaction():
+        # the outermost transaction already holds the write lock
+        return func()
+
+    def write():
+        with database.atomic(lock_type="IMMEDIATE"):
+            return func()
+
+    return retry_on_busy(write, retries)
@@ -1,8 +1,28 @@
 import os
-from datetime import datetime, time
+from datetime import date, datetime, time
+from functools import lru_cache
 from pathlib import Path
 
-from peewee import CharField, DateField, Model, SqliteDatabase, TimeField
+from peewee import (
+    BooleanField,
+    CharField,
+    DateField,
+    DateTimeField,
+    FloatField,
+    IntegerField,
+    Model,
+    SqliteDatabase,
+    TextField,
+    TimeField,
+)
+
+from mon_health.concurrency import BUSY_TIMEOUT, PRAGMAS, execute_write
+from mon_health.memory import MemoryDatabase
+
+# julianday() of the day before date(1, 1, 1), whose ordinal is 1
+ORDINAL_EPOCH = 1721424.5
+HISTORY_INDEX = "food_name_date_time"
+NUTRITION_INDEX = "food_date_name"
 
 
 def get_app_dir():
@@ -19,11 +39,11 @@ def get_app_dir():
         raise Exception("'HOME' environment variable is not set.")
 
 
-APP_DIR = get_app_dir()
-if not APP_DIR.exists():
-    os.mkdir(APP_DIR)
-
-DB = SqliteDatabase(str(APP_DIR / "health.db"))
+def get_database_path():
+    APP_DIR = get_app_dir()
+    # ~/.local/share may not exist yet either
+    os.makedirs(APP_DIR, exist_ok=True)
+    return APP_DIR / "health.db"
 
 
 def current_time():
@@ -35,17 +55,206 @@ def current_date():
     return datetime.now().date()
 
 
-class BaseModel(Model):
-    class Meta:
-        database = DB
+@lru_cache(maxsize=4096)
+def decode_day_number(value):
+    return date.fromordinal(value)
+
+
+@lru_cache(maxsize=1440)
+def decode_minute_of_day(value):
+    return time(hour=value // 60, minute=value % 60)
+
+
+class DayNumberField(IntegerField):
+    def db_value(self, value):
+        if isinstance(value, date):
+            return value.toordinal()
+        return value
+
+    def python_value(self, value):
+        if value is None:
+            return None
+        return decode_day_number(value)
+
+
+class MinuteOfDayField(IntegerField):
+    def db_value(self, value):
+        if isinstance(value, time):
+            return value.hour * 60 + value.minute
+        return value
+
+    def python_value(self, value):
+        if value is None:
+            return None
+        return decode_minute_of_day(value)
+
+
+def make_database(path, memory=False):
+    if memory:
+        return MemoryDatabase(path)
+    return SqliteDatabase(str(path), timeout=BUSY_TIMEOUT, pragmas=PRAGMAS)
+
+
+def make_tables(db, compact_dates=False, schema=None):
+    # every database gets its own model classes, so several databases can be
+    # used at the same time without rebinding shared models
+    if compact_dates:
+        DateColumn, TimeColumn = DayNumberField, MinuteOfDayField
+    else:
+        DateColumn, TimeColumn = DateField, TimeField
+
+    class BaseModel(Model):
+        class Meta:
+            database = db
+
+    class Food(BaseModel):
+        name = CharField(max_length=20)
+        time = TimeColumn(default=current_time)
+        date = DateColumn(default=current_date)
+
+        class Meta:
+            # per food history in (date, time) order, and daily totals
+            # joined on the names of a date range
+            indexes = (
+                (("name", "date", "time"), False),
+                (("date", "name"), False),
+            )
+
+    class QueryShape(BaseModel):
+        shape = CharField(primary_key=True)
+        runs = IntegerField(default=0)
+        seconds = FloatField(default=0)
+        sample = CharField()
+        last_run = DateTimeField(default=datetime.now)
+
+        class Meta:
+            table_name = "query_shape"
+
+    class Setting(BaseModel):
+        key = CharField(primary_key=True)
+        value = CharField()
+
+    class FoodChange(BaseModel):
+        uuid = CharField(primary_key=True)
+        food_id = IntegerField(null=True, unique=True)
+        version = IntegerField(default=1)
+        site = CharField(default="")
+        seq = IntegerField(index=True)
+        deleted = BooleanField(default=False)
+
+        class Meta:
+            table_name = "food_change"
+
+    class Meal(BaseModel):
+        start_date = DateColumn()
+        start_time = TimeColumn()
+        end_date = DateColumn(index=True)
+        end_time = TimeColumn()
+        count = IntegerField()
+        items = TextField()
+
+        class Meta:
+            indexes = ((("start_date", "start_time"), False),)
+
+    class Nutrient(BaseModel):
+        # lowercased name, entries and aliases are matched on it
+        key = CharField(unique=True)
+        name = CharField()
+        calories = FloatField(null=True)
+        protein = FloatField(null=True)
+        carbs = FloatField(null=True)
+        fat = FloatField(null=True)
+
+    class NutrientAlias(BaseModel):
+        alias = CharField(primary_key=True)
+        key = CharField()
+
+        class Meta:
+            table_name = "nutrient_alias"
+
+    class NutrientLookup(BaseModel):
+        food_name = CharField(primary_key=True)
+        nutrient_id = IntegerField(null=True)
+
+        class Meta:
+            table_name = "nutrient_lookup"
+
+    tables = [
+        Food,
+        QueryShape,
+        Setting,
+        FoodChange,
+        Meal,
+        Nutrient,
+        NutrientAlias,
+        NutrientLookup,
+    ]
+    for table in tables:
+        table._meta.schema = schema
+    return {table._meta.table_name: table for table in tables}
+
+
+def get_setting(tables, key, default=None):
+    Setting = tables["setting"]
+    setting = Setting.get_or_none(Setting.key == key)
+    return default if setting is None else setting.value
+
+
+def set_setting(tables, key, value):
+    Setting = tables["setting"]
+    Setting.replace(key=key, value=str(value)).execute()
+
+
+def create_tables(db, tables):
+    if not set(db.get_tables()).issuperset(tables.keys()):
+        db.create_tables(tables.values())
+    else:
+        Food = tables["food"]
+        indexes = [index.name for index in db.get_indexes("food")]
+        if any(i._name not in indexes for i in Food._meta.fields_to_index()):
+            # databases created before the indexes existed
+            Food._schema.create_indexes()
+
+
+def get_database_file(db):
+    path = getattr(db, "path", None) or db.database
+    if path is None or str(path) == ":memory:":
+        return None
+    return Path(path)
+
+
+def has_compact_dates(db, schema=None):
+    columns = {c.name: c.data_type for c in db.get_columns("food", schema)}
+    return columns.get("date", "").upper() == "INTEGER"
+
+
+def migrate_dates(db, compact_dates):
+    if has_compact_dates(db) == compact_dates:
+        return 0
 
+    if compact_dates:
+        time_sql = (
+            "CAST(strftime('%H', time) AS INTEGER) * 60"
+            " + CAST(strftime('%M', time) AS INTEGER)"
+        )
+        date_sql = f"CAST(julianday(date) - {ORDINAL_EPOCH} AS INTEGER)"
+    else:
+        time_sql = "printf('%02d:%02d:00', time / 60, time % 60)"
+        date_sql = f"date(date + {ORDINAL_EPOCH})"
 
-class Food(BaseModel):
-    name = CharField(max_length=20)
-    time = TimeField(default=current_time)
-    date = DateField(default=current_date)
+    tables = make_tables(db, compact_dates)
 
+    def migrate():
+        db.execute_sql("ALTER TABLE food RENAME TO food_migration")
+        # archives only hold the food table
+        db.create_tables([tables["food"]])
+        cursor = db.execute_sql(
+            f"INSERT INTO food (id, name, time, date) "
+            f"SELECT id, name, {time_sql}, {date_sql} FROM food_migration"
+        )
+        db.execute_sql("DROP TABLE food_migration")
+        # the index was renamed along with the old table, then dropped with it
+        tables["food"]._schema.create_indexes()
+        return cursor.rowcount
 
-tables = {table.__name__.lower(): table for table in [Food]}
-if not set(DB.get_tables()).issuperset(tables.keys()):
-    DB.create_tables(tables.values())
+    return execute_write(db, migrate)
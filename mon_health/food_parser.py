@@ -1,4 +1,5 @@
 import re
+from contextlib import contextmanager
 from datetime import datetime
 from functools import reduce
 
@@ -35,6 +36,18 @@ class InvalidLimit(Exception):
     pass
 
 
+class UnbalancedParentheses(InvalidExpression):
+    pass
+
+
+class ExpressionTooLong(InvalidExpression):
+    pass
+
+
+class ExpressionTooDeep(InvalidExpression):
+    pass
+
+
 class Match:
     def __init__(self, matched, start, end):
         self.matched = matched
@@ -42,6 +55,11 @@ class Match:
         self.end = end
 
 
+# every pattern can match in only one way, so a failed match doesn't backtrack
+# through the input more than once
+QUOTED_PATTERN = r"(?:'[^']*'|\"[^\"]*\"|`[^`]*`)"
+
+
 class FoodParser:
     exprs = [
         {
@@ -52,7 +70,7 @@ class FoodParser:
         {
             "name": "name",
             "keyword_pattern": r"name|n",
-            "value_pattern": r"[`'\"].*?[`'\"]",
+            "value_pattern": rf"{QUOTED_PATTERN}(\s*,\s*{QUOTED_PATTERN})*",
         },
         {
             "name": "date",
@@ -81,6 +99,14 @@ class FoodParser:
         },
     ]
     keyword_patterns = "|".join([e["keyword_pattern"] for e in exprs])
+    filter_names = ["id", "name", "date", "time"]
+    boolean_operators = ["and", "or", "not"]
+    quotes = "`'\""
+    word_pattern = re.compile(r"[^\s()]+")
+    separator_pattern = re.compile(r"\s*,\s*")
+    space_pattern = re.compile(r"\s*")
+    max_input_length = 1000
+    max_depth = 50
 
     def __init__(self, food_table):
         self.Food = food_table
@@ -93,6 +119,7 @@ class FoodParser:
         self.limit_clause = -1
         self.columns = []
         self.returning_clause = []
+        self.depth = 0
 
     def parse_expr(self, *, name, keyword_pattern, value_pattern):
         keyword_match = self.search_keyword(keyword_pattern, self.input)
@@ -106,9 +133,18 @@ class FoodParser:
         self.get_parser(name)(value_match.matched)
 
     def parse(self, input, reset=True):
+        if self.max_input_length and len(input) > self.max_input_length:
+            raise ExpressionTooLong(
+                f"Expression is longer than {self.max_input_length} characters."
+            )
         self.input = input
         if reset:
             self.reset_attributes()
+        tokens = self.tokenize(input)
+        if self.has_boolean_operators(tokens):
+            self.parse_boolean(tokens)
+            return
+
         for expr in self.exprs:
             try:
                 self.parse_expr(**expr)
@@ -120,15 +156,183 @@ class FoodParser:
                 f"Expression '{self.input}' could not be parsed."
             )
 
+    def tokenize(self, string):
+        tokens = []
+        # once a quote has no closing one, neither have the following ones
+        unclosed = set()
+        position = 0
+        while position < len(string):
+            char = string[position]
+            if char.isspace():
+                position += 1
+                continue
+            if char in "()":
+                tokens.append(char)
+                position += 1
+                continue
+            end = self.match_quoted(string, position, unclosed)
+            if end is None:
+                end = self.word_pattern.match(string, position).end()
+            tokens.append(string[position:end])
+            position = end
+        return tokens
+
+    def match_quoted(self, string, position, unclosed):
+        end = None
+        while position < len(string):
+            quote = string[position]
+            if quote not in self.quotes or quote in unclosed:
+                break
+            closing = string.find(quote, position + 1)
+            if closing == -1:
+                unclosed.add(quote)
+                break
+            end = closing + 1
+            separator = self.separator_pattern.match(string, end)
+            if not separator:
+                break
+            position = separator.end()
+        return end
+
+    def has_boolean_operators(self, tokens):
+        return any(
+            token in "()" or token.lower() in self.boolean_operators for token in tokens
+        )
+
+    def get_expr(self, keyword):
+        for expr in self.exprs:
+            if re.fullmatch(expr["keyword_pattern"], keyword, re.I):
+                return expr
+        return None
+
+    def parse_boolean(self, tokens):
+        # sort, limit and returning apply to the whole query, so they are
+        # taken out before the remaining tokens are parsed as a filter.
+        filter_tokens = []
+        clauses = set()
+        depth = 0
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            depth += {"(": 1, ")": -1}.get(token, 0)
+            expr = self.get_expr(token) if depth == 0 else None
+            if expr is None or expr["name"] in self.filter_names:
+                filter_tokens.append(token)
+                i += 1
+                continue
+            if expr["name"] in clauses:
+                # like the keyword syntax, a clause can only be given once
+                repeated = " ".join(tokens[i : i + 2])
+                raise InvalidExpression(f"Expression '{repeated}' could not be parsed.")
+            clauses.add(expr["name"])
+            self.get_parser(expr["name"])(self.match_token(expr, tokens, i + 1))
+            i += 2
+
+        pinned = {name: getattr(self, name) for name in self.filter_names}
+        self.filters = []
+        self.tokens = filter_tokens
+        self.position = 0
+        if self.tokens:
+            self.where_clause_exprs.append(self.parse_or())
+        if self.position < len(self.tokens):
+            if self.tokens[self.position] == ")":
+                raise UnbalancedParentheses("Parentheses are unbalanced.")
+            remaining = " ".join(self.tokens[self.position :])
+            raise InvalidExpression(f"Expression '{remaining}' could not be parsed.")
+        self.input = ""
+
+        # update reads these fields as the entry to replace, which only a
+        # plain conjunction giving each field once names
+        conjunction = not any(
+            token in "()" or token.lower() in ["or", "not"] for token in self.tokens
+        )
+        for name, value in pinned.items():
+            if not conjunction or self.filters.count(name) > 1:
+                setattr(self, name, value)
+
+    def peek_token(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next_token(self):
+        token = self.peek_token()
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        expr = self.parse_and()
+        while (self.peek_token() or "").lower() == "or":
+            self.next_token()
+            expr = expr | self.parse_and()
+        return expr
+
+    def parse_and(self):
+        expr = self.parse_not()
+        while self.peek_token() not in [None, ")"]:
+            if self.peek_token().lower() == "or":
+                break
+            if self.peek_token().lower() == "and":
+                self.next_token()
+            expr = expr & self.parse_not()
+        return expr
+
+    @contextmanager
+    def nested(self):
+        self.depth += 1
+        if self.depth > self.max_depth:
+            raise ExpressionTooDeep("Expression is nested too deeply.")
+        try:
+            yield
+        finally:
+            self.depth -= 1
+
+    def parse_not(self):
+        if (self.peek_token() or "").lower() == "not":
+            self.next_token()
+            with self.nested():
+                return ~self.parse_not()
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.next_token()
+        if token == "(":
+            with self.nested():
+                expr = self.parse_or()
+            if self.next_token() != ")":
+                raise UnbalancedParentheses("Parentheses are unbalanced.")
+            return expr
+        if token is None or token == ")":
+            raise InvalidExpression("Expression is incomplete.")
+
+        expr = self.get_expr(token)
+        if expr is None or expr["name"] not in self.filter_names:
+            raise InvalidExpression(f"Expression '{token}' could not be parsed.")
+        value = self.match_token(expr, self.tokens, self.position)
+        self.position += 1
+        self.filters.append(expr["name"])
+        return self.get_builder(expr["name"])(value)
+
+    def match_token(self, expr, tokens, index):
+        value = tokens[index] if index < len(tokens) else ""
+        if not re.fullmatch(expr["value_pattern"], value, re.I):
+            raise InvalidValue(f"Value '{value}' is invalid.")
+        return value
+
     def ends_with_keyword(self, string):
-        return re.search(f"({self.keyword_patterns})$", string, re.I)
+        # keywords have no whitespace, so only the last word can end with one
+        words = string.rsplit(None, 1)
+        return words and re.search(f"({self.keyword_patterns})$", words[-1], re.I)
 
     def search_keyword(self, pattern, string):
         try:
-            pattern = r"(\s+|^)(" + pattern + r")(\s+|$)"
+            pattern = r"(?<!\S)(" + pattern + r")(?!\S)"
             match = re.search(pattern, string, re.I)
-            assert match and not self.ends_with_keyword(string[: match.start()])
-            return Match(match.group(2), match.start(), match.end())
+            assert match
+            start = len(string[: match.start()].rstrip())
+            assert not self.ends_with_keyword(string[:start])
+            end = self.space_pattern.match(string, match.end()).end()
+            return Match(match.group(1), start, end)
         except AssertionError:
             raise KeywordNotFound(f"String doesn't match pattern '{pattern}'.")
 
@@ -145,6 +349,9 @@ class FoodParser:
     def get_parser(self, name):
         return getattr(self, f"parse_{name}")
 
+    def get_builder(self, name):
+        return getattr(self, f"build_{name}")
+
     def reset_attributes(self):
         self.where_clause_exprs = []
         self.id = None
@@ -155,6 +362,7 @@ class FoodParser:
         self.limit_clause = -1
         self.columns = []
         self.returning_clause = []
+        self.depth = 0
 
     @property
     def where_clause(self):
@@ -164,6 +372,9 @@ class FoodParser:
             return True
 
     def parse_id(self, string):
+        self.where_clause_exprs.append(self.build_id(string))
+
+    def build_id(self, string):
         try:
             assert int(string) >= 1
             op, rhs = "=", int(string)
@@ -171,28 +382,52 @@ class FoodParser:
             raise InvalidId("Id should be a positive integer.")
 
         self.id = rhs
-        self.where_clause_exprs.append(Expression(self.Food.id, op, rhs))
+        return Expression(self.Food.id, op, rhs)
 
     def parse_name(self, string):
-        if not re.match(r"([\"'`]).*\1", string):
-            raise InvalidName("Name should be quoted.")
-        if not string[1:-1]:
-            raise InvalidName("Name can't be empty.")
-
-        op, rhs = "=", string[1:-1]
+        self.where_clause_exprs.append(self.build_name(string))
+
+    def build_name(self, string):
+        names = []
+        position = 0
+        while True:
+            match = re.compile(r"([\"'`])(.*?)\1").match(string, position)
+            if not match:
+                raise InvalidName("Name should be quoted.")
+            if not match.group(2):
+                raise InvalidName("Name can't be empty.")
+            names.append(match.group(2))
+            position = match.end()
+            if position == len(string):
+                break
+            separator = re.compile(r"\s*,\s*").match(string, position)
+            if not separator:
+                raise InvalidName("Names should be separated by commas.")
+            position = separator.end()
+
+        if len(names) > 1:
+            return Expression(self.Food.name, "IN", names)
+
+        op, rhs = "=", names[0]
         self.name = rhs
-        self.where_clause_exprs.append(Expression(self.Food.name, op, rhs))
+        return Expression(self.Food.name, op, rhs)
 
     def parse_date(self, string):
+        self.where_clause_exprs.append(self.build_date(string))
+
+    def build_date(self, string):
         if re.match(string, "today", re.I):
             op, rhs = "=", datetime.now().date()
         else:
             op, rhs = "=", convert_to_date(string)
 
         self.date = rhs
-        self.where_clause_exprs.append(Expression(self.Food.date, op, rhs))
+        return Expression(self.Food.date, op, rhs)
 
     def parse_time(self, string):
+        self.where_clause_exprs.append(self.build_time(string))
+
+    def build_time(self, string):
         if string.endswith("h"):
             op = "BETWEEN"
             hour = string[:-1]
@@ -203,7 +438,7 @@ class FoodParser:
             op, rhs = "=", convert_to_time(string)
             self.time = rhs
 
-        self.where_clause_exprs.append(Expression(self.Food.time, op, rhs))
+        return Expression(self.Food.time, op, rhs)
 
     def parse_sort(self, string):
         columns = []
@@ -0,0 +1,106 @@
+import operator
+from functools import reduce
+
+from mon_health.db import ORDINAL_EPOCH, DayNumberField
+
+MINUTES_PER_DAY = 24 * 60
+
+# gaps come from a single window over the (name, date, time) index, so SQLite
+# reads every food's rows in order without sorting them
+HISTORY_SQL = """
+WITH gap AS (
+    SELECT
+        name,
+        date,
+        time,
+        {day} AS day,
+        {minute} - LAG({minute}) OVER food AS minutes,
+        LEAD(1) OVER food IS NULL AS last
+    FROM ({serving})
+    WINDOW food AS (PARTITION BY name ORDER BY date, time)
+),
+stats AS (
+    SELECT name, COUNT(*) AS servings, AVG(minutes) AS mean_gap
+    FROM gap
+    GROUP BY name
+),
+ranked AS (
+    SELECT
+        name,
+        minutes,
+        ROW_NUMBER() OVER (PARTITION BY name ORDER BY minutes) AS position,
+        COUNT(*) OVER (PARTITION BY name) AS gaps
+    FROM gap
+    WHERE minutes IS NOT NULL
+),
+median AS (
+    SELECT name, AVG(minutes) AS median_gap
+    FROM ranked
+    WHERE position IN ((gaps + 1) / 2, (gaps + 2) / 2)
+    GROUP BY name
+),
+island AS (
+    SELECT name, day - ROW_NUMBER() OVER (PARTITION BY name ORDER BY day) AS island
+    FROM (SELECT DISTINCT name, day FROM gap)
+),
+streak AS (
+    SELECT name, MAX(days) AS streak
+    FROM (SELECT name, COUNT(*) AS days FROM island GROUP BY name, island)
+    GROUP BY name
+)
+SELECT gap.name, gap.date, gap.time, servings, mean_gap, median_gap, streak
+FROM gap
+JOIN stats USING (name)
+LEFT JOIN median USING (name)
+JOIN streak USING (name)
+WHERE last
+ORDER BY gap.date DESC, gap.time DESC, gap.name
+LIMIT ?
+"""
+
+
+def select_history(filters, limit=-1):
+    # filters are (model, where clause) pairs, the main table coming first
+    Food = filters[0][0]
+    if isinstance(Food.date, DayNumberField):
+        day = "date"
+        minute = f"date * {MINUTES_PER_DAY} + time"
+    else:
+        day = f"CAST(julianday(date) - {ORDINAL_EPOCH} AS INTEGER)"
+        minute = f"julianday(date || ' ' || time) * {MINUTES_PER_DAY}"
+
+    queries = [
+        Source.select(Source.name, Source.date, Source.time).where(
+            where_clause & Source.date.is_null(False) & Source.time.is_null(False)
+        )
+        for Source, where_clause in filters
+    ]
+    serving, params = reduce(operator.add, queries).sql()
+    sql = HISTORY_SQL.format(serving=serving, day=day, minute=minute)
+    return Food.raw(sql, *params, limit).tuples()
+
+
+def format_gap(minutes):
+    if minutes is None:
+        return "-"
+    if minutes >= MINUTES_PER_DAY:
+        return f"{minutes / MINUTES_PER_DAY:.1f}d"
+    if minutes >= 60:
+        return f"{minutes / 60:.1f}h"
+    return f"{minutes:.0f}m"
+
+
+def get_history_rows(rows):
+    # raw queries convert columns named like fields of the model
+    return [
+        {
+            "name": name,
+            "last_date": date,
+            "last_time": time,
+            "count": servings,
+            "mean_gap": format_gap(mean_gap),
+            "median_gap": format_gap(median_gap),
+            "streak": streak,
+        }
+        for name, date, time, servings, mean_gap, median_gap, streak in rows
+    ]
@@ -0,0 +1,289 @@
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import click
+from peewee import fn
+
+from mon_health.backup import copy_database
+from mon_health.command import Session, run_query
+from mon_health.concurrency import DatabaseBusy
+from mon_health.replay import PERCENTILES, get_percentile
+from mon_health.utils import format_rows
+
+MIX = {"insert": 2, "find": 6, "update": 1, "delete": 1}
+CONCURRENCY = [1, 2, 4, 8]
+DURATION = 5.0
+ROWS = 1000
+STARTUP_DELAY = 1.0
+
+
+class InvalidMix(Exception):
+    pass
+
+
+class InvalidConcurrency(Exception):
+    pass
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        command, _, weight = part.partition("=")
+        command = command.strip()
+        if command not in MIX:
+            raise InvalidMix(f"Mix commands should be in {', '.join(MIX)}.")
+        try:
+            mix[command] = float(weight) if weight else 1.0
+        except ValueError:
+            raise InvalidMix(f"Weight of '{command}' should be a number.")
+        if mix[command] < 0:
+            raise InvalidMix(f"Weight of '{command}' should be positive.")
+    if not sum(mix.values()):
+        raise InvalidMix("At least one weight should be positive.")
+    return mix
+
+
+def parse_concurrency(text):
+    try:
+        levels = [int(level) for level in text.split(",")]
+    except ValueError:
+        raise InvalidConcurrency("Concurrency should be comma separated integers.")
+    if not levels or min(levels) < 1:
+        raise InvalidConcurrency("Concurrency levels should be at least 1.")
+    return levels
+
+
+class Workload:
+    def __init__(self, worker, mix, rows, ids, seed=None):
+        self.worker = worker
+        self.commands = list(mix)
+        self.weights = list(mix.values())
+        self.rows = max(rows, 1)
+        self.ids = ids
+        self.inserted = 0
+        self.random = random.Random(seed)
+
+    def get_name(self):
+        return f"load-{self.random.randrange(self.rows)}"
+
+    def next_input(self):
+        command = self.random.choices(self.commands, self.weights)[0]
+        if command == "insert":
+            self.inserted += 1
+            return command, f"insert load-{self.worker}-{self.inserted}"
+        if command == "find":
+            return command, f"find name '{self.get_name()}'"
+        if command == "update":
+            id = self.random.randint(*self.ids)
+            return command, f"update id {id} name '{self.get_name()}'"
+        return command, f"delete name '{self.get_name()}'"
+
+
+def count_new_errors(before, after):
+    errors = lock_errors = 0
+    for key, count in after.items():
+        new = count - before.get(key, 0)
+        errors += new
+        # writes raise DatabaseBusy once the busy timeout and the retries are
+        # used up, other operational errors aren't lock contention
+        if key[1] == DatabaseBusy.__name__:
+            lock_errors += new
+    return errors, lock_errors
+
+
+def run_worker(path, worker, mix, rows, ids, start_at, duration):
+    session = Session.open(path)
+    workload = Workload(worker, mix, rows, ids, seed=worker)
+    result = {"latencies": {}, "errors": {}, "lock_errors": {}}
+    try:
+        with session.activate():
+            time.sleep(max(start_at - time.time(), 0))
+            result["started"] = time.time()
+            deadline = result["started"] + duration
+            while time.time() < deadline:
+                label, input = workload.next_input()
+                before = dict(session.metrics.errors)
+                started = time.perf_counter()
+                run_query(input)
+                elapsed = time.perf_counter() - started
+                errors, lock_errors = count_new_errors(before, session.metrics.errors)
+                result["latencies"].setdefault(label, []).append(elapsed)
+                result["errors"][label] = result["errors"].get(label, 0) + errors
+                result["lock_errors"][label] = (
+                    result["lock_errors"].get(label, 0) + lock_errors
+                )
+            result["finished"] = time.time()
+    finally:
+        session.close()
+    return result
+
+
+def summarize(latencies, errors, lock_errors, seconds):
+    summary = {
+        "operations": len(latencies),
+        "ops_per_second": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "errors": errors,
+        "lock_errors": lock_errors,
+    }
+    for percentile in PERCENTILES:
+        value = get_percentile(latencies, percentile) * 1000 if latencies else 0.0
+        summary[f"p{percentile}_ms"] = round(value, 3)
+    return summary
+
+
+def merge_results(concurrency, results):
+    started = min(result["started"] for result in results)
+    seconds = max(result["finished"] for result in results) - started
+    commands = {}
+    for label in sorted({label for r in results for label in r["latencies"]}):
+        commands[label] = summarize(
+            [value for r in results for value in r["latencies"].get(label, [])],
+            sum(r["errors"].get(label, 0) for r in results),
+            sum(r["lock_errors"].get(label, 0) for r in results),
+            seconds,
+        )
+    level = {"concurrency": concurrency, "seconds": round(seconds, 3)}
+    level.update(
+        summarize(
+            [
+                value
+                for r in results
+                for values in r["latencies"].values()
+                for value in values
+            ],
+            sum(sum(r["errors"].values()) for r in results),
+            sum(sum(r["lock_errors"].values()) for r in results),
+            seconds,
+        )
+    )
+    level["commands"] = commands
+    return level
+
+
+def prepare_template(path, database=None, rows=ROWS):
+    if database is not None:
+        source = sqlite3.connect(database)
+        try:
+            copy_database(source, path, pages=-1)
+        finally:
+            source.close()
+
+    session = Session.open(path)
+    try:
+        if rows:
+            names = ", ".join(f"load-{n}" for n in range(rows))
+            session.execute(f"insert {names}")
+        Food = session.Food
+        low, high = Food.select(fn.MIN(Food.id), fn.MAX(Food.id)).scalar(as_tuple=True)
+    finally:
+        session.close()
+    return (low, high) if low is not None else (1, 1)
+
+
+def run_level(template, path, concurrency, mix, rows, ids, duration, threads=False):
+    source = sqlite3.connect(template)
+    try:
+        # every level starts from the same database
+        copy_database(source, path, pages=-1)
+    finally:
+        source.close()
+
+    start_at = time.time() + STARTUP_DELAY
+    Executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with Executor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(
+                run_worker, str(path), worker, mix, rows, ids, start_at, duration
+            )
+            for worker in range(concurrency)
+        ]
+        results = [future.result() for future in futures]
+    return merge_results(concurrency, results)
+
+
+def get_report(levels):
+    columns = ["concurrency", "operations", "ops_per_second"]
+    columns += [f"p{percentile}_ms" for percentile in PERCENTILES]
+    columns += ["errors", "lock_errors"]
+    rows = [{column: str(level[column]) for column in columns} for level in levels]
+    return list(format_rows(rows, columns))
+
+
+@click.command()
+@click.argument(
+    "database", required=False, type=click.Path(exists=True, dir_okay=False)
+)
+@click.option(
+    "--concurrency",
+    default=",".join(str(level) for level in CONCURRENCY),
+    show_default=True,
+    help="Comma separated numbers of simultaneous clients to run, one after another.",
+)
+@click.option(
+    "--duration",
+    default=DURATION,
+    show_default=True,
+    help="Seconds every concurrency level runs for.",
+)
+@click.option(
+    "--mix",
+    default=",".join(f"{command}={weight}" for command, weight in MIX.items()),
+    show_default=True,
+    help="Comma separated weights of the commands the clients run.",
+)
+@click.option(
+    "--rows",
+    default=ROWS,
+    show_default=True,
+    help="Rows inserted before the run, found, updated and deleted by the clients.",
+)
+@click.option(
+    "--threads",
+    is_flag=True,
+    help="Run the clients as threads of one process instead of processes.",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    help="JSON file the results are written to.",
+)
+def main(database, concurrency, duration, mix, rows, threads, output):
+    try:
+        levels = parse_concurrency(concurrency)
+        mix = parse_mix(mix)
+    except (InvalidConcurrency, InvalidMix) as e:
+        raise click.UsageError(e.args[0])
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        # the database given is only read, the clients work on copies
+        template = Path(directory) / "template.db"
+        ids = prepare_template(template, database, rows)
+        for level in levels:
+            path = Path(directory) / f"load-{level}.db"
+            results.append(
+                run_level(template, path, level, mix, rows, ids, duration, threads)
+            )
+            print(f"Concurrency {level}: {results[-1]['ops_per_second']} per second.")
+
+    for line in get_report(results):
+        print(line)
+    if output:
+        config = {
+            "database": database,
+            "mix": mix,
+            "duration": duration,
+            "rows": rows,
+            "clients": "threads" if threads else "processes",
+        }
+        with open(output, "w") as file:
+            json.dump({"config": config, "levels": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
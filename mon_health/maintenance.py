@@ -0,0 +1,145 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from mon_health.cancellation import QueryTimeout, cancellable
+from mon_health.concurrency import execute_write
+from mon_health.db import get_setting, set_setting
+
+AUTO_THRESHOLD = 1000
+AUTO_BUDGET = 0.5
+VACUUM_STEP = 64
+INCREMENTAL = 2
+
+
+class OutOfTime(Exception):
+    pass
+
+
+@contextmanager
+def time_budget(database, deadline):
+    if deadline is None:
+        yield
+        return
+
+    timeout = deadline - time.monotonic()
+    if timeout <= 0:
+        raise OutOfTime
+    try:
+        with cancellable(database, timeout):
+            yield
+    except QueryTimeout:
+        raise OutOfTime
+
+
+def pragma(database, statement):
+    return database.execute_sql(f"PRAGMA {statement}").fetchall()
+
+
+def quick_check(database, deadline=None):
+    rows = pragma(database, "quick_check")
+    return "; ".join(row[0] for row in rows)
+
+
+def analyze(database, deadline=None):
+    if deadline is None:
+        database.execute_sql("ANALYZE")
+        return "analyzed"
+    pragma(database, "analysis_limit = 400")
+    pragma(database, "optimize")
+    return "optimized"
+
+
+def enable_incremental_vacuum(database):
+    if pragma(database, "auto_vacuum")[0][0] == INCREMENTAL:
+        return False
+    pragma(database, "auto_vacuum = INCREMENTAL")
+    # auto_vacuum only changes when the whole file is rewritten
+    database.execute_sql("VACUUM")
+    return True
+
+
+def incremental_vacuum(database, deadline=None):
+    if pragma(database, "auto_vacuum")[0][0] != INCREMENTAL:
+        if deadline is not None:
+            return "skipped, run 'maintain' once to enable it"
+        enable_incremental_vacuum(database)
+        return "enabled, file rewritten"
+
+    pages = 0
+    while pragma(database, "freelist_count")[0][0] > 0:
+        if deadline is not None and time.monotonic() > deadline:
+            raise OutOfTime
+        before = pragma(database, "freelist_count")[0][0]
+        pragma(database, f"incremental_vacuum({VACUUM_STEP})")
+        pages += before - pragma(database, "freelist_count")[0][0]
+    return f"{pages} pages freed"
+
+
+STEPS = [
+    ("quick_check", quick_check),
+    ("analyze", analyze),
+    ("incremental_vacuum", incremental_vacuum),
+]
+
+
+def run_maintenance(session, budget=None):
+    database = session.database
+    deadline = None if budget is None else time.monotonic() + budget
+    rows = []
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            with time_budget(database, deadline):
+                result = step(database, deadline)
+        except OutOfTime:
+            result = "stopped, out of time"
+        elapsed = (time.perf_counter() - started) * 1000
+        rows.append({"step": name, "result": result, "ms": f"{elapsed:.1f}"})
+
+    def reset():
+        set_setting(session.tables, "changes_since_maintenance", 0)
+        set_setting(session.tables, "last_maintenance", datetime.now().isoformat())
+
+    execute_write(database, reset)
+    session.recorded_changes = get_total_changes(session)
+    return rows
+
+
+def get_total_changes(session):
+    return session.database.connection().total_changes
+
+
+@contextmanager
+def uncounted(session):
+    # bookkeeping writes aren't changes that call for maintenance
+    before = get_total_changes(session)
+    try:
+        yield
+    finally:
+        session.recorded_changes += get_total_changes(session) - before
+
+
+def record_changes(session):
+    if "setting" not in session.tables or session.database.is_closed():
+        return 0
+    new_changes = get_total_changes(session) - session.recorded_changes
+    if not new_changes:
+        # read-only sessions leave the counter as it is
+        return int(get_setting(session.tables, "changes_since_maintenance", 0))
+
+    def record():
+        changes = int(get_setting(session.tables, "changes_since_maintenance", 0))
+        changes += new_changes
+        set_setting(session.tables, "changes_since_maintenance", changes)
+        return changes
+
+    changes = execute_write(session.database, record)
+    session.recorded_changes = get_total_changes(session)
+    return changes
+
+
+def maybe_maintain(session, threshold=AUTO_THRESHOLD, budget=AUTO_BUDGET):
+    if record_changes(session) < threshold:
+        return None
+    return run_maintenance(session, budget)
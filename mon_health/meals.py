@@ -0,0 +1,202 @@
+from itertools import groupby, islice
+
+from mon_health.concurrency import execute_write
+from mon_health.db import get_setting, set_setting
+from mon_health.pairs import get_minute
+from mon_health.partition import union_all
+from mon_health.utils import (
+    InvalidDate,
+    InvalidDuration,
+    convert_to_date,
+    convert_to_minutes,
+)
+
+GAP = 60
+INSERT_BATCH = 500
+FLAGS = {"daily", "cache"}
+USAGE = (
+    "Usage: meals [daily] [cache] [gap <minutes>m|<hours>h] [from <date>] "
+    "[to <date>] [limit N]."
+)
+
+# a changed entry can join or split the meals around it, so every cached meal
+# from its date on is dropped and computed again by the next refresh
+TRIGGERS = {
+    # update runs INSERT OR REPLACE, which deletes the old row without firing
+    # food_meal_delete, so the meals around its date are dropped beforehand
+    "food_meal_replace": """
+        BEFORE INSERT ON food
+        BEGIN
+            DELETE FROM meal
+            WHERE end_date >= (SELECT date FROM food WHERE id = NEW.id);
+        END""",
+    "food_meal_insert": """
+        AFTER INSERT ON food
+        BEGIN
+            DELETE FROM meal WHERE end_date >= NEW.date;
+        END""",
+    "food_meal_update": """
+        AFTER UPDATE ON food
+        BEGIN
+            DELETE FROM meal WHERE end_date >= OLD.date OR end_date >= NEW.date;
+        END""",
+    "food_meal_delete": """
+        AFTER DELETE ON food
+        BEGIN
+            DELETE FROM meal WHERE end_date >= OLD.date;
+        END""",
+}
+
+
+class InvalidMealsQuery(Exception):
+    pass
+
+
+def parse_meals_args(args):
+    options = {"gap": GAP, "from": None, "to": None, "limit": None}
+    options.update({flag: False for flag in FLAGS})
+    words = args.split()
+    while words:
+        keyword = words.pop(0).lower()
+        if keyword in FLAGS:
+            options[keyword] = True
+            continue
+        if not words or keyword not in ("gap", "from", "to", "limit"):
+            raise InvalidMealsQuery(USAGE)
+        value = words.pop(0)
+        if keyword == "gap":
+            try:
+                options["gap"] = convert_to_minutes(value)
+            except InvalidDuration:
+                raise InvalidMealsQuery("Gap should be a positive duration like 45m.")
+        elif keyword == "limit":
+            if not value.isdigit():
+                raise InvalidMealsQuery("Limit should be a positive integer.")
+            options["limit"] = int(value)
+        else:
+            try:
+                options[keyword] = convert_to_date(value)
+            except InvalidDate:
+                raise InvalidMealsQuery("Date should be like 31/12/2024.")
+    return options
+
+
+def select_entries(sources, start_date=None, start_time=None, end_date=None):
+    queries = []
+    for Food in sources:
+        query = Food.select(Food.name, Food.date, Food.time, Food.id).where(
+            Food.date.is_null(False) & Food.time.is_null(False)
+        )
+        if start_date is not None:
+            after = Food.date > start_date
+            if start_time is not None:
+                after |= (Food.date == start_date) & (Food.time >= start_time)
+            else:
+                after |= Food.date == start_date
+            query = query.where(after)
+        if end_date is not None:
+            query = query.where(Food.date <= end_date)
+        queries.append(query)
+    return union_all(queries, "date", "time", "id").tuples()
+
+
+def sessionize(entries, gap):
+    # entries come sorted, so only the meal being built is kept in memory
+    meal = None
+    last = None
+    for name, day, time, *_ in entries:
+        minute = get_minute(day, time)
+        if meal is not None and minute - last > gap:
+            yield meal
+            meal = None
+        if meal is None:
+            meal = {"start_date": day, "start_time": time, "count": 0, "items": ""}
+        meal["end_date"], meal["end_time"] = day, time
+        meal["count"] += 1
+        meal["items"] = f"{meal['items']}, {name}" if meal["items"] else name
+        last = minute
+    if meal is not None:
+        yield meal
+
+
+def count_daily(meals):
+    for day, group in groupby(meals, key=lambda meal: meal["start_date"]):
+        counts = [meal["count"] for meal in group]
+        yield {"date": day, "meals": len(counts), "items": sum(counts)}
+
+
+def create_triggers(database):
+    for name, body in TRIGGERS.items():
+        database.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def has_triggers(database):
+    cursor = database.execute_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )
+    return {name for name, in cursor}.issuperset(TRIGGERS)
+
+
+def drop_triggers(database):
+    for name in TRIGGERS:
+        database.execute_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def reset_meals(tables):
+    # the cached dates are stored like the entries', so a migration drops them
+    Meal, Setting = tables["meal"], tables["setting"]
+    database = Meal._meta.database
+    drop_triggers(database)
+    database.drop_tables([Meal])
+    database.create_tables([Meal])
+    Setting.delete().where(Setting.key == "meals_gap").execute()
+
+
+def refresh_meals(tables, gap, sources=None):
+    Meal = tables["meal"]
+    database = Meal._meta.database
+    sources = sources or [tables["food"]]
+
+    def refresh():
+        # a cache kept without every trigger may have missed changes
+        if get_setting(tables, "meals_gap") != str(gap) or not has_triggers(database):
+            Meal.delete().execute()
+            set_setting(tables, "meals_gap", gap)
+            create_triggers(database)
+
+        # the newest meal may still grow, so it is computed again along with
+        # the entries added after it
+        last = Meal.select().order_by(Meal.start_date.desc(), Meal.start_time.desc())
+        last = last.first()
+        if last is None:
+            entries = select_entries(sources)
+        else:
+            entries = select_entries(sources, last.start_date, last.start_time)
+            last.delete_instance()
+
+        meals = sessionize(entries.iterator(), gap)
+        added = 0
+        while True:
+            batch = list(islice(meals, INSERT_BATCH))
+            if not batch:
+                return added
+            Meal.insert_many(batch).execute()
+            added += len(batch)
+
+    return execute_write(database, refresh)
+
+
+def select_cached_meals(Meal, start=None, end=None):
+    query = Meal.select(
+        Meal.start_date,
+        Meal.start_time,
+        Meal.end_date,
+        Meal.end_time,
+        Meal.count,
+        Meal.items,
+    )
+    if start is not None:
+        query = query.where(Meal.start_date >= start)
+    if end is not None:
+        query = query.where(Meal.start_date <= end)
+    return query.order_by(Meal.start_date, Meal.start_time).dicts()
@@ -0,0 +1,164 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from peewee import SqliteDatabase
+
+SNAPSHOT_INTERVAL = 60
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
+
+class MemoryDatabase(SqliteDatabase):
+    # The working copy lives in ':memory:' and is written back to 'path' with
+    # the backup API. Writes are appended to a journal before they are
+    # acknowledged, and the snapshot stores the journal sequence it covers in
+    # its user_version, so a crash between snapshots loses nothing.
+    def __init__(self, path=None, snapshot_interval=SNAPSHOT_INTERVAL):
+        super().__init__(":memory:", thread_safe=False, check_same_thread=False)
+        self.path = Path(path) if path is not None else None
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_lock = threading.RLock()
+        self.pending = []
+        self.sequence = 0
+        self.snapshot_sequence = 0
+        self.stopped = threading.Event()
+        self.thread = None
+        if self.path is not None:
+            self.journal_path = self.path.with_name(self.path.name + ".journal")
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def _connect(self):
+        conn = super()._connect()
+        if self.path is not None:
+            self.load(conn)
+        return conn
+
+    def load(self, conn):
+        if self.path.exists():
+            disk = sqlite3.connect(str(self.path))
+            disk.backup(conn)
+            # snapshots replace the file, so no WAL may be left next to it
+            disk.execute("PRAGMA journal_mode = delete")
+            self.snapshot_sequence = disk.execute("PRAGMA user_version").fetchone()[0]
+            disk.close()
+        self.sequence = self.snapshot_sequence
+
+        for sequence, sql, params in self.read_journal():
+            if sequence > self.snapshot_sequence:
+                conn.execute(sql, params)
+                self.sequence = sequence
+
+    def read_journal(self):
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path) as journal:
+            for line in journal:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # the last line may be torn if the process died writing it
+                    return
+
+    def execute_sql(self, sql, params=None):
+        with self.snapshot_lock:
+            cursor = super().execute_sql(sql, params)
+            if self.path is not None and sql.lstrip().upper().startswith(
+                WRITE_STATEMENTS
+            ):
+                self.pending.append((sql, params))
+                if not self.in_transaction():
+                    self.write_journal()
+        return cursor
+
+    def begin(self, *args, **kwargs):
+        # transactions hold the lock, so snapshots only see committed data
+        self.snapshot_lock.acquire()
+        try:
+            super().begin(*args, **kwargs)
+        except Exception:
+            self.snapshot_lock.release()
+            raise
+
+    def commit(self):
+        try:
+            super().commit()
+            self.write_journal()
+        finally:
+            self.snapshot_lock.release()
+
+    def rollback(self):
+        try:
+            super().rollback()
+            self.pending = []
+        finally:
+            self.snapshot_lock.release()
+
+    def write_journal(self):
+        if not self.pending:
+            return
+        with open(self.journal_path, "a") as journal:
+            for sql, params in self.pending:
+                self.sequence += 1
+                entry = [self.sequence, sql, list(params or [])]
+                journal.write(json.dumps(entry, default=str) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        self.pending = []
+
+    def snapshot(self):
+        if self.path is None or self.is_closed():
+            return False
+        temporary_path = self.path.with_name(self.path.name + ".snapshot")
+        with self.snapshot_lock:
+            if self.sequence == self.snapshot_sequence and self.path.exists():
+                return False
+            sequence = self.sequence
+            if temporary_path.exists():
+                temporary_path.unlink()
+            disk = sqlite3.connect(str(temporary_path))
+            self.connection().backup(disk)
+            disk.execute(f"PRAGMA user_version = {sequence}")
+            disk.close()
+
+        with open(temporary_path, "rb") as snapshot:
+            os.fsync(snapshot.fileno())
+        os.replace(temporary_path, self.path)
+        self.snapshot_sequence = sequence
+        self.truncate_journal()
+        return True
+
+    def truncate_journal(self):
+        with self.snapshot_lock:
+            entries = [
+                entry
+                for entry in self.read_journal()
+                if entry[0] > self.snapshot_sequence
+            ]
+            temporary_path = self.journal_path.with_name(
+                self.journal_path.name + ".tmp"
+            )
+            with open(temporary_path, "w") as journal:
+                for entry in entries:
+                    journal.write(json.dumps(entry, default=str) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(temporary_path, self.journal_path)
+
+    def run(self):
+        while not self.stopped.wait(self.snapshot_interval):
+            self.snapshot()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+        self.snapshot()
+
+    def close(self):
+        self.snapshot()
+        return super().close()
@@ -0,0 +1,86 @@
+import sys
+import tracemalloc
+from pathlib import Path
+
+TOP_SITES = 10
+UNITS = ["B", "KiB", "MiB", "GiB"]
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def format_size(size):
+    for unit in UNITS[:-1]:
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} {UNITS[-1]}"
+
+
+def get_module_name(filename):
+    path = Path(filename)
+    # the longest matching entry of sys.path gives the shortest module name
+    for entry in sorted(sys.path, key=len, reverse=True):
+        try:
+            parts = path.relative_to(entry).with_suffix("").parts
+        except ValueError:
+            continue
+        if entry and parts[-1] == "__init__":
+            parts = parts[:-1]
+        if entry and parts:
+            return ".".join(parts)
+    return filename
+
+
+def group_by_module(stats):
+    modules = {}
+    for stat in stats:
+        name = get_module_name(stat.traceback[0].filename)
+        size, count = modules.get(name, (0, 0))
+        modules[name] = (size + stat.size_diff, count + stat.count_diff)
+    return sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+
+
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+    )
+
+
+def profile(func):
+    if tracemalloc.is_tracing():
+        raise ProfilerBusy("Memory is already being profiled.")
+    tracemalloc.start()
+    try:
+        # the baseline is left out of both the peak and the allocations
+        before = take_snapshot()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = take_snapshot()
+    finally:
+        tracemalloc.stop()
+    return result, peak - baseline, after.compare_to(before, "filename")
+
+
+def get_report(peak, stats, rows):
+    # stats compare the memory held after the command with the memory held
+    # before it, the peak is the most it held while running
+    allocated = sum(stat.size_diff for stat in stats)
+    summary = f"Peak memory {format_size(peak)}, {format_size(allocated)} still held"
+    if rows:
+        summary += (
+            f", {rows} rows, {format_size(peak / rows)} peak and "
+            f"{format_size(allocated / rows)} still held per row"
+        )
+    sites = [
+        {"module": name, "held": format_size(size), "blocks": count}
+        for name, (size, count) in group_by_module(stats)[:TOP_SITES]
+    ]
+    return summary + ".", sites
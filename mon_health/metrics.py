@@ -0,0 +1,187 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+PREFIX = "mon_health"
+EXPORT_INTERVAL = 15
+
+
+def get_command_label(command):
+    name = command.__name__
+    if name.endswith("Command"):
+        name = name[: -len("Command")]
+    return name.lower()
+
+
+def format_labels(labels):
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the quantile
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = {}
+        self.errors = {}
+        self.rows = {}
+        self.latencies = {}
+        self.current = None
+
+    @contextmanager
+    def measure(self, label):
+        previous, self.current = self.current, label
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.current = previous
+            with self.lock:
+                self.commands[label] = self.commands.get(label, 0) + 1
+                self.latencies.setdefault(label, Histogram()).observe(elapsed)
+
+    def count_error(self, error, label=None):
+        key = (label or self.current or "unknown", type(error).__name__)
+        with self.lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def count_rows(self, kind, count, label=None):
+        key = (label or self.current or "unknown", kind)
+        with self.lock:
+            self.rows[key] = self.rows.get(key, 0) + count
+
+    def get_summary(self):
+        rows = []
+        with self.lock:
+            for label, count in sorted(self.commands.items()):
+                histogram = self.latencies[label]
+                errors = sum(n for (c, _), n in self.errors.items() if c == label)
+                rows.append(
+                    {
+                        "command": label,
+                        "count": count,
+                        "errors": errors,
+                        "rows": sum(n for (c, _), n in self.rows.items() if c == label),
+                        "p50_ms": f"{histogram.quantile(0.5) * 1000:.1f}",
+                        "p95_ms": f"{histogram.quantile(0.95) * 1000:.1f}",
+                        "max_ms": f"{histogram.max * 1000:.1f}",
+                    }
+                )
+        return rows
+
+    def to_prometheus(self):
+        lines = []
+
+        def add_family(name, kind, help, samples):
+            lines.append(f"# HELP {PREFIX}_{name} {help}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{PREFIX}_{name}{suffix}{format_labels(labels)} {value}")
+
+        with self.lock:
+            add_family(
+                "commands_total",
+                "counter",
+                "Commands executed.",
+                [("", [("command", c)], n) for c, n in sorted(self.commands.items())],
+            )
+            add_family(
+                "command_errors_total",
+                "counter",
+                "Commands that failed, by exception class.",
+                [
+                    ("", [("command", c), ("error", e)], n)
+                    for (c, e), n in sorted(self.errors.items())
+                ],
+            )
+            add_family(
+                "rows_total",
+                "counter",
+                "Rows returned or modified by commands.",
+                [
+                    ("", [("command", c), ("kind", k)], n)
+                    for (c, k), n in sorted(self.rows.items())
+                ],
+            )
+            samples = []
+            for label, histogram in sorted(self.latencies.items()):
+                cumulative = 0
+                bounds = [str(bound) for bound in BUCKETS] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    labels = [("command", label), ("le", bound)]
+                    samples.append(("_bucket", labels, cumulative))
+                samples.append(("_sum", [("command", label)], histogram.sum))
+                samples.append(("_count", [("command", label)], histogram.count))
+            add_family(
+                "command_seconds",
+                "histogram",
+                "Time spent running commands.",
+                samples,
+            )
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # the textfile collector must never read a half written file
+        path = Path(path)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}")
+        temporary.write_text(self.to_prometheus())
+        os.replace(temporary, path)
+
+
+class MetricsExporter:
+    def __init__(self, metrics, path, interval=EXPORT_INTERVAL):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.metrics.export(self.path)
+
+    def stop(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.metrics.export(self.path)
@@ -0,0 +1,215 @@
+import csv
+import operator
+from functools import reduce
+from itertools import islice
+
+from peewee import JOIN, fn
+
+from mon_health.concurrency import execute_write
+from mon_health.utils import InvalidDate, convert_to_date
+
+NUTRIENTS = ["calories", "protein", "carbs", "fat"]
+ITEM_COLUMNS = ["key", "name"] + NUTRIENTS
+ALIAS_COLUMNS = ["food", "item"]
+# the bound parameters SQLite allows in one statement before 3.32
+MAX_VARIABLES = 999
+USAGE = "Usage: nutrition [from <date>] [to <date>]."
+
+
+class InvalidNutrients(Exception):
+    pass
+
+
+class InvalidNutritionQuery(Exception):
+    pass
+
+
+def get_key(name):
+    return name.strip().lower()
+
+
+def parse_number(value, line):
+    if not value.strip():
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidNutrients(f"Line {line}: '{value}' is not a number.")
+
+
+def read_csv(file, columns):
+    reader = csv.DictReader(file)
+    fields = [field.strip().lower() for field in reader.fieldnames or []]
+    if columns[0] not in fields:
+        raise InvalidNutrients(
+            f"The first line should name the columns, among {', '.join(columns)}."
+        )
+    reader.fieldnames = fields
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_items(file):
+    for line, row in read_csv(file, ITEM_COLUMNS[1:]):
+        name = (row["name"] or "").strip()
+        if not name:
+            continue
+        numbers = [parse_number(row.get(n) or "", line) for n in NUTRIENTS]
+        yield (get_key(name), name, *numbers)
+
+
+def read_aliases(file):
+    for line, row in read_csv(file, ALIAS_COLUMNS):
+        food, item = row["food"] or "", row.get("item") or ""
+        if not food.strip() or not item.strip():
+            raise InvalidNutrients(f"Line {line}: food and item should be given.")
+        yield get_key(food), get_key(item)
+
+
+def import_rows(tables, table, columns, rows):
+    database = tables["food"]._meta.database
+    NutrientLookup = tables["nutrient_lookup"]
+    batch_size = MAX_VARIABLES // len(columns)
+    values = f"({', '.join('?' * len(columns))})"
+
+    def write():
+        # building model queries costs more than SQLite inserting the rows, and
+        # going through execute_sql keeps the rows in the --memory journal
+        count = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            database.execute_sql(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                f"VALUES {', '.join([values] * len(batch))}",
+                [value for row in batch for value in row],
+            )
+            count += len(batch)
+        # entries are matched again on the next summary
+        NutrientLookup.delete().execute()
+        return count
+
+    # a bad line rolls back the whole file
+    return execute_write(database, write)
+
+
+def import_nutrients(tables, path):
+    with open(path, newline="") as file:
+        return import_rows(tables, "nutrient", ITEM_COLUMNS, read_items(file))
+
+
+def import_aliases(tables, path):
+    with open(path, newline="") as file:
+        return import_rows(
+            tables, "nutrient_alias", ["alias", "key"], read_aliases(file)
+        )
+
+
+def select_unmatched(tables, sources=None):
+    NutrientLookup = tables["nutrient_lookup"]
+    matched = NutrientLookup.select(NutrientLookup.food_name)
+    # distinct names are read from the name index, UNION drops the names
+    # several sources share
+    queries = [
+        Food.select(Food.name).distinct().where(Food.name.not_in(matched))
+        for Food in sources or [tables["food"]]
+    ]
+    return reduce(operator.or_, queries)
+
+
+def select_matches(tables, unmatched):
+    Nutrient, NutrientAlias = tables["nutrient"], tables["nutrient_alias"]
+    name = unmatched.c.name
+    return (
+        unmatched.select_from(name, Nutrient.id)
+        .join(
+            NutrientAlias, JOIN.LEFT_OUTER, on=(NutrientAlias.alias == fn.lower(name))
+        )
+        .join(
+            Nutrient,
+            JOIN.LEFT_OUTER,
+            on=(Nutrient.key == fn.coalesce(NutrientAlias.key, fn.lower(name))),
+        )
+    )
+
+
+def update_lookups(tables, sources=None):
+    # names are matched once, summaries join the stored matches
+    NutrientLookup = tables["nutrient_lookup"]
+    unmatched = select_unmatched(tables, sources)
+    if not unmatched.exists():
+        return 0
+
+    def insert():
+        columns = [NutrientLookup.food_name, NutrientLookup.nutrient_id]
+        matches = select_matches(tables, unmatched)
+        return NutrientLookup.insert_from(matches, columns).execute()
+
+    return execute_write(NutrientLookup._meta.database, insert)
+
+
+def parse_nutrition_args(args):
+    options = {"from": None, "to": None}
+    words = args.split()
+    if len(words) % 2:
+        raise InvalidNutritionQuery(USAGE)
+    for keyword, value in zip(words[::2], words[1::2]):
+        keyword = keyword.lower()
+        if keyword not in options:
+            raise InvalidNutritionQuery(USAGE)
+        try:
+            options[keyword] = convert_to_date(value)
+        except InvalidDate:
+            raise InvalidNutritionQuery("Date should be like 31/12/2024.")
+    return options
+
+
+def select_nutrition(tables, start=None, end=None, Food=None):
+    Nutrient, NutrientLookup = tables["nutrient"], tables["nutrient_lookup"]
+    Food = Food or tables["food"]
+    query = (
+        Food.select(
+            Food.date,
+            fn.COUNT(Food.id).alias("entries"),
+            (fn.COUNT(Food.id) - fn.COUNT(Nutrient.id)).alias("unknown"),
+            *[fn.SUM(getattr(Nutrient, n)).alias(n) for n in NUTRIENTS],
+        )
+        .join(
+            NutrientLookup,
+            JOIN.LEFT_OUTER,
+            on=(NutrientLookup.food_name == Food.name),
+        )
+        .join(
+            Nutrient,
+            JOIN.LEFT_OUTER,
+            on=(Nutrient.id == NutrientLookup.nutrient_id),
+        )
+        .where(Food.date.is_null(False))
+    )
+    if start is not None:
+        query = query.where(Food.date >= start)
+    if end is not None:
+        query = query.where(Food.date <= end)
+    return query.group_by(Food.date).order_by(Food.date).dicts()
+
+
+def merge_totals(queries):
+    # a day's entries may be split between the main table and an archive
+    totals = {}
+    for query in queries:
+        for row in query:
+            total = totals.setdefault(row["date"], row)
+            if total is row:
+                continue
+            for key in ["entries", "unknown"] + NUTRIENTS:
+                if row[key] is not None:
+                    total[key] = (total[key] or 0) + row[key]
+    return [totals[day] for day in sorted(totals)]
+
+
+def format_totals(row):
+    for nutrient in NUTRIENTS:
+        value = row[nutrient] or 0
+        row[nutrient] = f"{value:.0f}" if nutrient == "calories" else f"{value:.1f}"
+    return row
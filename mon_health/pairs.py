@@ -0,0 +1,109 @@
+from collections import Counter, deque
+from itertools import combinations
+
+from mon_health.partition import union_all
+from mon_health.utils import (
+    InvalidDate,
+    InvalidDuration,
+    convert_to_date,
+    convert_to_minutes,
+)
+
+WINDOW = 30
+MAX_PAIRS = 10
+MINUTES_PER_DAY = 24 * 60
+USAGE = "Usage: pairs [window <minutes>m|<hours>h] [from <date>] [to <date>] [limit N]."
+
+
+class InvalidPairsQuery(Exception):
+    pass
+
+
+def parse_window(string):
+    try:
+        return convert_to_minutes(string)
+    except InvalidDuration:
+        raise InvalidPairsQuery("Window should be a positive duration like 30m or 2h.")
+
+
+def parse_pairs_args(args):
+    options = {"window": WINDOW, "from": None, "to": None, "limit": MAX_PAIRS}
+    words = args.split()
+    if len(words) % 2:
+        raise InvalidPairsQuery(USAGE)
+    for keyword, value in zip(words[::2], words[1::2]):
+        keyword = keyword.lower()
+        if keyword == "window":
+            options["window"] = parse_window(value)
+        elif keyword in ("from", "to"):
+            try:
+                options[keyword] = convert_to_date(value)
+            except InvalidDate:
+                raise InvalidPairsQuery("Date should be like 31/12/2024.")
+        elif keyword == "limit":
+            if not value.isdigit() or not int(value):
+                raise InvalidPairsQuery("Limit should be a positive integer.")
+            options["limit"] = int(value)
+        else:
+            raise InvalidPairsQuery(USAGE)
+    return options
+
+
+def select_pair_rows(sources, start=None, end=None):
+    queries = []
+    for Food in sources:
+        query = Food.select(Food.name, Food.date, Food.time).where(
+            Food.date.is_null(False) & Food.time.is_null(False)
+        )
+        if start is not None:
+            query = query.where(Food.date >= start)
+        if end is not None:
+            query = query.where(Food.date <= end)
+        queries.append(query)
+    return union_all(queries, "date", "time").tuples()
+
+
+def get_minute(day, time):
+    return day.toordinal() * MINUTES_PER_DAY + time.hour * 60 + time.minute
+
+
+def count_pairs(rows, window):
+    # every entry closes a window holding the foods of the last window minutes,
+    # rows come sorted by date and time, so one sweep only has to keep these
+    windows = 0
+    items = Counter()
+    pairs = Counter()
+    recent = deque()
+    names = Counter()
+    for name, day, time in rows:
+        minute = get_minute(day, time)
+        while recent and minute - recent[0][0] > window:
+            _, other = recent.popleft()
+            names[other] -= 1
+            if not names[other]:
+                del names[other]
+        recent.append((minute, name))
+        names[name] += 1
+        windows += 1
+        foods = sorted(names)
+        items.update(foods)
+        pairs.update(combinations(foods, 2))
+    return windows, items, pairs
+
+
+def get_top_pairs(windows, items, pairs, limit=MAX_PAIRS):
+    # support and lift are both taken over windows, so support is at most 1
+    # and lift is P(first, second) / (P(first) * P(second))
+    rows = []
+    for (first, second), count in pairs.most_common(limit):
+        lift = count * windows / (items[first] * items[second])
+        rows.append(
+            {
+                "first": first,
+                "second": second,
+                "count": count,
+                "support": f"{count / windows:.3f}",
+                "lift": f"{lift:.2f}",
+            }
+        )
+    return rows
@@ -0,0 +1,297 @@
+import operator
+import os
+import re
+import sqlite3
+import stat
+from datetime import MAXYEAR, MINYEAR, date, datetime
+from functools import reduce
+
+from peewee import SQL, Expression, SqliteDatabase, Value, fn
+
+from mon_health.concurrency import execute_write
+from mon_health.db import (
+    get_database_file,
+    has_compact_dates,
+    make_tables,
+    migrate_dates,
+)
+from mon_health.food_parser import FoodParser
+from mon_health.memory import MemoryDatabase
+from mon_health.sync import paused
+
+
+class InvalidYear(Exception):
+    pass
+
+
+class PartitionError(Exception):
+    pass
+
+
+def get_archive_path(database_file, year):
+    return database_file.with_name(f"{database_file.stem}-{year}.db")
+
+
+def get_archives(database):
+    database_file = get_database_file(database)
+    if database_file is None:
+        return {}
+    return find_archives(database_file)
+
+
+def find_archives(database_file):
+    archives = {}
+    pattern = re.compile(re.escape(database_file.stem) + r"-(\d{4})\.db")
+    for path in database_file.parent.iterdir():
+        match = pattern.fullmatch(path.name)
+        if match:
+            archives[int(match.group(1))] = path
+    return archives
+
+
+def get_session_archives(session):
+    if session.archives is None:
+        session.archives = get_archives(session.database)
+    return session.archives
+
+
+def get_years(expr, Food):
+    # Returns the years a filter can match, or None when it can match any.
+    if not isinstance(expr, Expression):
+        return None
+    if expr.op == "AND":
+        lhs, rhs = get_years(expr.lhs, Food), get_years(expr.rhs, Food)
+        if lhs is None or rhs is None:
+            return lhs if rhs is None else rhs
+        return lhs & rhs
+    if expr.op == "OR":
+        lhs, rhs = get_years(expr.lhs, Food), get_years(expr.rhs, Food)
+        if lhs is None or rhs is None:
+            return None
+        return lhs | rhs
+    if expr.lhs is Food.date and expr.op == "=":
+        return {expr.rhs.year}
+    if expr.lhs is Food.date and expr.op == "IN":
+        return {value.year for value in expr.rhs}
+    return None
+
+
+def get_year_range(Food, year):
+    return Food.date.between(date(year, 1, 1), date(year, 12, 31))
+
+
+def get_schema(year, prefix="archive"):
+    return f"{prefix}_{year}"
+
+
+def get_ordering(node):
+    return SQL(f'"{node.node.column_name}" {node.direction}')
+
+
+def get_years_between(start, end):
+    if start is None and end is None:
+        return None
+    first = MINYEAR if start is None else start.year
+    last = MAXYEAR if end is None else end.year
+    return set(range(first, last + 1))
+
+
+def prune_archives(archives, years):
+    if years is None:
+        return archives
+    return {year: archives[year] for year in years if year in archives}
+
+
+def make_copy_table(database, compact_dates, prefix="archive"):
+    Food = make_tables(database, compact_dates)["food"]
+
+    class ArchiveFood(Food):
+        class Meta:
+            schema = "temp"
+            table_name = f"{prefix}_food"
+
+    return ArchiveFood
+
+
+def copy_archives(database, archives, compact_dates, get_filter=None, prefix="archive"):
+    # SQLite attaches at most 10 databases to a connection, so every archive is
+    # attached only while its rows are copied into one temporary table
+    ArchiveFood = make_copy_table(database, compact_dates, prefix)
+    table = ArchiveFood._meta.table_name
+    columns = ", ".join(f'"{f.column_name}"' for f in ArchiveFood._meta.sorted_fields)
+    # the temporary table mustn't reach the --memory journal, so it's written
+    # through the sqlite3 connection
+    conn = database.connection()
+    conn.execute(f'CREATE TEMP TABLE IF NOT EXISTS "{table}" ({columns})')
+    conn.execute(f'DELETE FROM temp."{table}"')
+    for year in sorted(archives):
+        schema = get_schema(year, prefix)
+        database.attach(str(archives[year]), schema)
+        try:
+            if has_compact_dates(database, schema) != compact_dates:
+                raise PartitionError(f"Partition {year} uses another date format.")
+            Food = make_tables(database, compact_dates, schema)["food"]
+            query = Food.select(*Food._meta.sorted_fields)
+            if get_filter is not None:
+                query = query.where(get_filter(Food))
+            sql, params = query.sql()
+            conn.execute(f'INSERT INTO temp."{table}" ({columns}) {sql}', params)
+        finally:
+            database.detach(schema)
+    return ArchiveFood
+
+
+def union_select(sources, args, parser):
+    # sources are (profile, model) pairs, profile being None when the query
+    # doesn't report it
+    queries = []
+    for profile, Food in sources:
+        source_parser = FoodParser(Food)
+        source_parser.parse(args)
+        columns = list(Food._meta.sorted_fields)
+        if profile is not None:
+            columns.insert(0, Value(profile).alias("profile"))
+        queries.append(Food.select(*columns).where(source_parser.where_clause))
+
+    # the sources are combined before sorting, so rows are ordered by column
+    # name instead of by field
+    Food = parser.Food
+    sort_clause = parser.sort_clause or (Food.date.asc(), Food.time.asc())
+    return (
+        reduce(operator.add, queries)
+        .order_by(*[get_ordering(node) for node in sort_clause])
+        .limit(parser.limit_clause)
+        .dicts()
+    )
+
+
+def union_all(queries, *columns):
+    # like union_select, combined sources are ordered by column name
+    return reduce(operator.add, queries).order_by(
+        *[SQL(f'"{column}"') for column in columns]
+    )
+
+
+def get_sources(session, years=None, get_filter=None):
+    # the main table and a copy of the archives of the given years, all of
+    # them when None
+    Food = session.Food
+    archives = prune_archives(get_session_archives(session), years)
+    if not archives:
+        return [Food]
+    compact_dates = has_compact_dates(session.database)
+    return [Food, copy_archives(session.database, archives, compact_dates, get_filter)]
+
+
+def parse_filter(Food, args):
+    parser = FoodParser(Food)
+    parser.parse(args)
+    return parser.where_clause
+
+
+def find_frozen_year(session, get_filter, years=None):
+    archives = prune_archives(get_session_archives(session), years)
+    for year in sorted(archives):
+        # writes may already hold a transaction, in which SQLite can't attach
+        database = SqliteDatabase(f"file:{archives[year]}?mode=ro", uri=True)
+        try:
+            Food = make_tables(database, has_compact_dates(database))["food"]
+            if Food.select().where(get_filter(Food)).exists():
+                return year
+        finally:
+            database.close()
+    return None
+
+
+# frozen entries are read-only: update would put them back into the main table
+# and delete would only remove its own rows, so both refuse to touch them
+def check_update(session, parser):
+    if parser.date is not None and parser.date.year in get_session_archives(session):
+        raise PartitionError(f"Year {parser.date.year} is frozen.")
+    year = find_frozen_year(session, lambda Food: Food.id == parser.id)
+    if year is not None:
+        raise PartitionError(f"Entry {parser.id} is frozen in {year}.")
+
+
+def check_delete(session, parser, args):
+    years = get_years(parser.where_clause, parser.Food)
+    year = find_frozen_year(session, lambda Food: parse_filter(Food, args), years)
+    if year is not None:
+        raise PartitionError(f"Year {year} is frozen, its entries can't be deleted.")
+
+
+def select_partitions(session, parser, args):
+    Food = session.Food
+    years = get_years(parser.where_clause, Food)
+    sources = get_sources(session, years, lambda Food: parse_filter(Food, args))
+    if len(sources) == 1:
+        return None
+    return union_select([(None, model) for model in sources], args, parser)
+
+
+def freeze_year(session, year):
+    Food = session.Food
+    database = session.database
+    database_file = get_database_file(database)
+    if database_file is None or isinstance(database, MemoryDatabase):
+        raise PartitionError("Only databases stored in a file can be partitioned.")
+    if year >= datetime.now().year:
+        raise InvalidYear("Only past years can be frozen.")
+    archive_path = get_archive_path(database_file, year)
+    if archive_path.exists():
+        raise PartitionError(f"Year {year} is already frozen.")
+
+    in_year = get_year_range(Food, year)
+    if not Food.select().where(in_year).exists():
+        # an empty archive would only be another file to attach
+        return 0
+    newest = Food.select(fn.MAX(Food.id)).scalar()
+    if Food.select().where(in_year & (Food.id == newest)).exists():
+        # the newest id must stay in the main table, otherwise it'd be reused
+        raise PartitionError(f"Year {year} holds the newest entry.")
+
+    compact_dates = has_compact_dates(database)
+    schema = "freezing"
+    database.attach(str(archive_path), schema)
+    try:
+        ArchiveFood = make_tables(database, compact_dates, schema)["food"]
+        database.create_tables([ArchiveFood])
+
+        def move_rows():
+            ArchiveFood.insert_from(
+                Food.select().where(in_year), list(Food._meta.fields)
+            ).execute()
+            # frozen rows aren't deleted, so peers mustn't be told they are
+            with paused(session.tables):
+                return Food.delete().where(in_year).execute()
+
+        rows_moved = execute_write(database, move_rows)
+    finally:
+        database.detach(schema)
+
+    compact_archive(archive_path)
+    session.archives = None
+    return rows_moved
+
+
+def compact_archive(path):
+    conn = sqlite3.connect(str(path))
+    conn.execute("ANALYZE")
+    conn.execute("VACUUM")
+    conn.close()
+    mode = os.stat(path).st_mode
+    os.chmod(path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def migrate_archives(session, compact_dates):
+    # archives must keep the date format of the main table to be read with it
+    rows_migrated = 0
+    for year, path in sorted(get_session_archives(session).items()):
+        os.chmod(path, os.stat(path).st_mode | stat.S_IWUSR)
+        database = SqliteDatabase(str(path))
+        try:
+            rows_migrated += migrate_dates(database, compact_dates)
+        finally:
+            database.close()
+        compact_archive(path)
+    return rows_migrated
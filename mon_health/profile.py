@@ -0,0 +1,69 @@
+import re
+
+from mon_health.db import get_database_path, has_compact_dates, make_tables
+from mon_health.partition import (
+    PartitionError,
+    copy_archives,
+    find_archives,
+    get_years,
+    parse_filter,
+    prune_archives,
+    union_select,
+)
+
+DEFAULT_PROFILE = "default"
+
+
+class InvalidProfile(Exception):
+    pass
+
+
+def get_profile_path(name):
+    if name == DEFAULT_PROFILE:
+        return get_database_path()
+    if not re.fullmatch(r"[\w-]+", name):
+        raise InvalidProfile(f"Profile '{name}' is invalid.")
+
+    PROFILES_DIR = get_database_path().parent / "profiles"
+    PROFILES_DIR.mkdir(exist_ok=True)
+    return PROFILES_DIR / f"{name}.db"
+
+
+def parse_profiles(string):
+    names = [name.strip() for name in string.split(",") if name.strip()]
+    if not names:
+        raise InvalidProfile("At least one profile should be given.")
+    return {name: get_profile_path(name) for name in names}
+
+
+def select_profiles(session, parser, args):
+    database = session.database
+    compact_dates = has_compact_dates(database)
+    years = get_years(parser.where_clause, session.Food)
+    sources = []
+    for i, (name, path) in enumerate(session.profiles.items()):
+        if i == 0:
+            # the session is opened on the first profile
+            Food = session.Food
+        else:
+            if not path.exists():
+                raise InvalidProfile(f"Profile '{name}' does not exist.")
+            schema = f"profile_{i}"
+            database.attach(str(path), schema)
+            if has_compact_dates(database, schema) != compact_dates:
+                raise PartitionError(f"Profile '{name}' uses another date format.")
+            Food = make_tables(database, compact_dates, schema)["food"]
+        sources.append((name, Food))
+
+        archives = prune_archives(find_archives(path), years)
+        if archives:
+            Food = copy_archives(
+                database,
+                archives,
+                compact_dates,
+                lambda Food: parse_filter(Food, args),
+                f"profile_{i}_archive",
+            )
+            sources.append((name, Food))
+
+    return union_select(sources, args, parser)
@@ -0,0 +1,141 @@
+import json
+import math
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from mon_health.backup import copy_database
+from mon_health.command import Session, parse_input, run_query
+from mon_health.metrics import get_command_label
+from mon_health.utils import format_rows
+
+PERCENTILES = [50, 95, 99]
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.started = time.monotonic()
+        # line buffered, so a crash loses at most the current line
+        self.file = open(self.path, "a", buffering=1)
+
+    def record(self, input, command, seconds):
+        entry = {
+            "time": datetime.now().isoformat(),
+            "offset": round(time.monotonic() - self.started, 6),
+            "input": input,
+            "command": command,
+            "seconds": round(seconds, 6),
+        }
+        self.file.write(json.dumps(entry) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def read_recording(path):
+    with open(path) as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def get_percentile(values, percentile):
+    # nearest rank
+    ordered = sorted(values)
+    rank = max(math.ceil(percentile / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def get_label(input):
+    try:
+        command, _ = parse_input(input)
+    except Exception:
+        return "unknown"
+    return get_command_label(command)
+
+
+def replay(session, entries, paced=False):
+    latencies = {}
+    recorded = {}
+    started = time.monotonic()
+    first_offset = None
+    with session.activate():
+        for entry in entries:
+            if paced:
+                if first_offset is None:
+                    first_offset = entry["offset"]
+                delay = entry["offset"] - first_offset - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            label = get_label(entry["input"])
+            query_started = time.perf_counter()
+            run_query(entry["input"])
+            elapsed = time.perf_counter() - query_started
+            latencies.setdefault(label, []).append(elapsed)
+            recorded.setdefault(label, []).append(entry["seconds"])
+    return latencies, recorded, time.monotonic() - started
+
+
+def get_report(latencies, recorded, elapsed):
+    rows = []
+    for label, values in sorted(latencies.items()):
+        row = {
+            "command": label,
+            "count": len(values),
+            "per_s": f"{len(values) / sum(values):.0f}" if sum(values) else "-",
+        }
+        for percentile in PERCENTILES:
+            value = get_percentile(values, percentile) * 1000
+            row[f"p{percentile}_ms"] = f"{value:.2f}"
+        value = get_percentile(recorded[label], 50) * 1000
+        row["recorded_p50_ms"] = f"{value:.2f}"
+        rows.append(row)
+
+    total = sum(len(values) for values in latencies.values())
+    summary = f"{total} commands in {elapsed:.2f} s, {total / elapsed:.0f} per second."
+    columns = ["command", "count", "per_s"]
+    columns += [f"p{percentile}_ms" for percentile in PERCENTILES]
+    columns += ["recorded_p50_ms"]
+    return [summary] + list(format_rows(rows, columns))
+
+
+@click.command()
+@click.argument("recording", type=click.Path(exists=True, dir_okay=False))
+@click.argument("database", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--paced",
+    is_flag=True,
+    help="Wait between commands as long as the recorded session did.",
+)
+def main(recording, database, paced):
+    entries = list(read_recording(recording))
+    if not entries:
+        raise click.UsageError("The recording has no commands.")
+
+    with tempfile.TemporaryDirectory() as directory:
+        copy_path = Path(directory) / "replay.db"
+        source = sqlite3.connect(database)
+        try:
+            copy_database(source, copy_path)
+        finally:
+            source.close()
+
+        session = Session.open(copy_path)
+        try:
+            report = get_report(*replay(session, entries, paced))
+        finally:
+            session.close()
+
+    for line in report:
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from mon_health.db import get_app_dir, get_database_file
+
+SLOW_THRESHOLD = 1.0
+LOG_NAME = "slow-queries.jsonl"
+MAX_LOG_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+MAX_OFFENDERS = 10
+
+
+class Trace:
+    def __init__(self, input=None, expanded=None):
+        self.input = input
+        self.expanded = expanded
+        self.phases = {}
+        self.queries = []
+        self.rows = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def add_query(self, query):
+        self.queries.append(query)
+
+    def count_rows(self, kind, count):
+        self.rows[kind] = self.rows.get(kind, 0) + count
+
+
+def get_log_path():
+    return get_app_dir() / LOG_NAME
+
+
+def get_log_paths(path):
+    paths = [path.with_name(f"{path.name}.{n}") for n in range(LOG_BACKUPS, 0, -1)]
+    return [log_path for log_path in paths + [path] if log_path.exists()]
+
+
+def rotate_log(path):
+    if not path.exists() or path.stat().st_size < MAX_LOG_BYTES:
+        return
+    for n in range(LOG_BACKUPS - 1, 0, -1):
+        backup = path.with_name(f"{path.name}.{n}")
+        if backup.exists():
+            os.replace(backup, path.with_name(f"{path.name}.{n + 1}"))
+    os.replace(path, path.with_name(f"{path.name}.1"))
+
+
+def explain_query(database, query):
+    sql, params = query.sql()
+    cursor = database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+    return {
+        "sql": sql,
+        "params": params,
+        "plan": [row[-1] for row in cursor.fetchall()],
+    }
+
+
+def make_entry(database, trace, seconds):
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "database": str(get_database_file(database)),
+        "input": trace.input,
+        "expanded": trace.expanded,
+        "seconds": round(seconds, 6),
+        "phases": {name: round(value, 6) for name, value in trace.phases.items()},
+        "rows": trace.rows,
+        # plans are only taken for slow commands, they cost a query each
+        "queries": [explain_query(database, query) for query in trace.queries],
+    }
+
+
+def write_entry(path, entry):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rotate_log(path)
+    with open(path, "a") as file:
+        file.write(json.dumps(entry, default=str) + "\n")
+
+
+def log_if_slow(session, trace, seconds):
+    threshold = session.slow_threshold
+    if threshold is None or seconds < threshold:
+        return None
+    entry = make_entry(session.database, trace, seconds)
+    write_entry(session.slow_log or get_log_path(), entry)
+    return entry
+
+
+def read_entries(path):
+    for log_path in get_log_paths(path):
+        with open(log_path) as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a line cut short by a crash
+                    continue
+
+
+def get_offender_key(entry):
+    # the same statement with other values is the same offender
+    if entry["queries"]:
+        return " ".join(query["sql"] for query in entry["queries"])
+    return entry["expanded"]
+
+
+def get_worst_offenders(path, limit=MAX_OFFENDERS):
+    offenders = {}
+    for entry in read_entries(path):
+        key = get_offender_key(entry)
+        offender = offenders.setdefault(
+            key, {"runs": 0, "seconds": 0.0, "max": 0.0, "entry": entry}
+        )
+        offender["runs"] += 1
+        offender["seconds"] += entry["seconds"]
+        if entry["seconds"] >= offender["max"]:
+            offender["max"] = entry["seconds"]
+            offender["entry"] = entry
+    worst = sorted(offenders.values(), key=lambda o: o["max"], reverse=True)
+    return worst[:limit]
@@ -0,0 +1,258 @@
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from peewee import JOIN, Value, fn
+
+from mon_health.concurrency import execute_write
+from mon_health.db import (
+    get_database_file,
+    get_setting,
+    has_compact_dates,
+    make_tables,
+    set_setting,
+)
+from mon_health.memory import MemoryDatabase
+
+PEER_SCHEMA = "peer"
+# rows that existed before tracking get the same uuid in every copy of a file
+BACKFILL_NAMESPACE = uuid.UUID("5b0c7a52-43f4-4c4e-9a55-3c1f2e0f6d1a")
+
+NEXT_SEQ = "(SELECT coalesce(max(seq), 0) + 1 FROM food_change)"
+SITE_ID = "(SELECT value FROM setting WHERE key = 'site_id')"
+NOT_PAUSED = "NOT EXISTS (SELECT 1 FROM setting WHERE key = 'sync_paused')"
+
+TRIGGERS = {
+    # update runs INSERT OR REPLACE, which deletes the old row without firing
+    # food_sync_delete and overrides any conflict clause in here, so a
+    # replaced row bumps the change it already has instead of getting a new one
+    "food_sync_insert": f"""
+        AFTER INSERT ON food WHEN {NOT_PAUSED}
+        BEGIN
+            UPDATE food_change
+            SET version = version + 1, site = {SITE_ID}, seq = {NEXT_SEQ}
+            WHERE food_id = NEW.id;
+            INSERT INTO food_change (uuid, food_id, version, site, seq, deleted)
+            SELECT lower(hex(randomblob(16))), NEW.id, 1, {SITE_ID}, {NEXT_SEQ}, 0
+            WHERE NOT EXISTS (SELECT 1 FROM food_change WHERE food_id = NEW.id);
+        END""",
+    "food_sync_update": f"""
+        AFTER UPDATE ON food WHEN {NOT_PAUSED}
+        BEGIN
+            UPDATE food_change
+            SET version = version + 1, site = {SITE_ID}, seq = {NEXT_SEQ}
+            WHERE food_id = NEW.id;
+        END""",
+    "food_sync_delete": f"""
+        AFTER DELETE ON food WHEN {NOT_PAUSED}
+        BEGIN
+            UPDATE food_change
+            SET food_id = NULL, deleted = 1, version = version + 1,
+                site = {SITE_ID}, seq = {NEXT_SEQ}
+            WHERE food_id = OLD.id;
+        END""",
+}
+
+
+class SyncError(Exception):
+    pass
+
+
+def is_tracked(tables):
+    return get_setting(tables, "site_id") is not None
+
+
+def create_triggers(database, schema=None):
+    prefix = f"{schema}." if schema else ""
+    for name, body in TRIGGERS.items():
+        # files tracked by an older version get the current definitions
+        database.execute_sql(f"DROP TRIGGER IF EXISTS {prefix}{name}")
+        database.execute_sql(f"CREATE TRIGGER {prefix}{name} {body}")
+
+
+def get_next_seq(tables):
+    FoodChange = tables["food_change"]
+    return (FoodChange.select(fn.MAX(FoodChange.seq)).scalar() or 0) + 1
+
+
+def get_backfill_uuid(food_id, name, date, time):
+    key = f"{food_id}|{name}|{date}|{time}"
+    return uuid.uuid5(BACKFILL_NAMESPACE, key).hex
+
+
+def enable_tracking(tables):
+    Food, FoodChange = tables["food"], tables["food_change"]
+    database = Food._meta.database
+    site_id = get_setting(tables, "site_id")
+    if site_id is None:
+        site_id = uuid.uuid4().hex
+        set_setting(tables, "site_id", site_id)
+
+    def get_uuid(food_id, name, date, time):
+        date, time = Food.date.python_value(date), Food.time.python_value(time)
+        return get_backfill_uuid(food_id, name, date, time)
+
+    # SQLite copies the untracked rows itself, so a large file needs neither
+    # a row object nor bound parameters per row
+    database.register_function(get_uuid, "backfill_uuid", 4)
+    untracked = (
+        Food.select(
+            fn.backfill_uuid(Food.id, Food.name, Food.date, Food.time),
+            Food.id,
+            fn.ROW_NUMBER().over(order_by=[Food.id]) + get_next_seq(tables) - 1,
+            Value(1),
+            Value(""),
+            Value(False),
+        )
+        .join(FoodChange, JOIN.LEFT_OUTER, on=(FoodChange.food_id == Food.id))
+        .where(FoodChange.uuid.is_null())
+    )
+    columns = [
+        FoodChange.uuid,
+        FoodChange.food_id,
+        FoodChange.seq,
+        FoodChange.version,
+        FoodChange.site,
+        FoodChange.deleted,
+    ]
+    FoodChange.insert_from(untracked, columns).execute()
+
+    create_triggers(Food._meta.database, Food._meta.schema)
+    return site_id
+
+
+@contextmanager
+def paused(tables):
+    # changes made while paused aren't logged by the triggers
+    Setting = tables["setting"]
+    set_setting(tables, "sync_paused", 1)
+    try:
+        yield
+    finally:
+        Setting.delete().where(Setting.key == "sync_paused").execute()
+
+
+def select_changes(tables):
+    Food, FoodChange = tables["food"], tables["food_change"]
+    return (
+        FoodChange.select(FoodChange, Food.name, Food.date, Food.time)
+        .join(Food, JOIN.LEFT_OUTER, on=(FoodChange.food_id == Food.id))
+        .dicts()
+    )
+
+
+def get_changes(tables, since):
+    FoodChange = tables["food_change"]
+    query = select_changes(tables).where(FoodChange.seq > since)
+    # rows moved to an archive are no longer in the food table
+    return [
+        change
+        for change in query.order_by(FoodChange.seq)
+        if change["deleted"] or change["name"] is not None
+    ]
+
+
+def get_change_key(change):
+    # total order, so both sides of a conflict pick the same winner
+    return (
+        change["version"],
+        change["site"],
+        change["deleted"],
+        change["name"] or "",
+        str(change["date"]),
+        str(change["time"]),
+    )
+
+
+def apply_change(tables, change):
+    Food, FoodChange = tables["food"], tables["food_change"]
+    local = select_changes(tables).where(FoodChange.uuid == change["uuid"]).first()
+    if local is not None and get_change_key(local) >= get_change_key(change):
+        return False
+
+    food_id = None if local is None else local["food_id"]
+    if change["deleted"]:
+        if food_id is not None:
+            Food.delete().where(Food.id == food_id).execute()
+        food_id = None
+    else:
+        values = {
+            Food.name: change["name"],
+            Food.date: change["date"],
+            Food.time: change["time"],
+        }
+        if (
+            food_id is None
+            or not Food.update(values).where(Food.id == food_id).execute()
+        ):
+            food_id = Food.insert(values).execute()
+
+    FoodChange.replace(
+        uuid=change["uuid"],
+        food_id=food_id,
+        version=change["version"],
+        site=change["site"],
+        seq=get_next_seq(tables),
+        deleted=change["deleted"],
+    ).execute()
+    return True
+
+
+def apply_changes(tables, changes):
+    with paused(tables):
+        return sum(apply_change(tables, change) for change in changes)
+
+
+def exchange_changes(tables, peer_tables):
+    site_id = enable_tracking(tables)
+    peer_site_id = enable_tracking(peer_tables)
+    if peer_site_id == site_id:
+        # the peer is a copy of this file, it needs its own identity
+        peer_site_id = uuid.uuid4().hex
+        set_setting(peer_tables, "site_id", peer_site_id)
+
+    sent_key, received_key = (
+        f"sync_sent:{peer_site_id}",
+        f"sync_received:{peer_site_id}",
+    )
+    peer_sent_key, peer_received_key = (
+        f"sync_sent:{site_id}",
+        f"sync_received:{site_id}",
+    )
+    changes = get_changes(tables, int(get_setting(tables, sent_key, 0)))
+    peer_changes = get_changes(peer_tables, int(get_setting(tables, received_key, 0)))
+
+    received = apply_changes(tables, peer_changes)
+    sent = apply_changes(peer_tables, changes)
+
+    # changes just applied are already known to the other side
+    seq, peer_seq = get_next_seq(tables) - 1, get_next_seq(peer_tables) - 1
+    set_setting(tables, sent_key, seq)
+    set_setting(tables, received_key, peer_seq)
+    set_setting(peer_tables, peer_sent_key, peer_seq)
+    set_setting(peer_tables, peer_received_key, seq)
+    return received, sent
+
+
+def sync_database(session, path):
+    database = session.database
+    database_file = get_database_file(database)
+    if database_file is None or isinstance(database, MemoryDatabase):
+        raise SyncError("Only databases stored in a file can be synced.")
+    path = Path(path).expanduser()
+    if path.resolve() == database_file.resolve():
+        raise SyncError("A database can't be synced with itself.")
+
+    database.attach(str(path), PEER_SCHEMA)
+    try:
+        if "food" in database.get_tables(schema=PEER_SCHEMA):
+            compact_dates = has_compact_dates(database, PEER_SCHEMA)
+        else:
+            compact_dates = has_compact_dates(database)
+        peer_tables = make_tables(database, compact_dates, PEER_SCHEMA)
+        database.create_tables(peer_tables.values())
+        return execute_write(
+            database, lambda: exchange_changes(session.tables, peer_tables)
+        )
+    finally:
+        database.detach(PEER_SCHEMA)
@@ -0,0 +1,15 @@
+import pytest
+
+from mon_health.command import Session
+
+
+@pytest.fixture
+def compact_dates():
+    return False
+
+
+@pytest.fixture
+def session(tmp_path, compact_dates):
+    session = Session.open(tmp_path / "health.db", compact_dates=compact_dates)
+    yield session
+    session.close()
@@ -0,0 +1,104 @@
+from datetime import date, time
+
+import pytest
+
+from mon_health.advisor import INDEX_PREFIX, Shape, get_shape
+from mon_health.batch import WriteBatcher
+from mon_health.db import make_database, make_tables
+from mon_health.food_parser import FoodParser
+
+Food = make_tables(make_database(":memory:"))["food"]
+COLUMNS = ["name", "time", "date"]
+
+
+@pytest.fixture
+def session(session):
+    session.Food.insert_many(
+        [
+            {"name": f"food{i % 100}", "date": date(2024, 1, 1 + i % 28)}
+            for i in range(2000)
+        ]
+    ).execute()
+    return session
+
+
+def get_advisor_indexes(session):
+    indexes = session.database.get_indexes("food")
+    return [index.name for index in indexes if index.name.startswith(INDEX_PREFIX)]
+
+
+@pytest.mark.parametrize(
+    "args,key",
+    [
+        ("", "filter:;sort:date,time"),
+        ("name 'a' sort -time", "filter:name=;sort:time"),
+        ("t 5h d 1/1 n 'a'", "filter:date=,name=,timeBETWEEN;sort:date,time"),
+        ("name 'a','b'", "filter:nameIN;sort:date,time"),
+        ("name 'a' or name 'b'", "filter:;sort:date,time"),
+    ],
+)
+def test_get_shape(args, key):
+    parser = FoodParser(Food)
+    parser.parse(args)
+    shape = get_shape(parser)
+    assert shape.key == key
+    assert Shape.from_key(key).key == key
+
+
+@pytest.mark.parametrize(
+    "shape,expected",
+    [
+        (Shape([], ["date", "time"]), (["date", "time", "name"], 2)),
+        (Shape([("name", "=")], ["time"]), (["name", "time", "date"], 2)),
+        (
+            Shape([("time", "BETWEEN"), ("date", "=")], ["name"]),
+            (["date", "time", "name"], 2),
+        ),
+    ],
+)
+def test_get_index_columns(shape, expected):
+    assert shape.get_index_columns(COLUMNS) == expected
+
+
+class TestAdvise:
+    def test_advise_given_no_queries(self, session):
+        assert session.execute("advise") == ["No queries were recorded yet."]
+
+    def test_advise_apply_creates_used_indexes(self, session):
+        for i in range(5):
+            session.execute(f"find name 'food{i}' sort -time")
+
+        assert "advisor_food_name_time_date (missing)" in session.execute("advise")[2]
+        output = session.execute("advise apply")
+
+        assert output[0].startswith("Created advisor_food_name_time_date")
+        assert get_advisor_indexes(session) == ["advisor_food_name_time_date"]
+
+    def test_advise_apply_drops_unused_indexes(self, session):
+        session.database.execute_sql(
+            f'CREATE INDEX "{INDEX_PREFIX}name" ON "food" ("name")'
+        )
+        session.execute("find t 5:00")
+
+        assert (
+            session.execute("advise apply")[-1] == f"Dropped unused {INDEX_PREFIX}name."
+        )
+        assert get_advisor_indexes(session) == ["advisor_food_time_date_name"]
+
+    def test_advise_is_not_batched(self, session, capsys):
+        batcher = WriteBatcher()
+        with session.activate():
+            batcher.execute("insert a")
+            batcher.execute("advise")
+
+        assert batcher.pending == []
+        assert capsys.readouterr().out.splitlines() == ["No queries were recorded yet."]
+
+    def test_advise_given_invalid_args(self, session):
+        assert session.execute("advise foo") == ["Argument should be empty or 'apply'."]
+
+
+def test_record_query_given_time_filter(session):
+    session.Food.insert(name="a", time=time(5, 0)).execute()
+    session.execute("find t 5:00")
+    assert list(session.query_shapes) == ["filter:time=;sort:date,time"]
@@ -0,0 +1,69 @@
+from datetime import date, time
+
+import pytest
+
+from mon_health import api
+from mon_health.food_parser import InvalidExpression
+
+
+@pytest.fixture
+def session(session):
+    session.Food.insert_many(
+        [
+            {"name": "a", "date": date(2024, 1, 1), "time": time(8)},
+            {"name": "b", "date": date(2024, 1, 1), "time": time(12)},
+            {"name": "c", "date": date(2024, 1, 2), "time": time(9)},
+        ]
+    ).execute()
+    return session
+
+
+def test_find_returns_dicts(session):
+    rows = api.find("date 1/1/2024 sort -time", session)
+    assert next(rows) == {
+        "id": 2,
+        "name": "b",
+        "time": time(12),
+        "date": date(2024, 1, 1),
+    }
+    assert [row["name"] for row in rows] == ["a"]
+
+
+@pytest.mark.parametrize(
+    "row_type,expected",
+    [("dict", {"name": "a"}), ("tuple", ("a",))],
+)
+def test_find_given_row_type(session, row_type, expected):
+    rows = list(api.find("| name", session, row_type=row_type))
+    assert rows[0] == expected
+
+
+def test_find_returns_records(session):
+    record = next(api.find("name 'c' | name,date", session, row_type="record"))
+    assert (record.name, record.date) == ("c", date(2024, 1, 2))
+    assert record._fields == ("name", "date")
+
+
+def test_find_given_batch_size(session):
+    batches = list(api.find("", session, row_type="tuple", batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+
+def test_find_given_invalid_arguments(session):
+    with pytest.raises(InvalidExpression):
+        api.find("foo", session)
+    with pytest.raises(api.InvalidRowType):
+        api.find("", session, row_type="list")
+
+
+def test_find_columns(session):
+    assert api.find_columns("| name,time", session) == {
+        "name": ["a", "b", "c"],
+        "time": [time(8), time(12), time(9)],
+    }
+    assert api.find_columns("name 'z' | name", session) == {"name": []}
+
+
+def test_find_uses_active_session(session):
+    with session.activate():
+        assert len(list(api.find())) == 3
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+from mon_health.backup import (
+    BackupError,
+    backup_database,
+    get_manifests,
+    restore_incremental,
+    verify_backup,
+)
+
+
+@pytest.fixture
+def session(session):
+    session.Food.insert_many([{"name": f"food{i}"} for i in range(500)]).execute()
+    return session
+
+
+def count_rows(path):
+    conn = sqlite3.connect(str(path))
+    count = conn.execute("SELECT count(*) FROM food").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_backup_file(session, tmp_path):
+    dest = backup_database(session.database, tmp_path / "backup.db")
+    assert count_rows(dest) == 500
+    assert verify_backup(dest) == dest
+
+
+def test_backup_compressed(session, tmp_path):
+    dest = backup_database(session.database, tmp_path / "backup.db", compress=True)
+    assert dest == tmp_path / "backup.db.gz"
+    assert verify_backup(dest) == dest
+
+
+def test_backup_incremental_stores_changed_pages(session, tmp_path):
+    dest = tmp_path / "backups"
+    _, pages, new_pages = backup_database(session.database, dest, incremental=True)
+    assert 0 < new_pages <= pages
+
+    session.Food.insert(name="new").execute()
+    manifest_path, pages, new_pages = backup_database(
+        session.database, dest, incremental=True
+    )
+    assert 0 < new_pages < pages
+    assert get_manifests(dest)[-1] == manifest_path
+    assert verify_backup(dest) == manifest_path
+
+    restore_incremental(manifest_path, tmp_path / "restored.db")
+    assert count_rows(tmp_path / "restored.db") == 501
+
+
+def test_verify_corrupted_incremental_backup(session, tmp_path):
+    dest = tmp_path / "backups"
+    backup_database(session.database, dest, compress=True, incremental=True)
+    page = next((dest / "pages").glob("*/*.gz"))
+    page.write_bytes(b"")
+
+    with pytest.raises(BackupError):
+        verify_backup(dest)
+
+
+def test_verify_truncated_backup(session, tmp_path):
+    dest = backup_database(session.database, tmp_path / "backup.db")
+    dest.write_bytes(dest.read_bytes()[:5000])
+
+    with pytest.raises(BackupError):
+        verify_backup(dest)
+
+
+def test_backup_command(session, tmp_path):
+    assert session.execute(f"backup {tmp_path / 'backup.db'}") == [
+        f"Backed up to {tmp_path / 'backup.db'}."
+    ]
+    assert session.execute(f"backup verify {tmp_path / 'backup.db'}") == [
+        f"Backup {tmp_path / 'backup.db'} is ok."
+    ]
+    assert session.execute(f"backup {tmp_path / 'backup.db'} zip")[0].startswith(
+        "Usage"
+    )
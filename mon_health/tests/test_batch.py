@@ -0,0 +1,83 @@
+import os
+
+import pytest
+from peewee import CharField, DateField, Model, SqliteDatabase, TimeField
+
+from mon_health.batch import WriteBatcher
+from mon_health.command import setup_commands
+
+
+@pytest.fixture
+def Food():
+    TEST_DB_PATH = "test_batch.db"
+    TEST_DB = SqliteDatabase(TEST_DB_PATH)
+
+    class BaseModel(Model):
+        class Meta:
+            database = TEST_DB
+
+    class Food(BaseModel):
+        name = CharField(max_length=20)
+        time = TimeField(null=True)
+        date = DateField(null=True)
+
+    tables = {table.__name__.lower(): table for table in [Food]}
+    TEST_DB.create_tables(tables.values())
+    setup_commands(tables)
+    yield Food
+    TEST_DB.close()
+    os.remove(TEST_DB_PATH)
+
+
+class TestWriteBatcher:
+    def test_execute_given_writes_defers_them(self, Food):
+        batcher = WriteBatcher()
+        batcher.execute("insert a")
+        batcher.execute("i b, c")
+
+        assert len(batcher.pending) == 2
+        assert Food.select().count() == 0
+
+        batcher.flush()
+
+        assert batcher.pending == []
+        assert sorted(food.name for food in Food.select()) == ["a", "b", "c"]
+
+    def test_execute_given_batch_size_flushes(self, Food):
+        batcher = WriteBatcher(batch_size=2)
+        batcher.execute("insert a")
+        batcher.execute("insert b")
+
+        assert batcher.pending == []
+        assert Food.select().count() == 2
+
+    def test_execute_given_read_flushes_first(self, Food, capsys):
+        batcher = WriteBatcher()
+        batcher.execute("insert a")
+        batcher.execute("find | name")
+
+        assert capsys.readouterr().out.splitlines()[-1].strip() == "a"
+
+    def test_flush_reports_results_per_statement(self, Food, capsys):
+        batcher = WriteBatcher()
+        batcher.execute("insert a")
+        batcher.execute("update name 'b'")
+        batcher.execute("delete name 'a'")
+        batcher.flush()
+
+        assert capsys.readouterr().out.splitlines() == [
+            "Id field should be given.",
+            "1 row modified.",
+        ]
+        assert Food.select().count() == 0
+
+    def test_flush_commits_once(self, Food):
+        commits = []
+        database = Food._meta.database
+        database.commit = lambda: commits.append(True)
+        batcher = WriteBatcher()
+        for name in "abcde":
+            batcher.execute(f"insert {name}")
+        batcher.flush()
+
+        assert len(commits) == 1
@@ -0,0 +1,96 @@
+import os
+import signal
+import threading
+
+import pytest
+
+from mon_health.batch import WriteBatcher
+from mon_health.cancellation import QueryCancelled, QueryTimeout, cancellable
+from mon_health.command import Session
+from mon_health.concurrency import execute_write
+
+ENDLESS_QUERY = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+    "SELECT count(*) FROM c"
+)
+
+
+def test_cancellable_given_timeout(session):
+    with pytest.raises(QueryTimeout):
+        with cancellable(session.database, 0.1):
+            session.database.execute_sql(ENDLESS_QUERY)
+
+
+def test_cancellable_rolls_back_writes(session):
+    database = session.database
+
+    def insert_and_hang():
+        session.Food.insert(name="a").execute()
+        database.execute_sql(ENDLESS_QUERY)
+
+    with pytest.raises(QueryTimeout):
+        with cancellable(database, 0.1):
+            execute_write(database, insert_and_hang)
+    assert session.Food.select().count() == 0
+
+
+def test_cancellable_given_interrupt(session):
+    timer = threading.Timer(0.1, os.kill, [os.getpid(), signal.SIGINT])
+    timer.start()
+    with pytest.raises(QueryCancelled):
+        with cancellable(session.database):
+            session.database.execute_sql(ENDLESS_QUERY)
+    assert signal.getsignal(signal.SIGINT) is signal.default_int_handler
+
+
+def test_nested_cancellable(session):
+    with pytest.raises(QueryTimeout, match="0.1"):
+        with cancellable(session.database, 10):
+            with cancellable(session.database, 0.1):
+                session.database.execute_sql(ENDLESS_QUERY)
+    with pytest.raises(QueryTimeout, match="0.1"):
+        with cancellable(session.database, 0.1):
+            with cancellable(session.database):
+                session.database.execute_sql(ENDLESS_QUERY)
+
+
+def test_set_timeout(tmp_path):
+    session = Session.open(tmp_path / "health.db")
+    assert session.execute("set timeout 2.5") == []
+    assert session.execute("set") == ["timeout 2.5", "slowlog 1.0"]
+    assert session.execute("set timeout -1")[0].startswith("Timeout should")
+    assert session.execute("set foo 1")[0].startswith("Usage")
+    session.close()
+
+    session = Session.open(tmp_path / "health.db")
+    assert session.timeout == 2.5
+    assert session.execute("set timeout off") == []
+    assert session.timeout is None
+    session.close()
+
+
+def test_command_given_timeout(session):
+    session.Food.insert_many([{"name": f"food{i}"} for i in range(2000)]).execute()
+    session.timeout = 1e-6
+    assert session.execute("find") == ["Query stopped after 1e-06 seconds."]
+    assert session.execute("delete") == ["Query stopped after 1e-06 seconds."]
+    session.timeout = None
+    assert session.Food.select().count() == 2000
+
+
+def test_batch_given_timeout_saves_nothing(session, capsys):
+    session.Food.insert_many([{"name": f"food{i}"} for i in range(2000)]).execute()
+    session.timeout = 1e-6
+    with session.activate():
+        batcher = WriteBatcher()
+        batcher.execute("insert a")
+        batcher.execute("delete time 3:33")
+        batcher.execute("insert b")
+        batcher.flush()
+    session.timeout = None
+
+    assert (
+        capsys.readouterr().out.splitlines()
+        == ["Query stopped after 1e-06 seconds."] * 3
+    )
+    assert session.Food.select().count() == 2000
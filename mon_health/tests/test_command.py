@@ -1,9 +1,9 @@
-import os
 import random
+import threading
 from datetime import datetime, time
 
 import pytest
-from peewee import CharField, DateField, Model, SqliteDatabase, TimeField
+from peewee import CharField, DateField, Model, TimeField
 
 from mon_health.command import (
     CommandNotFound,
@@ -14,16 +14,18 @@ from mon_health.command import (
     IdFieldNotFound,
     InsertCommand,
     NameFieldNotFound,
+    Session,
     UpdateCommand,
+    current_session,
     parse_query,
     setup_commands,
 )
+from mon_health.memory import MemoryDatabase
 
 
 @pytest.fixture(scope="class")
 def Food():
-    TEST_DB_PATH = "test_command.db"
-    TEST_DB = SqliteDatabase(TEST_DB_PATH)
+    TEST_DB = MemoryDatabase()
 
     class BaseModel(Model):
         class Meta:
@@ -38,7 +40,7 @@ def Food():
     TEST_DB.create_tables(tables.values())
     setup_commands(tables)
     yield Food
-    os.remove(TEST_DB_PATH)
+    TEST_DB.close()
 
 
 def get_random_string(length):
@@ -242,6 +244,10 @@ class TestUpdateCommand:
                 "id 1 name `foo`",
                 lambda Food: Food.replace(**{"id": 1, "name": "foo"}),
             ),
+            (
+                "id 1 and name `foo`",
+                lambda Food: Food.replace(**{"id": 1, "name": "foo"}),
+            ),
         ],
     )
     def test_parse_args_given_valid_args(self, args, expected, Food):
@@ -255,6 +261,10 @@ class TestUpdateCommand:
             ("", IdFieldNotFound),
             ("name '55'", IdFieldNotFound),
             ("iD 1 daTe 11/11", NameFieldNotFound),
+            ("id 1 or id 2 name 'foo'", IdFieldNotFound),
+            ("(id 1) name 'foo'", IdFieldNotFound),
+            ("id 1 and id 2 name 'foo'", IdFieldNotFound),
+            ("name 'foo','bar' id 1", NameFieldNotFound),
         ],
     )
     def test_parse_args_given_invalid_args(self, args, error):
@@ -317,6 +327,43 @@ class TestExitCommand:
         assert ExitCommand.execute(args) == []
 
 
+class TestSession:
+    def test_execute_given_several_databases(self, tmp_path):
+        sessions = [Session.open(tmp_path / f"{i}.db") for i in range(4)]
+
+        def insert_rows(session, name):
+            for i in range(25):
+                assert session.execute(f"insert {name}") == []
+
+        threads = [
+            threading.Thread(target=insert_rows, args=(session, f"food{i}"))
+            for i, session in enumerate(sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i, session in enumerate(sessions):
+            output = session.execute("find | name")
+            assert output[2:] == [f"food{i}"] * 25
+            session.close()
+
+    def test_activate_restores_previous_session(self, tmp_path):
+        default = setup_commands({"food": ""})
+        session = Session.open(tmp_path / "test.db")
+
+        with session.activate():
+            assert current_session() is session
+        assert current_session() is default
+        session.close()
+
+    def test_execute_given_invalid_query(self, tmp_path):
+        session = Session.open(tmp_path / "test.db")
+        assert session.execute("foo") == ["Alias 'foo' does not exist."]
+        session.close()
+
+
 @pytest.mark.parametrize(
     "string,expected",
     [
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+
+import pytest
+from peewee import CharField, Model, OperationalError, SqliteDatabase
+
+from mon_health.command import InsertCommand, setup_commands
+from mon_health.concurrency import (
+    PRAGMAS,
+    DatabaseBusy,
+    execute_write,
+    is_busy_error,
+    retry_on_busy,
+)
+
+TEST_DB_PATH = "test_concurrency.db"
+WRITERS = 4
+WRITES_PER_WRITER = 50
+
+
+def get_tables(test_db):
+    class BaseModel(Model):
+        class Meta:
+            database = test_db
+
+    class Food(BaseModel):
+        name = CharField(max_length=20)
+
+    return {"food": Food}
+
+
+def write_rows(writer):
+    # a tiny busy timeout makes lock contention surface as SQLITE_BUSY
+    database = SqliteDatabase(TEST_DB_PATH, timeout=0.001, pragmas=PRAGMAS)
+    setup_commands(get_tables(database))
+    errors = []
+    for i in range(WRITES_PER_WRITER):
+        errors.extend(InsertCommand.execute(f"{writer}-{i}"))
+    database.close()
+    return errors
+
+
+@pytest.fixture
+def database():
+    database = SqliteDatabase(TEST_DB_PATH, pragmas=PRAGMAS)
+    database.create_tables(get_tables(database).values())
+    database.close()
+    yield database
+    database.close()
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.exists(TEST_DB_PATH + suffix):
+            os.remove(TEST_DB_PATH + suffix)
+
+
+def test_concurrent_writers_lose_no_rows(database):
+    with multiprocessing.Pool(WRITERS) as pool:
+        errors = pool.map(write_rows, range(WRITERS))
+
+    assert errors == [[]] * WRITERS
+    Food = get_tables(database)["food"]
+    assert Food.select().count() == WRITERS * WRITES_PER_WRITER
+
+
+def test_retry_on_busy_given_transient_lock():
+    attempts = []
+
+    def func():
+        attempts.append(True)
+        if len(attempts) < 3:
+            raise OperationalError("database is locked")
+        return "ok"
+
+    assert retry_on_busy(func) == "ok"
+    assert len(attempts) == 3
+
+
+def test_retry_on_busy_given_persistent_lock():
+    def func():
+        raise OperationalError("database is locked")
+
+    with pytest.raises(DatabaseBusy):
+        retry_on_busy(func, retries=2)
+
+
+def test_retry_on_busy_given_other_error():
+    def func():
+        raise OperationalError("no such table: food")
+
+    with pytest.raises(OperationalError):
+        retry_on_busy(func)
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    [
+        (OperationalError("database is locked"), True),
+        (OperationalError("database table is locked"), False),
+        (OperationalError("no such table: food"), False),
+        (ValueError("database is locked"), False),
+    ],
+)
+def test_is_busy_error(error, expected):
+    assert is_busy_error(error) == expected
+
+
+def test_execute_write_uses_immediate_transaction(database):
+    statements = []
+    database.connect()
+    database.connection().set_trace_callback(statements.append)
+
+    execute_write(database, lambda: database.execute_sql("SELECT 1"))
+
+    assert statements == ["BEGIN IMMEDIATE", "SELECT 1", "COMMIT"]
@@ -0,0 +1,90 @@
+from datetime import date, time
+
+import pytest
+
+from mon_health.db import (
+    DayNumberField,
+    MinuteOfDayField,
+    get_database_path,
+    has_compact_dates,
+    make_database,
+    make_tables,
+    migrate_dates,
+)
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = make_database(tmp_path / "test_db.db")
+    yield database
+    database.close()
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (date(day=1, month=1, year=1), 1),
+        (date(day=3, month=10, year=2024), 739162),
+        (739162, 739162),
+        (None, None),
+    ],
+)
+def test_day_number_field_db_value(value, expected):
+    assert DayNumberField().db_value(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (time(hour=0, minute=0), 0),
+        (time(hour=12, minute=30), 750),
+        (time(hour=23, minute=59), 1439),
+        (None, None),
+    ],
+)
+def test_minute_of_day_field_db_value(value, expected):
+    assert MinuteOfDayField().db_value(value) == expected
+
+
+def test_fields_python_value_given_db_value():
+    assert DayNumberField().python_value(739162) == date(day=3, month=10, year=2024)
+    assert MinuteOfDayField().python_value(750) == time(hour=12, minute=30)
+
+
+@pytest.mark.parametrize("compact_dates", [False, True])
+def test_make_tables_given_compact_dates(database, compact_dates):
+    tables = make_tables(database, compact_dates)
+    database.create_tables(tables.values())
+    assert has_compact_dates(database) == compact_dates
+
+
+def test_migrate_dates_keeps_rows(database):
+    Food = make_tables(database)["food"]
+    database.create_tables([Food])
+    rows = [
+        {"name": "a", "time": time(hour=0, minute=0), "date": date(1999, 12, 31)},
+        {"name": "b", "time": time(hour=12, minute=5), "date": date(2024, 2, 29)},
+        {"name": "c", "time": time(hour=23, minute=59), "date": date(2024, 10, 3)},
+    ]
+    Food.insert_many(rows).execute()
+
+    assert migrate_dates(database, True) == 3
+    assert migrate_dates(database, True) == 0
+    assert has_compact_dates(database)
+    Food = make_tables(database, True)["food"]
+    assert list(Food.select(Food.name, Food.time, Food.date).dicts()) == rows
+    query = Food.select().where(Food.date > date(2000, 1, 1)).order_by(Food.time)
+    assert [food.name for food in query] == ["b", "c"]
+
+    assert migrate_dates(database, False) == 3
+    assert not has_compact_dates(database)
+    Food = make_tables(database)["food"]
+    assert list(Food.select(Food.name, Food.time, Food.date).dicts()) == rows
+
+
+def test_get_database_path_creates_missing_directories(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_DATA_HOME", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    path = get_database_path()
+    assert path == tmp_path / ".local" / "share" / "mon-health" / "health.db"
+    assert path.parent.is_dir()
@@ -21,6 +21,7 @@ from mon_health.food_parser import (
     InvalidName,
     InvalidValue,
     KeywordNotFound,
+    UnbalancedParentheses,
 )
 
 TEST_DB_PATH = "test_food_parser.db"
@@ -323,6 +324,87 @@ class TestFoodParser:
         with pytest.raises(error, match=rf".+?'{invalid_value}'.+"):
             parser.parse(args)
 
+    @pytest.mark.parametrize(
+        "args,expected",
+        [
+            (
+                "name 'coffee','tea' date 1/10",
+                (Food.name.in_(["coffee", "tea"]))
+                & (Food.date == date(day=1, month=10, year=now().year)),
+            ),
+            (
+                "name 'coffee' or name 'tea' date 1/10",
+                (Food.name == "coffee")
+                | (
+                    (Food.name == "tea")
+                    & (Food.date == date(day=1, month=10, year=now().year))
+                ),
+            ),
+            (
+                "(name 'coffee' OR name 'tea') AND date 1/10",
+                ((Food.name == "coffee") | (Food.name == "tea"))
+                & (Food.date == date(day=1, month=10, year=now().year)),
+            ),
+            (
+                "not name 'coffee' and not (id 1 or id 2)",
+                ~(Food.name == "coffee") & ~((Food.id == 1) | (Food.id == 2)),
+            ),
+            (
+                "not not id 1 or id 2 and id 3",
+                ~~(Food.id == 1) | ((Food.id == 2) & (Food.id == 3)),
+            ),
+        ],
+    )
+    def test_parse_given_boolean_args(self, args, expected):
+        parser = FoodParser(Food)
+        parser.parse(args)
+        query = Food.select().where(parser.where_clause)
+        assert query.sql() == Food.select().where(expected).sql()
+
+    def test_parse_given_boolean_args_and_other_clauses(self):
+        parser = FoodParser(Food)
+        parser.parse("(id 1 or id 2) sort -date limit 3 | name")
+        query = Food.select().where(parser.where_clause)
+        expected = (Food.id == 1) | (Food.id == 2)
+        assert query.sql() == Food.select().where(expected).sql()
+        assert parser.sort_clause == [Food.date.desc()]
+        assert parser.limit_clause == 3
+        assert parser.returning_clause == [Food.name]
+
+    @pytest.mark.parametrize(
+        "args,error",
+        [
+            ("(id 1 or id 2", UnbalancedParentheses),
+            ("id 1) or (id 2", UnbalancedParentheses),
+            ("id 1 or", InvalidExpression),
+            ("id 1 or foo", InvalidExpression),
+            ("not", InvalidExpression),
+            ("id 1 or date foo", InvalidValue),
+            ("(sort date)", InvalidExpression),
+            ("(id 1 or id 2) limit 1 limit 2", InvalidExpression),
+            ("id 1 or id 2 sort date | name sort id", InvalidExpression),
+        ],
+    )
+    def test_parse_given_invalid_boolean_args(self, args, error):
+        parser = FoodParser(Food)
+        with pytest.raises(error):
+            parser.parse(args)
+
+    @pytest.mark.parametrize(
+        "args,expected",
+        [
+            ("id 1 and name 'a' date 1/10", (1, "a", date(now().year, 10, 1))),
+            ("id 1 or id 2 name 'a'", (None, None, None)),
+            ("not id 1 name 'a'", (None, None, None)),
+            ("(id 1) and name 'a'", (None, None, None)),
+            ("id 1 and id 2 and name 'a'", (None, "a", None)),
+        ],
+    )
+    def test_parse_given_boolean_args_sets_fields(self, args, expected):
+        parser = FoodParser(Food)
+        parser.parse(args)
+        assert (parser.id, parser.name, parser.date) == expected
+
     @pytest.mark.parametrize(
         "string,expr_name,expected",
         [
@@ -410,6 +492,19 @@ class TestFoodParser:
         assert compare_nested_exprs(parser.where_clause, expected)
         assert parser.name == expected.rhs
 
+    @pytest.mark.parametrize(
+        "args,expected",
+        [
+            ("'a','b'", Food.name.in_(["a", "b"])),
+            ("'a' , `b`,\"c, d\"", Food.name.in_(["a", "b", "c, d"])),
+        ],
+    )
+    def test_parse_name_given_list_of_names(self, args, expected):
+        parser = FoodParser(Food)
+        parser.parse_name(args)
+        assert compare_nested_exprs(parser.where_clause, expected)
+        assert parser.name is None
+
     @pytest.mark.parametrize(
         "args",
         [
@@ -417,6 +512,8 @@ class TestFoodParser:
             "hotdog",  # no quotes
             "`hotdog",  # single quote
             "'hotdog\"",  # beginning and ending with different quotes
+            "'hotdog' 'bun'",  # no comma
+            "'hotdog',",  # ends with comma
         ],
     )
     def test_parse_name_given_invalid_args(self, args):
@@ -0,0 +1,92 @@
+import random
+import time
+
+import pytest
+
+from mon_health.db import make_database, make_tables
+from mon_health.food_parser import (
+    FoodParser,
+    InvalidColumn,
+    InvalidExpression,
+    InvalidId,
+    InvalidLimit,
+    InvalidName,
+    InvalidValue,
+)
+from mon_health.utils import InvalidDate, InvalidTime
+
+Food = make_tables(make_database(":memory:"))["food"]
+PARSER_ERRORS = (
+    InvalidColumn,
+    InvalidExpression,
+    InvalidId,
+    InvalidLimit,
+    InvalidName,
+    InvalidValue,
+    InvalidDate,
+    InvalidTime,
+)
+SIZE = 2000
+GROWTH = 8
+# linear parsing grows about as much as the input, quadratic about GROWTH times more
+MAX_RATIO = GROWTH * 2.5
+
+ADVERSARIAL_INPUTS = {
+    "whitespace": lambda n: "name" + " " * n + "x",
+    "unclosed_quotes": lambda n: "'a " * (n // 3),
+    "quotes_and_commas": lambda n: "name " + "'," * (n // 2) + "x",
+    "names_without_end": lambda n: "name " + "'a'," * (n // 4) + "'a",
+    "sort_list": lambda n: "sort " + ",".join(["-date"] * (n // 6)) + "!",
+    "keywords": lambda n: "sort " * (n // 5),
+    "boolean_quotes": lambda n: "id 1 or " + "'a " * (n // 3),
+    "parentheses": lambda n: "(" * n,
+    "nots": lambda n: "not " * (n // 4),
+    "hours": lambda n: "time 5" + "h" * n + "x",
+}
+
+VOCABULARY = [
+    "id", "name", "n", "date", "d", "time", "t", "sort", "s", "limit", "l",
+    "returning", "|", "and", "or", "not", "(", ")", "1", "0", "-1", "'a'",
+    "'a','b'", '"b"', "'", ",", "today", "1/1", "31/12/2020", "5h", "10:30",
+    "date,-time", "name,id", "all", "foo", "",
+]  # fmt: skip
+
+
+def parse(string):
+    parser = FoodParser(Food)
+    parser.max_input_length = None
+    try:
+        parser.parse(string)
+    except PARSER_ERRORS:
+        pass
+
+
+def get_parse_time(string, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(string)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@pytest.mark.parametrize("name", ADVERSARIAL_INPUTS.keys())
+def test_parse_time_grows_linearly(name):
+    make_input = ADVERSARIAL_INPUTS[name]
+    small = get_parse_time(make_input(SIZE))
+    large = get_parse_time(make_input(SIZE * GROWTH))
+    # tiny timings are mostly noise, so they are compared to a floor
+    assert large / max(small, 1e-4) < MAX_RATIO
+
+
+def test_parse_given_random_input():
+    generator = random.Random(0)
+    for _ in range(2000):
+        words = generator.choices(VOCABULARY, k=generator.randint(1, 12))
+        parse(" ".join(words))
+
+
+def test_parse_given_input_too_long():
+    parser = FoodParser(Food)
+    with pytest.raises(InvalidExpression, match="longer"):
+        parser.parse("name 'a' " * 200)
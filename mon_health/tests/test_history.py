@@ -0,0 +1,109 @@
+from datetime import date, time
+
+import pytest
+
+from mon_health.command import Session
+from mon_health.db import HISTORY_INDEX, make_database, make_tables, migrate_dates
+from mon_health.history import format_gap, get_history_rows, select_history
+
+SERVINGS = [
+    ("apple", 1, 8),
+    ("apple", 2, 8),
+    ("apple", 3, 20),
+    ("apple", 5, 8),
+    ("bread", 1, 9),
+    ("bread", 1, 10),
+    ("cake", 4, 1),
+]
+
+
+@pytest.fixture(params=[False, True], ids=["text", "compact"])
+def compact_dates(request):
+    return request.param
+
+
+@pytest.fixture
+def session(session):
+    for name, day, hour in SERVINGS:
+        session.Food.create(name=name, date=date(2024, 1, day), time=time(hour))
+    return session
+
+
+@pytest.mark.parametrize(
+    "minutes,expected",
+    [(None, "-"), (5, "5m"), (90, "1.5h"), (1440, "1.0d"), (1920, "1.3d")],
+)
+def test_format_gap(minutes, expected):
+    assert format_gap(minutes) == expected
+
+
+def test_select_history(session):
+    rows = get_history_rows(select_history([(session.Food, True)]))
+    assert rows == [
+        {
+            "name": "apple",
+            "last_date": date(2024, 1, 5),
+            "last_time": time(8),
+            "count": 4,
+            "mean_gap": "1.3d",
+            "median_gap": "1.5d",
+            "streak": 3,
+        },
+        {
+            "name": "cake",
+            "last_date": date(2024, 1, 4),
+            "last_time": time(1),
+            "count": 1,
+            "mean_gap": "-",
+            "median_gap": "-",
+            "streak": 1,
+        },
+        {
+            "name": "bread",
+            "last_date": date(2024, 1, 1),
+            "last_time": time(10),
+            "count": 2,
+            "mean_gap": "1.0h",
+            "median_gap": "1.0h",
+            "streak": 1,
+        },
+    ]
+
+
+def test_history_uses_the_index(session):
+    Food = session.Food
+    sql, params = select_history([(Food, Food.name == "apple")]).sql()
+    cursor = session.database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+    plan = [row[-1] for row in cursor.fetchall()]
+    assert f"SEARCH t1 USING COVERING INDEX {HISTORY_INDEX} (name=?)" in plan
+    # the gaps are computed in index order
+    assert plan.index("SCAN gap") > plan.index("MATERIALIZE gap")
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan[: plan.index("SCAN gap")]
+
+
+def test_history_command(session):
+    output = session.execute("history name 'apple', 'bread' limit 1")
+    assert len(output) == 3
+    assert output[2].split("|")[0].strip() == "apple"
+    assert session.execute("history name 'pasta'") == ["No food was found."]
+    assert session.execute("history limit a") == ["Value 'a' is invalid."]
+
+
+def test_old_databases_get_the_index(tmp_path):
+    database = make_database(tmp_path / "health.db")
+    database.execute_sql("CREATE TABLE food (id INTEGER PRIMARY KEY, name, time, date)")
+    database.close()
+
+    session = Session.open(tmp_path / "health.db")
+    assert HISTORY_INDEX in [
+        index.name for index in session.database.get_indexes("food")
+    ]
+    session.close()
+
+
+def test_migrate_dates_keeps_the_index(tmp_path):
+    database = make_database(tmp_path / "health.db")
+    database.create_tables(make_tables(database).values())
+    migrate_dates(database, True)
+    assert HISTORY_INDEX in [index.name for index in database.get_indexes("food")]
+    database.close()
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from mon_health.loadtest import (
+    InvalidConcurrency,
+    InvalidMix,
+    Workload,
+    count_new_errors,
+    main,
+    parse_concurrency,
+    parse_mix,
+    prepare_template,
+    run_level,
+)
+
+
+def test_parse_mix():
+    assert parse_mix("insert=2, find") == {"insert": 2.0, "find": 1.0}
+
+
+@pytest.mark.parametrize("mix", ["select=1", "find=a", "find=-1", "find=0"])
+def test_parse_mix_errors(mix):
+    with pytest.raises(InvalidMix):
+        parse_mix(mix)
+
+
+@pytest.mark.parametrize("concurrency", ["", "1,a", "0"])
+def test_parse_concurrency_errors(concurrency):
+    with pytest.raises(InvalidConcurrency):
+        parse_concurrency(concurrency)
+
+
+def test_workload_follows_the_mix():
+    workload = Workload(3, {"insert": 1, "delete": 0}, 10, (1, 10), seed=0)
+    inputs = [workload.next_input() for _ in range(3)]
+    assert inputs == [
+        ("insert", "insert load-3-1"),
+        ("insert", "insert load-3-2"),
+        ("insert", "insert load-3-3"),
+    ]
+
+
+def test_count_new_errors():
+    before = {("find", "FoodParserError"): 1}
+    after = {
+        ("find", "FoodParserError"): 2,
+        ("insert", "DatabaseBusy"): 1,
+        ("find", "OperationalError"): 1,
+    }
+    assert count_new_errors(before, after) == (3, 1)
+
+
+def test_run_level(tmp_path):
+    ids = prepare_template(tmp_path / "template.db", rows=20)
+    assert ids[1] - ids[0] == 19
+
+    mix = {"insert": 1, "find": 1, "update": 1, "delete": 1}
+    level = run_level(
+        tmp_path / "template.db", tmp_path / "load.db", 2, mix, 20, ids, 0.2, True
+    )
+    assert level["concurrency"] == 2
+    assert level["operations"] > 0
+    assert level["errors"] == 0
+    assert set(level["commands"]) <= set(mix)
+    assert sum(c["operations"] for c in level["commands"].values()) == (
+        level["operations"]
+    )
+
+
+def test_main(tmp_path):
+    output = tmp_path / "results.json"
+    result = CliRunner().invoke(
+        main,
+        ["--concurrency", "1,2", "--duration", "0.1", "--rows", "10"]
+        + ["--output", str(output)],
+    )
+    assert result.exit_code == 0, result.output
+    assert "LOCK_ERRORS" in result.output
+
+    results = json.loads(output.read_text())
+    assert results["config"]["clients"] == "processes"
+    assert [level["concurrency"] for level in results["levels"]] == [1, 2]
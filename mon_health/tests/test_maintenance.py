@@ -0,0 +1,86 @@
+from datetime import date
+
+from mon_health.command import Session
+from mon_health.db import get_setting
+from mon_health.maintenance import (
+    INCREMENTAL,
+    maybe_maintain,
+    pragma,
+    record_changes,
+    run_maintenance,
+)
+
+
+def insert_foods(session, count):
+    session.Food.insert_many(
+        [{"name": f"food{i}", "date": date(2024, 1, 1)} for i in range(count)]
+    ).execute()
+
+
+def test_run_maintenance(session):
+    insert_foods(session, 100)
+    rows = run_maintenance(session)
+    assert [row["step"] for row in rows] == [
+        "quick_check",
+        "analyze",
+        "incremental_vacuum",
+    ]
+    assert rows[0]["result"] == "ok"
+    assert pragma(session.database, "auto_vacuum")[0][0] == INCREMENTAL
+    assert get_setting(session.tables, "changes_since_maintenance") == "0"
+
+    session.Food.delete().execute()
+    rows = run_maintenance(session)
+    assert rows[2]["result"].endswith("pages freed")
+    assert pragma(session.database, "freelist_count")[0][0] == 0
+
+
+def test_run_maintenance_out_of_time(session):
+    rows = run_maintenance(session, budget=1e-9)
+    assert all(row["result"] == "stopped, out of time" for row in rows)
+
+
+def test_record_changes(session):
+    insert_foods(session, 10)
+    assert record_changes(session) == 10
+    insert_foods(session, 5)
+    assert record_changes(session) == 15
+
+
+def test_maybe_maintain(session):
+    insert_foods(session, 10)
+    assert maybe_maintain(session, threshold=20) is None
+    insert_foods(session, 10)
+    rows = maybe_maintain(session, threshold=20, budget=10)
+    assert rows[0]["result"] == "ok"
+    assert rows[2]["result"].startswith("skipped")
+    assert record_changes(session) == 0
+
+
+def test_changes_persist_across_sessions(tmp_path):
+    session = Session.open(tmp_path / "health.db")
+    insert_foods(session, 10)
+    session.close()
+
+    session = Session.open(tmp_path / "health.db")
+    assert record_changes(session) == 10
+    session.close()
+
+
+def test_reads_are_not_counted(tmp_path):
+    for _ in range(3):
+        session = Session.open(tmp_path / "health.db")
+        assert maybe_maintain(session) is None
+        session.execute("find date today")
+        assert maybe_maintain(session) is None
+        session.close()
+
+    session = Session.open(tmp_path / "health.db")
+    assert get_setting(session.tables, "changes_since_maintenance") is None
+    insert_foods(session, 10)
+    session.execute("find date today")
+    session.close()
+
+    session = Session.open(tmp_path / "health.db")
+    assert record_changes(session) == 10
+    session.close()
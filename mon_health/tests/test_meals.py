@@ -0,0 +1,144 @@
+from datetime import date, time
+
+import pytest
+
+from mon_health.db import has_compact_dates
+from mon_health.meals import (
+    InvalidMealsQuery,
+    count_daily,
+    parse_meals_args,
+    refresh_meals,
+    sessionize,
+)
+
+ENTRIES = [
+    ("bread", date(2024, 1, 1), time(8, 0)),
+    ("coffee", date(2024, 1, 1), time(8, 10)),
+    ("pasta", date(2024, 1, 1), time(12, 30)),
+    ("wine", date(2024, 1, 1), time(23, 50)),
+    ("cake", date(2024, 1, 2), time(0, 20)),
+    ("tea", date(2024, 1, 2), time(9, 0)),
+]
+
+
+@pytest.fixture(params=[False, True], ids=["text", "compact"])
+def compact_dates(request):
+    return request.param
+
+
+@pytest.fixture
+def session(session):
+    for name, day, at in ENTRIES:
+        session.Food.create(name=name, date=day, time=at)
+    return session
+
+
+def get_items(meals):
+    return [meal["items"] for meal in meals]
+
+
+def test_parse_meals_args():
+    options = parse_meals_args("daily gap 2h from 1/1/2024 cache limit 5")
+    assert options == {
+        "gap": 120,
+        "from": date(2024, 1, 1),
+        "to": None,
+        "limit": 5,
+        "daily": True,
+        "cache": True,
+    }
+
+
+@pytest.mark.parametrize("args", ["gap", "gap 0", "from 32/1/2024", "limit a", "x"])
+def test_parse_meals_args_errors(args):
+    with pytest.raises(InvalidMealsQuery):
+        parse_meals_args(args)
+
+
+def test_sessionize():
+    meals = list(sessionize(iter(ENTRIES), 60))
+    assert get_items(meals) == ["bread, coffee", "pasta", "wine, cake", "tea"]
+    assert meals[2] == {
+        "start_date": date(2024, 1, 1),
+        "start_time": time(23, 50),
+        "end_date": date(2024, 1, 2),
+        "end_time": time(0, 20),
+        "count": 2,
+        "items": "wine, cake",
+    }
+    assert len(list(sessionize(iter(ENTRIES), 10))) == 5
+
+
+def test_count_daily():
+    daily = list(count_daily(sessionize(iter(ENTRIES), 60)))
+    assert daily == [
+        {"date": date(2024, 1, 1), "meals": 3, "items": 5},
+        {"date": date(2024, 1, 2), "meals": 1, "items": 1},
+    ]
+
+
+def test_refresh_meals_is_incremental(session):
+    Meal = session.tables["meal"]
+    assert refresh_meals(session.tables, 60) == 4
+
+    session.Food.create(name="apple", date=date(2024, 1, 2), time=time(9, 30))
+    # only the meals ending on or after the entry's day are dropped
+    assert Meal.select().count() == 2
+    assert refresh_meals(session.tables, 60) == 3
+    assert get_items(Meal.select().order_by(Meal.id).dicts())[-1] == "tea, apple"
+
+    session.Food.create(name="jam", date=date(2024, 1, 3), time=time(9, 0))
+    assert Meal.select().count() == 4
+    # the newest meal is computed again along with the new entry
+    assert refresh_meals(session.tables, 60) == 2
+
+    session.Food.delete().where(session.Food.name == "pasta").execute()
+    assert Meal.select().count() == 0
+    assert refresh_meals(session.tables, 60) == 4
+
+
+def test_refresh_meals_given_another_gap(session):
+    refresh_meals(session.tables, 60)
+    assert refresh_meals(session.tables, 600) == 2
+
+
+def test_meals_command(session):
+    output = session.execute("meals")
+    assert output[0].split() == [
+        "START_DATE",
+        "|",
+        "START_TIME",
+        "|",
+        "END_TIME",
+        "|",
+        "COUNT",
+        "|",
+        "ITEMS",
+    ]
+    assert len(output) == 6
+    assert session.execute("meals cache limit 2") == output[:4]
+    assert session.execute("meals daily cache from 2/1/2024")[2].split() == [
+        "02/01/2024",
+        "|",
+        "1",
+        "|",
+        "1",
+    ]
+    assert session.execute("meals from 1/1/2025") == ["No meals were found."]
+
+
+def test_cache_after_update_command(session):
+    session.execute("meals cache")
+    # update replaces the row, so the old date has to be looked up
+    session.execute("update id 2 name 'milk' date 3/1/2024 time 08:10")
+    output = session.execute("meals cache")
+    assert output == session.execute("meals")
+    assert not any("coffee" in line for line in output)
+
+
+def test_migrate_resets_the_cache(session):
+    session.execute("meals cache")
+    target = "text" if has_compact_dates(session.database) else "compact"
+    session.execute(f"migrate {target}")
+    assert session.tables["meal"].select().count() == 0
+    assert len(session.execute("meals cache")) == 6
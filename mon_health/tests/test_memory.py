@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+from mon_health.db import make_tables
+from mon_health.memory import MemoryDatabase
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "test_memory.db"
+
+
+def open_food(path):
+    database = MemoryDatabase(path, snapshot_interval=3600)
+    Food = make_tables(database)["food"]
+    database.create_tables([Food])
+    return database, Food
+
+
+def count_rows_on_disk(path):
+    conn = sqlite3.connect(str(path))
+    count = conn.execute("SELECT count(*) FROM food").fetchone()[0]
+    conn.close()
+    return count
+
+
+class TestMemoryDatabase:
+    def test_snapshot_writes_database_to_disk(self, path):
+        database, Food = open_food(path)
+        Food.insert_many([{"name": "a"}, {"name": "b"}]).execute()
+
+        assert database.snapshot()
+        assert not database.snapshot()  # nothing changed since
+        assert count_rows_on_disk(path) == 2
+        assert list(database.read_journal()) == []
+        database.stop()
+
+    def test_load_replays_journal_after_crash(self, path):
+        database, Food = open_food(path)
+        Food.insert(name="a").execute()
+        database.snapshot()
+        Food.insert(name="b").execute()
+        with database.atomic():
+            Food.insert(name="c").execute()
+        # the process dies here, so "b" and "c" are only in the journal
+        assert count_rows_on_disk(path) == 1
+
+        database, Food = open_food(path)
+        assert sorted(food.name for food in Food.select()) == ["a", "b", "c"]
+        database.close()
+        assert count_rows_on_disk(path) == 3
+
+    def test_rollback_is_not_journaled(self, path):
+        database, Food = open_food(path)
+        database.snapshot()
+        with pytest.raises(ZeroDivisionError):
+            with database.atomic():
+                Food.insert(name="a").execute()
+                1 / 0
+
+        assert list(database.read_journal()) == []
+        database.stop()
+
+    def test_without_path_stays_in_memory(self):
+        database = MemoryDatabase()
+        Food = make_tables(database)["food"]
+        database.create_tables([Food])
+        Food.insert(name="a").execute()
+
+        assert Food.select().count() == 1
+        assert not database.snapshot()
+        database.close()
@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+from mon_health.memprofile import (
+    ProfilerBusy,
+    format_size,
+    get_module_name,
+    profile,
+)
+
+
+@pytest.fixture
+def session(session):
+    session.Food.insert_many([{"name": f"food{i}"} for i in range(500)]).execute()
+    return session
+
+
+@pytest.mark.parametrize(
+    "size,expected",
+    [(10, "10.0 B"), (2048, "2.0 KiB"), (3 * 1024**2, "3.0 MiB")],
+)
+def test_format_size(size, expected):
+    assert format_size(size) == expected
+
+
+def test_get_module_name():
+    assert get_module_name(re.__file__) == "re"
+    assert get_module_name(format_size.__code__.co_filename) == (
+        "mon_health.memprofile"
+    )
+
+
+def test_profile():
+    result, peak, stats = profile(lambda: [str(i) for i in range(1000)])
+    assert len(result) == 1000
+    assert peak > 0
+    assert stats
+
+    _, peak, stats = profile(lambda: len([str(i) for i in range(100000)]))
+    assert peak > 1024**2
+    assert sum(stat.size_diff for stat in stats) < 1024**2 / 10
+
+    with pytest.raises(ProfilerBusy):
+        profile(lambda: profile(list))
+
+
+def test_memprofile_command(session):
+    output = session.execute("\\memprofile find limit 10")
+    assert output[0].startswith("ID")
+    assert len([line for line in output if "| food" in line]) == 10
+    summary = output[12]
+    assert summary.startswith("Peak memory") and "10 rows" in summary
+    assert "peak and" in summary and "still held per row" in summary
+    assert output[13].split()[:3] == ["MODULE", "|", "HELD"]
+
+
+def test_memprofile_command_given_invalid_command(session):
+    assert session.execute("\\memprofile foo") == ["Alias 'foo' does not exist."]
@@ -0,0 +1,55 @@
+from mon_health.metrics import Histogram, Metrics
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in [0.0005, 0.002, 0.002, 0.3, 20]:
+        histogram.observe(value)
+
+    assert histogram.count == 5
+    assert histogram.counts[0] == 1
+    assert histogram.counts[1] == 2
+    assert histogram.counts[-1] == 1
+    assert histogram.quantile(0.5) == 0.0025
+    assert histogram.quantile(1) == 20
+
+
+def test_metrics_to_prometheus():
+    metrics = Metrics()
+    with metrics.measure("find"):
+        metrics.count_rows("returned", 3)
+    metrics.count_error(ValueError(), "find")
+
+    text = metrics.to_prometheus()
+    assert 'mon_health_commands_total{command="find"} 1' in text
+    assert (
+        'mon_health_command_errors_total{command="find",error="ValueError"} 1' in text
+    )
+    assert 'mon_health_rows_total{command="find",kind="returned"} 3' in text
+    assert 'mon_health_command_seconds_bucket{command="find",le="+Inf"} 1' in text
+    assert 'mon_health_command_seconds_count{command="find"} 1' in text
+
+
+def test_session_metrics(session):
+    session.execute("insert a, b")
+    session.execute("find")
+    session.execute("delete id 0")
+    session.execute("delete name 'a'")
+
+    rows = {row["command"]: row for row in session.metrics.get_summary()}
+    assert rows["insert"]["rows"] == 2
+    assert rows["find"]["rows"] == 2
+    assert (rows["delete"]["count"], rows["delete"]["errors"]) == (2, 1)
+    assert session.metrics.errors == {("delete", "InvalidId"): 1}
+    assert session.execute("metrics")[0].startswith("COMMAND")
+
+
+def test_metrics_export(tmp_path):
+    metrics = Metrics()
+    with metrics.measure("find"):
+        pass
+    metrics.export(tmp_path / "mon_health.prom")
+
+    text = (tmp_path / "mon_health.prom").read_text()
+    assert text == metrics.to_prometheus()
+    assert list(tmp_path.iterdir()) == [tmp_path / "mon_health.prom"]
@@ -0,0 +1,131 @@
+from datetime import date
+
+import pytest
+
+from mon_health.command import Session
+from mon_health.db import NUTRITION_INDEX
+from mon_health.nutrients import (
+    InvalidNutrients,
+    InvalidNutritionQuery,
+    import_aliases,
+    import_nutrients,
+    parse_nutrition_args,
+    select_nutrition,
+    update_lookups,
+)
+
+ITEMS = """Name, Calories,Protein,Carbs,Fat
+Apple,52,0.3,14,0.2
+Bread,265,9,49,
+Item 7,100,,,
+"""
+ALIASES = """food,item
+pomme,apple
+"""
+
+
+@pytest.fixture
+def session(session, tmp_path):
+    for name, day in [("apple", 1), ("Pomme", 1), ("bread", 1), ("stone", 2)]:
+        session.Food.create(name=name, date=date(2024, 1, day))
+    (tmp_path / "items.csv").write_text(ITEMS)
+    (tmp_path / "aliases.csv").write_text(ALIASES)
+    return session
+
+
+def test_import_nutrients(session, tmp_path):
+    assert import_nutrients(session.tables, tmp_path / "items.csv") == 3
+    # importing again replaces the items
+    assert import_nutrients(session.tables, tmp_path / "items.csv") == 3
+    Nutrient = session.tables["nutrient"]
+    assert Nutrient.select().count() == 3
+    bread = Nutrient.get(Nutrient.key == "bread")
+    assert (bread.name, bread.calories, bread.fat) == ("Bread", 265, None)
+
+
+def test_import_nutrients_is_journaled(tmp_path):
+    (tmp_path / "items.csv").write_text(ITEMS)
+    session = Session.open(tmp_path / "health.db", memory=True)
+    import_nutrients(session.tables, tmp_path / "items.csv")
+    # the process dies before the next snapshot
+    session.database.stopped.set()
+
+    session = Session.open(tmp_path / "health.db", memory=True)
+    assert session.tables["nutrient"].select().count() == 3
+    session.close()
+
+
+@pytest.mark.parametrize(
+    "content,message",
+    [
+        ("calories\n1\n", "The first line should name the columns"),
+        ("name,calories\napple,1\npear,a lot\n", "Line 3: 'a lot' is not a number."),
+    ],
+)
+def test_import_nutrients_errors(session, tmp_path, content, message):
+    (tmp_path / "bad.csv").write_text(content)
+    with pytest.raises(InvalidNutrients, match=message):
+        import_nutrients(session.tables, tmp_path / "bad.csv")
+    # a bad line rolls back the whole file
+    assert session.tables["nutrient"].select().count() == 0
+
+
+def test_lookups_are_cached(session, tmp_path):
+    import_nutrients(session.tables, tmp_path / "items.csv")
+    assert update_lookups(session.tables) == 4
+    assert update_lookups(session.tables) == 0
+
+    NutrientLookup = session.tables["nutrient_lookup"]
+    matched = dict(NutrientLookup.select().tuples())
+    assert matched["Pomme"] is None
+    assert matched["stone"] is None
+
+    # new aliases match the names again
+    import_aliases(session.tables, tmp_path / "aliases.csv")
+    assert NutrientLookup.select().count() == 0
+    assert update_lookups(session.tables) == 4
+    matched = dict(NutrientLookup.select().tuples())
+    assert matched["Pomme"] == matched["apple"] is not None
+
+
+def test_parse_nutrition_args():
+    assert parse_nutrition_args("from 1/1/2024") == {
+        "from": date(2024, 1, 1),
+        "to": None,
+    }
+    for args in ["from", "since 1/1/2024", "to 1/13/2024"]:
+        with pytest.raises(InvalidNutritionQuery):
+            parse_nutrition_args(args)
+
+
+def test_select_nutrition_uses_the_index(session):
+    sql, params = select_nutrition(session.tables, date(2024, 1, 1)).sql()
+    cursor = session.database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+    plan = [row[-1] for row in cursor.fetchall()]
+    assert f"SEARCH t1 USING COVERING INDEX {NUTRITION_INDEX} (date>?)" in plan
+    assert "USE TEMP B-TREE FOR GROUP BY" not in plan
+
+
+def test_nutrition_command(session, tmp_path):
+    assert session.execute(f"import-nutrients '{tmp_path / 'items.csv'}'") == [
+        "3 items imported."
+    ]
+    assert session.execute(f"import-nutrients aliases {tmp_path / 'aliases.csv'}") == [
+        "1 alias imported."
+    ]
+    output = session.execute("nutrition")
+    assert [line.split() for line in output[2:]] == [
+        "01/01/2024 | 3 | 0 | 369 | 9.6 | 77.0 | 0.4".split(),
+        "02/01/2024 | 1 | 1 | 0 | 0.0 | 0.0 | 0.0".split(),
+    ]
+    assert len(session.execute("nutrition from 2/1/2024 to 2/1/2024")) == 3
+    assert session.execute("nutrition from 1/1/2025") == ["No entries were found."]
+
+
+def test_import_nutrients_command_errors(session, tmp_path):
+    assert session.execute("import-nutrients") == [
+        "Usage: import-nutrients [aliases] <path>."
+    ]
+    assert session.execute(f"import-nutrients {tmp_path / 'none.csv'}") == [
+        f"File '{tmp_path / 'none.csv'}' can't be read: No such file or directory."
+    ]
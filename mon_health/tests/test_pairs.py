@@ -0,0 +1,117 @@
+from collections import Counter
+from datetime import date, time
+
+import pytest
+
+from mon_health.pairs import (
+    InvalidPairsQuery,
+    count_pairs,
+    get_top_pairs,
+    parse_pairs_args,
+)
+
+
+def test_parse_pairs_args():
+    options = parse_pairs_args("window 2h from 1/1/2024 TO 31/1/2024 limit 3")
+    assert options == {
+        "window": 120,
+        "from": date(2024, 1, 1),
+        "to": date(2024, 1, 31),
+        "limit": 3,
+    }
+
+
+@pytest.mark.parametrize(
+    "args", ["window", "window 0m", "window 1d", "from 1/13/2024", "limit 0", "a b"]
+)
+def test_parse_pairs_args_errors(args):
+    with pytest.raises(InvalidPairsQuery):
+        parse_pairs_args(args)
+
+
+def test_count_pairs():
+    day = date(2024, 1, 1)
+    rows = [
+        ("bread", day, time(8, 0)),
+        ("coffee", day, time(8, 10)),
+        ("jam", day, time(8, 30)),
+        ("bread", day, time(12, 0)),
+        ("coffee", date(2024, 1, 2), time(0, 10)),
+        ("bread", date(2024, 1, 2), time(0, 20)),
+    ]
+    windows, items, pairs = count_pairs(rows, 30)
+    assert windows == 6
+    assert items == {"bread": 5, "coffee": 4, "jam": 1}
+    assert pairs == {("bread", "coffee"): 3, ("bread", "jam"): 1, ("coffee", "jam"): 1}
+
+
+def test_window_spans_midnight():
+    rows = [
+        ("tea", date(2024, 1, 1), time(23, 50)),
+        ("cake", date(2024, 1, 2), time(0)),
+    ]
+    assert count_pairs(rows, 10)[2] == {("cake", "tea"): 1}
+    assert count_pairs(rows, 9)[2] == {}
+
+
+def test_get_top_pairs():
+    items = {"a": 2, "b": 2, "c": 4}
+    pairs = Counter({("a", "b"): 2, ("a", "c"): 1})
+    rows = get_top_pairs(8, items, pairs, limit=1)
+    assert rows == [
+        {"first": "a", "second": "b", "count": 2, "support": "0.250", "lift": "4.00"}
+    ]
+
+
+def test_support_is_a_share_of_windows():
+    day = date(2024, 1, 1)
+    rows = [(name, day, time(8)) for name in "abababab"]
+    rows += [("c", day, time(hour)) for hour in range(10, 20)]
+    rows = get_top_pairs(*count_pairs(rows, 30))
+    assert all(0 <= float(row["support"]) <= 1 for row in rows)
+    assert rows == [
+        {"first": "a", "second": "b", "count": 7, "support": "0.389", "lift": "2.25"}
+    ]
+
+
+def test_pairs_command(session):
+    Food = session.Food
+    for name, day, hour in [
+        ("bread", 1, 8),
+        ("coffee", 1, 8),
+        ("bread", 2, 8),
+        ("coffee", 2, 8),
+        ("pasta", 2, 20),
+        ("bread", 3, 8),
+        ("coffee", 3, 8),
+    ]:
+        Food.create(name=name, date=date(2024, 1, day), time=time(hour))
+
+    output = session.execute("pairs window 1h from 2/1/2024 to 31/1/2024")
+    assert output[0].split() == [
+        "FIRST",
+        "|",
+        "SECOND",
+        "|",
+        "COUNT",
+        "|",
+        "SUPPORT",
+        "|",
+        "LIFT",
+    ]
+    assert output[2].split() == [
+        "bread",
+        "|",
+        "coffee",
+        "|",
+        "2",
+        "|",
+        "0.400",
+        "|",
+        "1.25",
+    ]
+    assert len(output) == 3
+    assert session.execute("pairs to 1/1/2023") == ["No foods were eaten together."]
+    assert session.execute("pairs window") == [
+        "Usage: pairs [window <minutes>m|<hours>h] [from <date>] [to <date>] [limit N]."
+    ]
@@ -0,0 +1,144 @@
+from datetime import date
+
+import pytest
+
+from mon_health.command import FindCommand
+from mon_health.db import make_database, make_tables
+from mon_health.food_parser import FoodParser
+from mon_health.partition import (
+    InvalidYear,
+    PartitionError,
+    freeze_year,
+    get_archives,
+    get_years,
+)
+
+Food = make_tables(make_database(":memory:"))["food"]
+
+
+@pytest.fixture
+def session(session):
+    session.Food.insert_many(
+        [
+            {"name": "a", "date": date(2020, 1, 1)},
+            {"name": "b", "date": date(2021, 5, 5)},
+            {"name": "c", "date": date(2021, 6, 5)},
+            {"name": "d", "date": date(2022, 1, 1)},
+        ]
+    ).execute()
+    return session
+
+
+@pytest.mark.parametrize(
+    "args,expected",
+    [
+        ("", None),
+        ("name 'a'", None),
+        ("date 1/1/2020", {2020}),
+        ("date 1/1/2020 name 'a'", {2020}),
+        ("date 1/1/2020 or date 1/1/2021", {2020, 2021}),
+        ("date 1/1/2020 or name 'a'", None),
+        ("(date 1/1/2020 or date 1/1/2021) and date 2/1/2021", {2021}),
+        ("not date 1/1/2020", None),
+    ],
+)
+def test_get_years(args, expected):
+    parser = FoodParser(Food)
+    parser.parse(args)
+    assert get_years(parser.where_clause, Food) == expected
+
+
+class TestFreezeYear:
+    def test_freeze_year_moves_rows_to_archive(self, session, tmp_path):
+        assert freeze_year(session, 2021) == 2
+
+        assert get_archives(session.database) == {2021: tmp_path / "health-2021.db"}
+        assert [food.name for food in session.Food.select()] == ["a", "d"]
+
+    def test_find_given_archives(self, session):
+        freeze_year(session, 2020)
+        freeze_year(session, 2021)
+
+        with session.activate():
+            query, _ = FindCommand.parse_args("sort -date")
+            assert [row["name"] for row in query] == ["d", "c", "b", "a"]
+            query, _ = FindCommand.parse_args("date 5/5/2021 or date 1/1/2022")
+            assert [row["name"] for row in query] == ["b", "d"]
+        attached = session.database.execute_sql("PRAGMA database_list").fetchall()
+        assert {row[1] for row in attached} <= {"main", "temp"}
+
+    @pytest.mark.parametrize(
+        "year,error",
+        [(2022, PartitionError), (2999, InvalidYear)],
+    )
+    def test_freeze_year_given_invalid_year(self, session, year, error):
+        with pytest.raises(error):
+            freeze_year(session, year)
+
+    def test_freeze_year_given_frozen_year(self, session):
+        freeze_year(session, 2020)
+        with pytest.raises(PartitionError):
+            freeze_year(session, 2020)
+
+    def test_commands_given_more_archives_than_attachable(self, session):
+        session.Food.insert_many(
+            [
+                {"name": f"y{year}", "date": date(year, 3, 1)}
+                for year in range(2005, 2020)
+            ]
+        ).execute()
+        session.Food.insert(name="today").execute()
+        inputs = ["find | name", "history", "meals", "pairs", "nutrition"]
+        outputs = [session.execute(input) for input in inputs]
+
+        for year in range(2005, 2020):
+            freeze_year(session, year)
+        assert len(get_archives(session.database)) == 15
+        assert [session.execute(input) for input in inputs] == outputs
+        assert len(outputs[0]) == 2 + 20
+        assert len(session.execute("find date 1/3/2010 or date 1/3/2018")) == 2 + 2
+
+    def test_migrate_converts_archives(self, session):
+        freeze_year(session, 2020)
+        freeze_year(session, 2021)
+        outputs = [session.execute("find"), session.execute("history")]
+
+        assert session.execute("migrate compact") == ["4 rows migrated."]
+        assert [session.execute("find"), session.execute("history")] == outputs
+        assert session.execute("migrate text") == ["4 rows migrated."]
+        assert [session.execute("find"), session.execute("history")] == outputs
+
+    def test_freeze_year_given_empty_year(self, session, tmp_path):
+        assert freeze_year(session, 2019) == 0
+        assert get_archives(session.database) == {}
+
+    def test_update_and_delete_given_frozen_entries(self, session):
+        freeze_year(session, 2021)
+
+        assert session.execute("update id 2 name 'x'") == ["Entry 2 is frozen in 2021."]
+        assert session.execute("update id 1 name 'x' date 1/1/2021") == [
+            "Year 2021 is frozen."
+        ]
+        assert session.execute("delete name 'b' or name 'a'") == [
+            "Year 2021 is frozen, its entries can't be deleted."
+        ]
+        assert session.execute("delete name 'a'") == ["1 row modified."]
+        assert len(session.execute("find")) == 2 + 3
+
+    def test_analytic_commands_given_archives(self, session, tmp_path):
+        session.Food.insert_many(
+            [{"name": "b", "date": date(2020, 1, 1)}, {"name": "e"}]
+        ).execute()
+        (tmp_path / "items.csv").write_text("name,calories\na,1\nb,2\n")
+        session.execute(f"import-nutrients {tmp_path / 'items.csv'}")
+        inputs = ["history", "meals", "meals cache", "pairs", "nutrition"]
+        outputs = [session.execute(input) for input in inputs]
+
+        freeze_year(session, 2020)
+        freeze_year(session, 2021)
+        assert [session.execute(input) for input in inputs] == outputs
+        assert session.execute("pairs from 1/1/2020 to 31/12/2020")[2].split()[:3] == [
+            "a",
+            "|",
+            "b",
+        ]
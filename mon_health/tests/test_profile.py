@@ -0,0 +1,80 @@
+import pytest
+
+from mon_health.command import FindCommand, Session
+from mon_health.profile import InvalidProfile, get_profile_path, parse_profiles
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    return tmp_path / "mon-health"
+
+
+@pytest.fixture
+def session(app_dir):
+    for name, foods in [("default", "ab"), ("mom", "c"), ("kid", "de")]:
+        session = Session.open(get_profile_path(name))
+        session.execute(f"insert {', '.join(foods)}")
+        session.close()
+
+    session = Session.open(
+        get_profile_path("kid"), profiles=parse_profiles("kid,default,mom")
+    )
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("default", "health.db"),
+        ("mom", "profiles/mom.db"),
+        ("kid-2", "profiles/kid-2.db"),
+    ],
+)
+def test_get_profile_path(app_dir, name, expected):
+    assert get_profile_path(name) == app_dir / expected
+
+
+@pytest.mark.parametrize("string", ["", " , ", "a b", "../a"])
+def test_parse_profiles_given_invalid_string(app_dir, string):
+    with pytest.raises(InvalidProfile):
+        parse_profiles(string)
+
+
+class TestProfiles:
+    def test_find_given_several_profiles(self, session):
+        with session.activate():
+            query, columns = FindCommand.parse_args("sort name | name")
+            rows = [(row["profile"], row["name"]) for row in query]
+
+        assert columns == ["profile", "name"]
+        assert rows == [
+            ("default", "a"),
+            ("default", "b"),
+            ("mom", "c"),
+            ("kid", "d"),
+            ("kid", "e"),
+        ]
+
+    def test_find_given_filter(self, session):
+        output = session.execute("find name 'a' or name 'e' sort name | name")
+        assert [line.split() for line in output[2:]] == [
+            ["default", "|", "a"],
+            ["kid", "|", "e"],
+        ]
+
+    def test_execute_given_write(self, session):
+        assert session.execute("insert f") == ["Several profiles can only be queried."]
+
+    def test_history_given_several_profiles(self, session):
+        assert session.execute("history") == ["Several profiles can only be queried."]
+
+    def test_pairs_given_several_profiles(self, session):
+        assert session.execute("pairs") == ["Several profiles can only be queried."]
+
+    @pytest.mark.parametrize("args", ["", "daily", "cache"])
+    def test_meals_given_several_profiles(self, session, args):
+        assert session.execute(f"meals {args}") == [
+            "Several profiles can only be queried."
+        ]
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from mon_health.command import Session
+from mon_health.replay import (
+    Recorder,
+    get_percentile,
+    get_report,
+    main,
+    read_recording,
+    replay,
+)
+
+
+@pytest.fixture
+def session(session, tmp_path):
+    session.recorder = Recorder(tmp_path / "session.jsonl")
+    return session
+
+
+@pytest.mark.parametrize(
+    "percentile,expected", [(0, 1), (50, 5), (95, 10), (99, 10), (100, 10)]
+)
+def test_get_percentile(percentile, expected):
+    assert get_percentile(range(10, 0, -1), percentile) == expected
+
+
+def test_recorder(session, tmp_path):
+    session.execute("insert a")
+    session.execute("today")
+    session.close()
+
+    entries = list(read_recording(tmp_path / "session.jsonl"))
+    assert [entry["input"] for entry in entries] == ["insert a", "today"]
+    assert [entry["command"] for entry in entries] == ["insert", "find"]
+    assert entries[0]["offset"] <= entries[1]["offset"]
+
+
+def test_replay(session, tmp_path):
+    entries = [
+        {"offset": 0, "input": "insert a", "seconds": 0.001},
+        {"offset": 0.1, "input": "find", "seconds": 0.002},
+        {"offset": 0.2, "input": "foo", "seconds": 0.0},
+    ]
+    started = time.monotonic()
+    latencies, recorded, elapsed = replay(session, entries, paced=True)
+
+    assert time.monotonic() - started >= 0.2
+    assert {label: len(values) for label, values in latencies.items()} == {
+        "insert": 1,
+        "find": 1,
+        "unknown": 1,
+    }
+    assert recorded["find"] == [0.002]
+    report = get_report(latencies, recorded, elapsed)
+    assert report[0].startswith("3 commands in")
+    assert report[1].split() == [
+        "COMMAND",
+        "|",
+        "COUNT",
+        "|",
+        "PER_S",
+        "|",
+        "P50_MS",
+        "|",
+        "P95_MS",
+        "|",
+        "P99_MS",
+        "|",
+        "RECORDED_P50_MS",
+    ]
+
+
+def test_main_replays_against_a_copy(session, tmp_path):
+    session.execute("insert a, b")
+    session.execute("delete name 'a'")
+    session.close()
+
+    result = CliRunner().invoke(
+        main, [str(tmp_path / "session.jsonl"), str(tmp_path / "health.db")]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("2 commands in")
+
+    session = Session.open(tmp_path / "health.db")
+    assert [food.name for food in session.Food.select()] == ["b"]
+    session.close()
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from peewee import OperationalError
+
+from mon_health.slowlog import (
+    LOG_BACKUPS,
+    get_log_paths,
+    get_worst_offenders,
+    read_entries,
+    rotate_log,
+)
+
+
+@pytest.fixture
+def session(session, tmp_path):
+    session.slow_log = tmp_path / "slow.jsonl"
+    session.Food.insert_many([{"name": f"food{i}"} for i in range(10)]).execute()
+    return session
+
+
+def test_fast_commands_are_not_logged(session):
+    session.execute("find")
+    assert not session.slow_log.exists()
+
+
+def test_slow_command_is_logged(session):
+    session.slow_threshold = 1e-9
+    session.execute("today name 'food1'")
+
+    [entry] = read_entries(session.slow_log)
+    assert entry["input"] == "today name 'food1'"
+    assert entry["expanded"] == "find date today name 'food1'"
+    assert entry["rows"] == {"returned": 1}
+    assert set(entry["phases"]) == {"parse", "query", "format"}
+    [query] = entry["queries"]
+    assert query["sql"].startswith('SELECT "t1"."id"')
+    assert "food1" in query["params"]
+    assert query["plan"]
+
+
+def test_slow_log_errors_are_only_counted(session, monkeypatch):
+    def log_if_slow(session, trace, elapsed):
+        raise OperationalError("no such table: food")
+
+    monkeypatch.setattr("mon_health.command.log_if_slow", log_if_slow)
+    assert "food1" in session.execute("find name 'food1'")[-1]
+    assert session.metrics.errors == {("find", "OperationalError"): 1}
+
+
+def test_slowlog_command(session):
+    session.slow_threshold = 1e-9
+    session.execute("find name 'food1'")
+    session.execute("find name 'food2'")
+    session.execute("delete name 'food3'")
+
+    # both finds run the same statement with other values
+    offenders = get_worst_offenders(session.slow_log)
+    assert sorted(offender["runs"] for offender in offenders) == [1, 2]
+    session.slow_threshold = None
+    output = session.execute("slowlog")
+    assert output[0].startswith("COMMAND")
+    assert len(output) == 2 + 2
+
+
+def test_set_slowlog(session):
+    assert session.execute("set slowlog off") == []
+    assert session.slow_threshold is None
+    assert session.execute("set slowlog 2") == []
+    assert session.slow_threshold == 2
+
+
+def test_rotate_log(tmp_path, monkeypatch):
+    monkeypatch.setattr("mon_health.slowlog.MAX_LOG_BYTES", 5)
+    path = tmp_path / "slow.jsonl"
+    for n in range(LOG_BACKUPS + 2):
+        rotate_log(path)
+        path.write_text(json.dumps({"n": n}) + "\n")
+
+    assert len(get_log_paths(path)) == LOG_BACKUPS + 1
+    assert [entry["n"] for entry in read_entries(path)] == [1, 2, 3, 4]
@@ -0,0 +1,125 @@
+import shutil
+import sqlite3
+from datetime import date, time
+
+import pytest
+
+from mon_health.command import Session
+from mon_health.sync import SyncError, enable_tracking, sync_database
+
+
+@pytest.fixture
+def laptop(tmp_path):
+    session = Session.open(tmp_path / "laptop.db")
+    session.Food.insert_many(
+        [
+            {"name": "a", "date": date(2024, 1, 1), "time": time(8)},
+            {"name": "b", "date": date(2024, 1, 1), "time": time(12)},
+        ]
+    ).execute()
+    yield session
+    session.close()
+
+
+def get_foods(session):
+    Food = session.Food
+    query = Food.select().order_by(Food.date, Food.time, Food.name)
+    return [(food.name, food.date, food.time) for food in query]
+
+
+def open_copy(session, tmp_path, name):
+    session.database.close()
+    shutil.copy(tmp_path / "laptop.db", tmp_path / name)
+    return Session.open(tmp_path / name)
+
+
+def test_sync_to_new_file(laptop, tmp_path):
+    assert sync_database(laptop, tmp_path / "desktop.db") == (0, 2)
+
+    desktop = Session.open(tmp_path / "desktop.db")
+    assert get_foods(desktop) == get_foods(laptop)
+    desktop.close()
+
+
+def test_sync_exchanges_only_new_changes(laptop, tmp_path):
+    sync_database(laptop, tmp_path / "desktop.db")
+    assert sync_database(laptop, tmp_path / "desktop.db") == (0, 0)
+
+    desktop = Session.open(tmp_path / "desktop.db")
+    desktop.Food.insert(name="c", date=date(2024, 1, 2)).execute()
+    desktop.Food.delete().where(desktop.Food.name == "a").execute()
+    laptop.Food.update(name="bb").where(laptop.Food.name == "b").execute()
+
+    assert sync_database(desktop, tmp_path / "laptop.db") == (1, 2)
+    assert sync_database(laptop, tmp_path / "desktop.db") == (0, 0)
+    assert [food[0] for food in get_foods(laptop)] == ["bb", "c"]
+    assert get_foods(desktop) == get_foods(laptop)
+    desktop.close()
+
+
+def test_sync_copies_of_a_file(laptop, tmp_path):
+    desktop = open_copy(laptop, tmp_path, "desktop.db")
+    desktop.Food.insert(name="c", date=date(2024, 1, 2)).execute()
+    laptop.Food.insert(name="d", date=date(2024, 1, 3)).execute()
+
+    assert sync_database(laptop, tmp_path / "desktop.db") == (1, 1)
+    assert [food[0] for food in get_foods(laptop)] == ["a", "b", "c", "d"]
+    assert get_foods(desktop) == get_foods(laptop)
+    desktop.close()
+
+
+def test_sync_after_update_command(laptop, tmp_path):
+    sync_database(laptop, tmp_path / "desktop.db")
+    # update replaces the row, which doesn't fire the delete trigger
+    laptop.execute("update id 1 name 'milk'")
+
+    assert sync_database(laptop, tmp_path / "desktop.db") == (0, 1)
+    desktop = Session.open(tmp_path / "desktop.db")
+    assert sorted(food[0] for food in get_foods(desktop)) == ["b", "milk"]
+    assert get_foods(desktop) == get_foods(laptop)
+    desktop.close()
+
+
+def test_sync_conflicts_are_resolved_the_same_way(laptop, tmp_path):
+    sync_database(laptop, tmp_path / "desktop.db")
+    desktop = Session.open(tmp_path / "desktop.db")
+    desktop.Food.update(name="x").where(desktop.Food.name == "a").execute()
+    laptop.Food.update(name="y").where(laptop.Food.name == "a").execute()
+
+    sync_database(laptop, tmp_path / "desktop.db")
+    assert get_foods(desktop) == get_foods(laptop)
+    assert [food[0] for food in get_foods(laptop)] in [["x", "b"], ["y", "b"]]
+    desktop.close()
+
+
+def test_sync_with_compact_dates(laptop, tmp_path):
+    sync_database(laptop, tmp_path / "desktop.db")
+    desktop = Session.open(tmp_path / "desktop.db")
+    desktop.execute("migrate compact")
+    desktop.Food.insert(name="c", date=date(2024, 1, 2), time=time(9)).execute()
+
+    assert sync_database(laptop, tmp_path / "desktop.db") == (1, 0)
+    assert get_foods(desktop) == get_foods(laptop)
+    desktop.close()
+
+
+def test_sync_with_itself(laptop, tmp_path):
+    with pytest.raises(SyncError):
+        sync_database(laptop, tmp_path / "laptop.db")
+
+
+def test_sync_command(laptop, tmp_path):
+    assert laptop.execute(f"sync {tmp_path / 'desktop.db'}") == [
+        "0 changes received, 2 changes sent."
+    ]
+
+
+def test_enable_tracking_given_more_rows_than_variables(laptop):
+    laptop.Food.insert_many([{"name": f"food{i}"} for i in range(400)]).execute()
+    # builds before SQLite 3.32 bind at most 999 parameters per statement
+    laptop.database.connection().setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    enable_tracking(laptop.tables)
+
+    FoodChange = laptop.tables["food_change"]
+    seqs = [change.seq for change in FoodChange.select().order_by(FoodChange.food_id)]
+    assert seqs == list(range(1, 403))
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+from peewee import CharField, Model, SqliteDatabase
+
+from mon_health.writer import AsyncWriter
+
+
+@pytest.fixture
+def Food():
+    TEST_DB_PATH = "test_writer.db"
+    TEST_DB = SqliteDatabase(TEST_DB_PATH)
+
+    class BaseModel(Model):
+        class Meta:
+            database = TEST_DB
+
+    class Food(BaseModel):
+        name = CharField(max_length=20)
+
+    TEST_DB.create_tables([Food])
+    yield Food
+    TEST_DB.close()
+    os.remove(TEST_DB_PATH)
+
+
+class TestAsyncWriter:
+    def test_sync_given_submitted_queries(self, Food):
+        writer = AsyncWriter(Food._meta.database, batch_size=3)
+        for i in range(10):
+            writer.submit(Food.insert(name=str(i)))
+
+        assert writer.sync() == []
+        assert Food.select().count() == 10
+        writer.close()
+
+    def test_sync_given_failing_query(self, Food):
+        Food.insert(id=1, name="a").execute()
+        writer = AsyncWriter(Food._meta.database)
+        writer.submit(Food.insert(name="b"))
+        writer.submit(Food.insert(id=1, name="c"))
+        writer.submit(Food.insert(name="d"))
+
+        errors = writer.sync()
+
+        assert len(errors) == 1
+        assert sorted(food.name for food in Food.select()) == ["a", "b", "d"]
+        writer.close()
+
+    def test_close_flushes_queue(self, Food):
+        writer = AsyncWriter(Food._meta.database)
+        for i in range(10):
+            writer.submit(Food.insert(name=str(i)))
+        writer.close()
+
+        assert not writer.thread.is_alive()
+        assert Food.select().count() == 10
@@ -1,3 +1,4 @@
+import re
 from datetime import date, datetime, time
 
 
@@ -9,6 +10,10 @@ class InvalidDate(Exception):
     pass
 
 
+class InvalidDuration(Exception):
+    pass
+
+
 def convert_to_date(string):
     try:
         date_params = string.split("/")
@@ -32,6 +37,14 @@ def convert_to_time(string):
         raise InvalidTime
 
 
+def convert_to_minutes(string):
+    match = re.fullmatch(r"(\d+)([mh]?)", string.lower())
+    if not match or not int(match.group(1)):
+        raise InvalidDuration
+    minutes = int(match.group(1))
+    return minutes * 60 if match.group(2) == "h" else minutes
+
+
 def format_time(value):
     assert isinstance(value, time)
     return value.strftime("%H:%M")
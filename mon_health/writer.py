@@ -0,0 +1,67 @@
+import atexit
+import queue
+import threading
+
+from mon_health.concurrency import execute_write
+
+STOP = object()
+
+
+class AsyncWriter:
+    def __init__(self, database, batch_size=100):
+        self.database = database
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.errors = []
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, query):
+        self.queue.put(query)
+
+    def get_batch(self):
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_size and batch[-1] is not STOP:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.get_batch()
+            queries = [query for query in batch if query is not STOP]
+            try:
+                self.write(queries)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if len(queries) < len(batch):
+                self.database.close()
+                return
+
+    def write(self, queries):
+        if not queries:
+            return
+        try:
+            execute_write(self.database, lambda: [q.execute() for q in queries])
+        except Exception:
+            # the group was rolled back, so find out which queries failed
+            for query in queries:
+                try:
+                    execute_write(self.database, query.execute)
+                except Exception as e:
+                    self.errors.append(e)
+
+    def sync(self):
+        self.queue.join()
+        errors, self.errors = self.errors, []
+        return errors
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(STOP)
+            self.thread.join()
+        return self.sync()